@@ -0,0 +1,58 @@
+import os
+from typing import Any, Dict, List
+from fastapi.testclient import TestClient
+from benchmarks.bench_db import make_rows
+from benchmarks.bench_sandbox import CASES
+from benchmarks.common import measure
+from database import SQLiteClient, db
+
+
+def run(iterations: int, rows: int, workdir: str) -> List[Dict[str, Any]]:
+    """
+    Time API endpoints end to end through the ASGI app with an in-process client.
+
+    The app runs against a scratch SQLite database seeded with `rows`
+    templates, and its startup hooks start the real sandbox worker pool,
+    so preview timings include compilation, worker IPC and serialization.
+    """
+    # Must happen before anything else creates the app's database client
+    client = SQLiteClient(os.path.join(workdir, "bench_api.sqlite3"))
+    client.insert_rows('question_templates', make_rows(rows))
+    db._client = client
+
+    from main import app
+
+    results = []
+    with TestClient(app) as http:
+        def request(method, url, **kwargs):
+            def call(i):
+                body = kwargs.get('json')
+                if callable(body):
+                    return http.request(method, url, json=body(i))
+                return http.request(method, url, params=kwargs.get('params'))
+            return call
+
+        endpoints = [
+            ('preview', {'case': case}, request('POST', '/api/preview', json=lambda i, q=q, a=a: {
+                'question_template': q,
+                'answer_template': a,
+                'type': 'MAQ',
+                'seed': i
+            }))
+            for case, (q, a) in CASES.items() if case in ('arithmetic', 'geometry', 'while_loop')
+        ] + [
+            ('skills', {}, request('GET', '/api/skills')),
+            ('skills_page', {'limit': 50}, request('GET', '/api/skills', params={'limit': 50, 'offset': 50})),
+            ('topics_suggest', {'q': 'top'}, request('GET', '/api/topics/suggest', params={'q': 'top'})),
+            ('topics_suggest_fuzzy', {'q': 'tpoic 1'}, request('GET', '/api/topics/suggest', params={'q': 'tpoic 1'})),
+            ('skills_suggest', {'q': 'skill 1'}, request('GET', '/api/skills/suggest', params={'topic': 'Topic 1', 'q': 'skill 1'})),
+        ]
+
+        for name, params, fn in endpoints:
+            results.append(measure(
+                name, fn, iterations,
+                is_error=lambda response: response.status_code != 200 or bool(response.json().get('error')),
+                rows=rows, **params
+            ))
+
+    return results
@@ -0,0 +1,74 @@
+import itertools
+import json
+import os
+import uuid
+from typing import Any, Dict, Iterable, List
+from benchmarks.common import measure
+from database import MockClient, SQLiteClient
+
+TOPICS = 20
+SKILLS_PER_TOPIC = 10
+
+
+def make_rows(count: int, start: int = 0) -> List[Dict[str, Any]]:
+    """Synthetic question_templates rows spread over TOPICS x SKILLS_PER_TOPIC skills."""
+    rows = []
+    for n in range(start, start + count):
+        skill = n % (TOPICS * SKILLS_PER_TOPIC)
+        rows.append({
+            'id': str(uuid.uuid4()),
+            'module': 'Basic-skills',
+            'category': 'Math',
+            'grade': 1 + n % 10,
+            'topic': f"Topic {skill // SKILLS_PER_TOPIC}",
+            'skill_name': f"Skill {skill}",
+            'format': 1 + n // (TOPICS * SKILLS_PER_TOPIC),
+            'type': 'MAQ',
+            'question_template': 'import random\na = random.randint(1, 10)\nquestion = f"What is {a} + 1?"',
+            'answer_template': 'answer = a + 1',
+            'created_by': 'benchmark',
+            'updated_by': 'benchmark'
+        })
+    return rows
+
+
+def _client(backend: str, workdir: str, size: int) -> Any:
+    """A fresh local client holding `size` rows."""
+    rows = make_rows(size)
+    if backend == 'json':
+        client = MockClient()
+        client.db_file = os.path.join(workdir, f"bench_{size}.json")
+        with open(client.db_file, 'w') as f:
+            json.dump({'question_templates': rows}, f)
+        return client
+
+    client = SQLiteClient(os.path.join(workdir, f"bench_{size}.sqlite3"))
+    client.insert_rows('question_templates', rows)
+    return client
+
+
+def run(iterations: int, sizes: Iterable[int], workdir: str) -> List[Dict[str, Any]]:
+    """
+    Time the local database clients' queries and inserts as the table grows.
+
+    MockClient (LOCAL_DB_BACKEND=json) re-reads the JSON file on every query
+    and rewrites it on every insert; SQLiteClient is measured alongside for
+    comparison. SQLite SELECTs are served from its result cache after the
+    first call, as they are in the app.
+    """
+    results = []
+    for backend, size in itertools.product(('json', 'sqlite'), sizes):
+        client = _client(backend, workdir, size)
+        table = client.table
+        new_rows = iter(make_rows(iterations + 10, start=size))
+        queries = {
+            'select_eq': lambda i: table('question_templates').select('*').eq('topic', f"Topic {i % TOPICS}").execute(),
+            'select_ilike': lambda i: table('question_templates').select('topic').ilike('topic', '%pic 1%').execute(),
+            'select_page': lambda i: table('question_templates').select('*').order('id').limit(50).offset(i % 10 * 50).execute(),
+            'skill_counts': lambda i: table('skill_counts').select('topic, skill_name, template_count').execute(),
+            'insert': lambda i: table('question_templates').insert(next(new_rows)).execute(),
+        }
+        for name, fn in queries.items():
+            results.append(measure(name, fn, iterations, warmup=1, backend=backend, rows=size))
+
+    return results
@@ -0,0 +1,88 @@
+from typing import Any, Dict, List
+from benchmarks.common import measure
+from services import sandbox as sandbox_module
+from services.code_cache import code_cache
+from services.sandbox import PythonSandbox, join_template
+
+# (question template, answer template); the first two are the templates seed_db.py installs
+CASES = {
+    'arithmetic': (
+        'import random\na = random.randint(1, 100)\nb = random.randint(1, 100)\n'
+        'question = f"What is {a} + {b}?"',
+        'answer = a + b'
+    ),
+    'geometry': (
+        'import random\nls = random.randint(1, 20)\nws = random.randint(1, 10)\n'
+        'question = f"Find area of rectangle with length {ls} and width {ws}?"',
+        'answer = ls * ws'
+    ),
+    'for_loop': (
+        'import random\nn = random.randint(500, 1000)\ntotal = 0\n'
+        'for i in range(n):\n    total += i * i\n'
+        'question = f"What is the sum of the squares below {n}?"',
+        'answer = total'
+    ),
+    'while_loop': (
+        'import random\nn = random.randint(500, 1000)\ni = 0\ntotal = 0\n'
+        'while i < n:\n    total = total + i\n    i = i + 1\n'
+        'question = f"What is 0 + 1 + ... + {n - 1}?"',
+        'answer = total'
+    ),
+    'comprehension': (
+        'import random\nvalues = [random.randint(1, 100) for _ in range(500)]\n'
+        'question = f"What is the largest of {len(values)} numbers?"',
+        'answer = max(values)'
+    ),
+    'nested_loops': (
+        'import random\nsize = random.randint(20, 30)\ntable = []\n'
+        'for row in range(1, size + 1):\n    line = []\n'
+        '    for col in range(1, size + 1):\n        line.append(row * col)\n'
+        '    table.append(line)\n'
+        'question = f"What is the sum of a {size}x{size} multiplication table?"',
+        'answer = sum([sum(line) for line in table])'
+    ),
+}
+
+
+def run(iterations: int) -> List[Dict[str, Any]]:
+    """
+    Time PythonSandbox.execute on each case, in process.
+
+    'execute' runs the joined source with bytecode served from the code
+    cache; 'execute_template' is the path sandbox workers take for previews
+    and generation; 'compile' is the RestrictedPython compile paid on a
+    cache miss.
+    """
+    sandbox = PythonSandbox()
+    results = []
+
+    for case, (question_template, answer_template) in CASES.items():
+        source, answer_line = join_template(question_template, answer_template)
+
+        def execute(i, source=source):
+            result = sandbox.execute(source, seed=i)
+            sandbox_module.drain_observations()
+            return result
+
+        def execute_template(i, source=source, answer_line=answer_line):
+            result = sandbox.execute_template(code_cache.get(source), answer_line, seed=i)
+            sandbox_module.drain_observations()
+            return result
+
+        def compile_source(i, source=source):
+            code_cache.invalidate(source)
+            return code_cache.get(source)
+
+        results.append(measure(
+            'execute', execute, iterations,
+            is_error=lambda result: result['error'] is not None,
+            case=case
+        ))
+        results.append(measure(
+            'execute_template', execute_template, iterations,
+            is_error=lambda result: result['error'] is not None,
+            case=case
+        ))
+        results.append(measure('compile', compile_source, max(1, iterations // 10), case=case))
+
+    return results
@@ -0,0 +1,68 @@
+import statistics
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+def summarize(name: str, samples: list, errors: int = 0, **params: Any) -> Dict[str, Any]:
+    """
+    Build one benchmark result from per-operation timings.
+
+    Args:
+        name: Benchmark name, unique within its suite
+        samples: Seconds per operation
+        errors: Operations that failed (still timed)
+        params: Parameters the result depends on (table size, case, ...)
+
+    Returns:
+        Result dict with timings in milliseconds and throughput in ops/s
+    """
+    ordered = sorted(samples)
+    mean = statistics.fmean(ordered)
+    return {
+        'name': name,
+        'params': params,
+        'iterations': len(ordered),
+        'errors': errors,
+        'mean_ms': round(mean * 1000, 4),
+        'median_ms': round(statistics.median(ordered) * 1000, 4),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 4),
+        'min_ms': round(ordered[0] * 1000, 4),
+        'stdev_ms': round(statistics.pstdev(ordered) * 1000, 4),
+        'ops_per_sec': round(1 / mean, 2) if mean else None
+    }
+
+
+def measure(
+    name: str,
+    fn: Callable[[int], Any],
+    iterations: int,
+    warmup: int = 3,
+    is_error: Optional[Callable[[Any], bool]] = None,
+    **params: Any
+) -> Dict[str, Any]:
+    """
+    Time fn(i) for i in range(iterations) after a few untimed warmup calls.
+
+    Args:
+        name: Benchmark name
+        fn: Operation to time; receives the iteration number (e.g. as a seed)
+        iterations: Timed calls
+        warmup: Untimed calls first (fill caches, start lazy state)
+        is_error: Classifies a return value as a failed operation
+        params: Recorded with the result
+
+    Returns:
+        Result dict from summarize()
+    """
+    for i in range(warmup):
+        fn(i)
+
+    samples = []
+    errors = 0
+    for i in range(iterations):
+        start = time.perf_counter()
+        value = fn(i)
+        samples.append(time.perf_counter() - start)
+        if is_error is not None and is_error(value):
+            errors += 1
+    return summarize(name, samples, errors, **params)
@@ -0,0 +1,193 @@
+"""
+Check startup costs against a time budget.
+
+Usage (from backend/):
+    python -m benchmarks.import_budget
+    python -m benchmarks.import_budget --runs 10 --budget main=500 --output startup.json
+
+Measures, each in a fresh interpreter, the time to import the API
+('import main') and the slim sandbox worker entry point
+('import services.sandbox_worker'), and, in this process, the time to
+start a one-worker sandbox pool (cold start, including the fork server)
+and to replace a worker (recycle). Also checks that heavy dependencies
+stay out of those imports: the Supabase client stack must be imported
+lazily, and the worker entry point must not pull in the API.
+
+Because multiprocessing children can re-import their parent's __main__,
+the worker_from_main check starts a sandbox worker from a fresh
+interpreter that has run main.py as its __main__ (as `python main.py`
+does, without starting the server) and checks which modules the worker
+ends up with.
+
+Exits with status 1 if any median exceeds its budget or a forbidden
+module is imported.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# Median milliseconds allowed per check
+BUDGETS_MS = {
+    'main': 600,
+    'sandbox_worker': 300,
+    'worker_cold_start': 600,
+    'worker_recycle': 50,
+    'worker_from_main': 600,
+}
+
+# Modules each import must not load
+FORBIDDEN_MODULES = {
+    'main': ['supabase', 'postgrest', 'gotrue', 'httpx'],
+    'sandbox_worker': ['main', 'fastapi', 'starlette', 'database', 'supabase', 'routers'],
+    'worker_from_main': ['main', 'fastapi', 'starlette', 'database', 'supabase', 'routers'],
+}
+
+IMPORTS = {
+    'main': 'main',
+    'sandbox_worker': 'services.sandbox_worker',
+}
+
+_PROBE = (
+    "import json, sys, time\n"
+    "start = time.perf_counter()\n"
+    "import {module}\n"
+    "elapsed = time.perf_counter() - start\n"
+    "print(json.dumps({{'seconds': elapsed, 'modules': sorted(sys.modules)}}))\n"
+)
+
+# Runs main.py as __main__ (under another __name__, so the server is not
+# started), then times a sandbox worker's start and first job and lists the
+# modules loaded in the worker
+_WORKER_PROBE = (
+    "import json, os, time\n"
+    "import __main__\n"
+    "__main__.__file__ = os.path.abspath('main.py')\n"
+    "__main__.__name__ = 'main_probe'\n"
+    "with open(__main__.__file__) as f:\n"
+    "    exec(compile(f.read(), __main__.__file__, 'exec'), __main__.__dict__)\n"
+    "__main__.__name__ = '__main__'\n"
+    "from services.worker_pool import _Worker, _get_context\n"
+    "start = time.perf_counter()\n"
+    "worker = _Worker(_get_context(settings.SANDBOX_START_METHOD), 2)\n"
+    "modules, _ = worker.call(eval, (\"sorted(__import__('sys').modules)\",), 30)\n"
+    "elapsed = time.perf_counter() - start\n"
+    "worker.stop()\n"
+    "print(json.dumps({'seconds': elapsed, 'modules': modules}))\n"
+)
+
+
+def _run_probe(code: str, runs: int) -> Dict[str, Any]:
+    """
+    Run probe code in fresh interpreters.
+
+    Returns:
+        Median and per-run milliseconds, plus the modules reported by the last run
+    """
+    samples = []
+    modules: List[str] = []
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, '-c', code],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        )
+        probe = json.loads(completed.stdout.strip().splitlines()[-1])
+        samples.append(probe['seconds'] * 1000)
+        modules = probe['modules']
+    return {'median_ms': round(statistics.median(samples), 2), 'samples_ms': [round(s, 2) for s in samples], 'modules': modules}
+
+
+def measure_import(module: str, runs: int) -> Dict[str, Any]:
+    """Time importing module in fresh interpreters (see _run_probe)."""
+    return _run_probe(_PROBE.format(module=module), runs)
+
+
+def measure_workers(runs: int) -> Dict[str, Dict[str, Any]]:
+    """Time a one-worker pool start and worker replacement (spawn plus first job)."""
+    from services.sandbox import execute_code
+    from services.worker_pool import SandboxPool, _Worker
+
+    pool = SandboxPool(size=1)
+    start = time.perf_counter()
+    pool.start()
+    cold_ms = (time.perf_counter() - start) * 1000
+
+    samples = []
+    try:
+        for _ in range(runs):
+            start = time.perf_counter()
+            worker = _Worker(pool._ctx, pool.cpu_limit, pool.memory_limit_mb)
+            worker.call(execute_code, ("result = 1",), timeout=30)
+            samples.append((time.perf_counter() - start) * 1000)
+            worker.stop()
+    finally:
+        pool.shutdown()
+
+    return {
+        'worker_cold_start': {'median_ms': round(cold_ms, 2), 'samples_ms': [round(cold_ms, 2)]},
+        'worker_recycle': {'median_ms': round(statistics.median(samples), 2), 'samples_ms': [round(s, 2) for s in samples]},
+    }
+
+
+def _forbidden(loaded: List[str], forbidden: List[str]) -> List[str]:
+    return sorted({
+        name for name in loaded
+        for prefix in forbidden
+        if name == prefix or name.startswith(prefix + '.')
+    })
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check import and worker startup times against a budget")
+    parser.add_argument('--runs', type=int, default=5, help="Measurements per check")
+    parser.add_argument('--budget', action='append', default=[], metavar='CHECK=MS', help="Override a budget (repeatable)")
+    parser.add_argument('--output', help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    budgets = dict(BUDGETS_MS)
+    for override in args.budget:
+        name, _, value = override.partition('=')
+        if name not in budgets:
+            parser.error(f"Unknown check {name!r}; choose from {', '.join(budgets)}")
+        budgets[name] = float(value)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for name, module in IMPORTS.items():
+        print(f"Importing {module} ({args.runs} runs)...", file=sys.stderr)
+        measured = measure_import(module, args.runs)
+        measured['forbidden_loaded'] = _forbidden(measured.pop('modules'), FORBIDDEN_MODULES[name])
+        results[name] = measured
+    print(f"Starting sandbox workers ({args.runs} runs)...", file=sys.stderr)
+    results.update(measure_workers(args.runs))
+    print(f"Starting a sandbox worker under main.py ({args.runs} runs)...", file=sys.stderr)
+    measured = _run_probe(_WORKER_PROBE, args.runs)
+    measured['forbidden_loaded'] = _forbidden(measured.pop('modules'), FORBIDDEN_MODULES['worker_from_main'])
+    results['worker_from_main'] = measured
+
+    failed = False
+    for name, measured in results.items():
+        measured['budget_ms'] = budgets[name]
+        measured['ok'] = measured['median_ms'] <= budgets[name] and not measured.get('forbidden_loaded')
+        failed = failed or not measured['ok']
+        line = f"{name:18} median {measured['median_ms']:>9.2f} ms  budget {budgets[name]:>7.0f} ms"
+        if measured.get('forbidden_loaded'):
+            line += f"  imports {', '.join(measured['forbidden_loaded'])}"
+        print(line + ("" if measured['ok'] else "  FAIL"), file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+Benchmark the sandbox, API endpoints and local database clients.
+
+Usage (from backend/):
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --suite sandbox --suite db --iterations 50
+    python -m benchmarks.run --output new.json --compare results.json
+
+Results are written as JSON (stdout by default). With --compare, each
+result's median is checked against the same benchmark in an earlier
+results file and the run exits with status 1 if any got slower than
+--threshold allows. Everything runs against scratch databases in a
+temporary directory; local_db.json and local_db.sqlite3 are not touched.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from config import settings
+
+SUITES = ('sandbox', 'api', 'db')
+
+DEFAULT_ITERATIONS = {'sandbox': 200, 'api': 100, 'db': 20}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _meta() -> Dict[str, Any]:
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'settings': {
+            'SANDBOX_POOL_SIZE': settings.SANDBOX_POOL_SIZE,
+            'EXECUTION_TIMEOUT': settings.EXECUTION_TIMEOUT,
+            'METRICS_PROFILE': settings.METRICS_PROFILE
+        }
+    }
+
+
+def run_suites(suites: List[str], iterations: Optional[int], sizes: List[int], api_rows: int) -> List[Dict[str, Any]]:
+    """Run the selected suites in a scratch directory and tag each result with its suite."""
+    results = []
+    with tempfile.TemporaryDirectory(prefix='benchmarks-') as workdir:
+        # The local clients resolve local_db.json relative to the working directory
+        os.chdir(workdir)
+        for suite in suites:
+            count = iterations or DEFAULT_ITERATIONS[suite]
+            print(f"Running {suite} ({count} iterations)...", file=sys.stderr)
+            if suite == 'sandbox':
+                from benchmarks import bench_sandbox
+                suite_results = bench_sandbox.run(count)
+            elif suite == 'api':
+                from benchmarks import bench_api
+                suite_results = bench_api.run(count, api_rows, workdir)
+            else:
+                from benchmarks import bench_db
+                suite_results = bench_db.run(count, sizes, workdir)
+            results.extend({'suite': suite, **result} for result in suite_results)
+        os.chdir(BACKEND_DIR)
+    return results
+
+
+def _key(result: Dict[str, Any]) -> Tuple[str, str, str]:
+    return result['suite'], result['name'], json.dumps(result['params'], sort_keys=True)
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], threshold: float) -> List[Dict[str, Any]]:
+    """
+    Compare median timings against a baseline run.
+
+    Args:
+        results: Results of this run
+        baseline: Results of the earlier run
+        threshold: Allowed slowdown as a fraction (0.2 = 20% slower)
+
+    Returns:
+        One entry per benchmark found in both runs, with the median ratio
+        and whether it counts as a regression
+    """
+    previous = {_key(result): result for result in baseline}
+    comparisons = []
+    for result in results:
+        before = previous.get(_key(result))
+        if before is None or not before['median_ms']:
+            continue
+        ratio = result['median_ms'] / before['median_ms']
+        comparisons.append({
+            'suite': result['suite'],
+            'name': result['name'],
+            'params': result['params'],
+            'baseline_median_ms': before['median_ms'],
+            'median_ms': result['median_ms'],
+            'ratio': round(ratio, 3),
+            'regression': ratio > 1 + threshold
+        })
+    return comparisons
+
+
+def _print_summary(results: List[Dict[str, Any]], comparisons: List[Dict[str, Any]]) -> None:
+    ratios = {_key(comparison): comparison for comparison in comparisons}
+    for result in results:
+        params = ' '.join(f"{k}={v}" for k, v in result['params'].items())
+        line = f"{result['suite']:8} {result['name']:22} {params:32} median {result['median_ms']:>10.3f} ms"
+        comparison = ratios.get(_key(result))
+        if comparison:
+            line += f"  x{comparison['ratio']:.2f}" + ("  REGRESSION" if comparison['regression'] else "")
+        if result['errors']:
+            line += f"  ({result['errors']} errors)"
+        print(line, file=sys.stderr)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run the backend benchmarks")
+    parser.add_argument('--suite', action='append', choices=SUITES, help="Suite to run (repeatable, default all)")
+    parser.add_argument('--iterations', type=int, default=None, help="Timed iterations per benchmark")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 5000], help="Table sizes for the db suite")
+    parser.add_argument('--api-rows', type=int, default=1000, help="Templates in the api suite's database")
+    parser.add_argument('--output', default='-', help="Results file ('-' for stdout)")
+    parser.add_argument('--compare', help="Earlier results file to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Allowed median slowdown for --compare")
+    args = parser.parse_args()
+
+    # Resolve paths before the suites change directory
+    output = None if args.output == '-' else os.path.abspath(args.output)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+
+    results = run_suites(args.suite or list(SUITES), args.iterations, args.sizes, args.api_rows)
+    comparisons = compare(results, baseline, args.threshold) if baseline is not None else []
+    report = {'meta': _meta(), 'results': results}
+    if baseline is not None:
+        report['comparison'] = comparisons
+
+    _print_summary(results, comparisons)
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    return 1 if any(comparison['regression'] for comparison in comparisons) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
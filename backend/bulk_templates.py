@@ -0,0 +1,71 @@
+"""
+Bulk template import/export from the command line.
+
+Usage:
+    python bulk_templates.py import templates.ndjson
+    python bulk_templates.py import templates.csv --batch-size 500
+    python bulk_templates.py export templates.csv
+    python bulk_templates.py export - --file-format ndjson > templates.ndjson
+
+Import prints one JSON result per row to stdout and a summary to stderr.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from routers.templates import validate_template_row
+from services.template_io import (
+    FILE_FORMATS,
+    export_templates,
+    guess_file_format,
+    import_templates,
+    read_rows
+)
+from services.worker_pool import sandbox_pool
+
+
+async def run_import(path: str, file_format: str, batch_size: int) -> int:
+    summary = {}
+    with open(path, encoding='utf-8-sig', newline='') as stream:
+        async for result in import_templates(read_rows(stream, file_format), validate_template_row, batch_size):
+            if 'summary' in result:
+                summary = result['summary']
+            else:
+                print(json.dumps(result, default=str))
+
+    print(f"Created {summary.get('created', 0)}, failed {summary.get('failed', 0)}", file=sys.stderr)
+    return 1 if summary.get('failed') else 0
+
+
+async def run_export(path: str, file_format: str) -> int:
+    out = sys.stdout if path == '-' else open(path, 'w', encoding='utf-8', newline='')
+    try:
+        async for chunk in export_templates(file_format):
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Bulk import/export question templates")
+    parser.add_argument('command', choices=['import', 'export'])
+    parser.add_argument('path', help="File to read or write ('-' exports to stdout)")
+    parser.add_argument('--file-format', choices=FILE_FORMATS, help="Defaults to the file extension")
+    parser.add_argument('--batch-size', type=int, default=None, help="Rows per import batch")
+    args = parser.parse_args()
+
+    file_format = args.file_format or guess_file_format(args.path)
+
+    try:
+        if args.command == 'import':
+            sandbox_pool.start()
+            return asyncio.run(run_import(args.path, file_format, args.batch_size))
+        return asyncio.run(run_export(args.path, file_format))
+    finally:
+        sandbox_pool.shutdown()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,4 @@
+import os
 from pydantic_settings import BaseSettings
 from typing import List
 
@@ -9,11 +10,93 @@ class Settings(BaseSettings):
     SUPABASE_URL: str
     SUPABASE_KEY: str
     
+    # Local Database Configuration (used when SUPABASE_KEY is missing)
+    LOCAL_DB_BACKEND: str = "sqlite"  # "sqlite" or "json" (legacy local_db.json)
+    LOCAL_DB_PATH: str = "local_db.sqlite3"
+    DB_POOL_SIZE: int = 16  # Threads running blocking database calls
+    
     # Backend Configuration
     BACKEND_CORS_ORIGINS: str = "http://localhost:8000,http://127.0.0.1:8000"
     
-    # Execution Configuration
-    EXECUTION_TIMEOUT: int = 2
+    # Execution Configuration (limits for one template run)
+    EXECUTION_TIMEOUT: float = 2  # Wall-clock seconds, fractions allowed
+    EXECUTION_CPU_LIMIT: float = 2  # CPU seconds, fractions allowed
+    EXECUTION_MAX_OUTPUT_BYTES: int = 64 * 1024  # Pickled size of the question and answer
+    EXECUTION_MAX_RECURSION_DEPTH: int = 100  # Nested calls inside template code
+    
+    # Sandbox Worker Pool Configuration
+    SANDBOX_POOL_SIZE: int = 0  # 0 = one worker per CPU core
+    SANDBOX_MAX_JOBS_PER_WORKER: int = 1000  # Recycle a worker after this many jobs
+    SANDBOX_CPU_LIMIT: int = 2  # CPU seconds allowed per job
+    SANDBOX_MEMORY_LIMIT_MB: int = 256  # Memory a worker may allocate beyond its baseline, 0 = unlimited
+    SANDBOX_KILL_GRACE: float = 1.0  # Extra wall-clock seconds before a stuck worker is killed
+    SANDBOX_START_METHOD: str = "forkserver"  # Falls back to "spawn" where forkserver is unavailable
+    CODE_CACHE_SIZE: int = 1024  # Compiled templates kept in memory
+    
+    # Question Generation Configuration
+    GENERATION_MAX_COUNT: int = 10000  # Instances per generate request
+    GENERATION_CHUNK_SIZE: int = 100  # Instances per sandbox worker job, at most
+    GENERATION_CHUNK_TARGET_MS: float = 250  # Sandbox time per job aimed for, using the template's estimated_cost_ms
+    GENERATION_UNIQUE_MAX_COUNT: int = 1000  # Instances per unique generate request
+    GENERATION_UNIQUE_ATTEMPTS_FACTOR: int = 10  # Seeds tried per requested unique instance, at most
+    GENERATION_UNIQUE_STALL_LIMIT: int = 200  # Repeats in a row before the output space counts as exhausted
+    
+    # Background Generation Jobs Configuration
+    JOBS_DB_PATH: str = "jobs.sqlite3"  # SQLite file holding jobs and their results
+    JOBS_MAX_COUNT: int = 100000  # Instances per job
+    JOBS_MAX_RUNNING: int = 4  # Jobs generating at once
+    JOBS_MAX_RUNNING_PER_USER: int = 1  # Jobs generating at once per user
+    JOBS_MAX_ACTIVE_PER_USER: int = 10  # Queued plus running jobs per user
+    JOBS_RETENTION_HOURS: float = 24  # Finished jobs and their results are deleted after this
+    JOBS_POLL_INTERVAL: float = 1.0  # Seconds between claiming, heartbeat and cancellation checks
+    JOBS_STALE_SECONDS: float = 30  # Running jobs without a heartbeat for this long are requeued
+    
+    # Grading Configuration
+    GRADE_MAX_ITEMS: int = 10000  # Responses per grading request
+    GRADE_NUMERIC_TOLERANCE: float = 1e-6  # Default absolute tolerance for Numerical Input
+    GRADE_NUMERIC_REL_TOLERANCE: float = 1e-9  # Relative tolerance for Numerical Input
+    
+    # Paper Assembly Configuration
+    PAPER_MAX_QUESTIONS: int = 1000  # Questions per paper
+    PAPER_MAX_SECTIONS: int = 50  # Blueprint entries per paper
+    PAPER_TIMEOUT_SECONDS: float = 30  # Deadline for assembling a whole paper
+    PAPER_CHUNK_SIZE: int = 20  # Questions per sandbox worker job (smaller spreads a paper over more workers)
+    
+    # Metrics Configuration
+    METRICS_MAX_TEMPLATES: int = 1000  # Distinct template labels in /metrics before folding into 'other'
+    METRICS_SLOWEST_COUNT: int = 10  # Slowest executions kept for /metrics/slowest
+    METRICS_PROFILE: bool = False  # Capture cProfile/tracemalloc reports for the slowest executions
+    
+    # Save-time Template Validation
+    TEMPLATE_TRIAL_RUNS: int = 5  # Seeded trial executions when a template is saved
+    TEMPLATE_MAX_RANGE: int = 1_000_000  # Longest constant range() allowed in a template
+    
+    # Bulk Import/Export Configuration
+    BULK_BATCH_SIZE: int = 200  # Rows validated and inserted per batch
+    BULK_EXPORT_PAGE_SIZE: int = 500  # Rows fetched per export query
+    
+    # Rendered Question Cache Configuration
+    RESULT_CACHE_MAX_ENTRIES: int = 50000
+    RESULT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    RESULT_CACHE_TTL: float = 3600  # Seconds, 0 = never expire
+    RESULT_CACHE_SPILL_DIR: str = ""  # Directory for the on-disk tier, empty = disabled
+    RESULT_CACHE_SPILL_MAX_ENTRIES: int = 1000000
+    
+    # HTTP Caching and Compression
+    HTTP_ETAG_MAX_BYTES: int = 1024 * 1024  # Largest GET body hashed for an ETag
+    HTTP_COMPRESS_MIN_BYTES: int = 1024  # Smaller bodies are sent uncompressed
+    HTTP_GZIP_LEVEL: int = 6
+    HTTP_BROTLI_QUALITY: int = 5  # Used only if the brotli package is installed
+    
+    # Multi-worker Server Configuration (serve.py)
+    SERVER_WORKERS: int = 0  # API worker processes, 0 = one per CPU core
+    SERVER_GRACEFUL_TIMEOUT: float = 30  # Seconds a stopping worker may spend finishing requests
+    SHARED_STATE_DB_PATH: str = "shared_state.sqlite3"  # Versions and counters shared by worker processes
+    
+    # Template Metadata Cache Configuration (skills, suggestions, next-format)
+    METADATA_CACHE_MAX_ENTRIES: int = 2048  # Cached responses
+    METADATA_CACHE_REFRESH_SECONDS: float = 0  # Reload from the database on this schedule, 0 = only on writes
+    METADATA_CACHE_SYNC_SECONDS: float = 0.5  # How often reads check for templates written by other worker processes
     
     class Config:
         env_file = ".env"
@@ -23,6 +106,11 @@ class Settings(BaseSettings):
     def cors_origins(self) -> List[str]:
         """Parse CORS origins from comma-separated string."""
         return [origin.strip() for origin in self.BACKEND_CORS_ORIGINS.split(",")]
+    
+    @property
+    def sandbox_pool_size(self) -> int:
+        """Resolve the number of sandbox worker processes."""
+        return self.SANDBOX_POOL_SIZE or os.cpu_count() or 1
 
 
 # Global settings instance
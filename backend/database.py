@@ -1,19 +1,48 @@
+import asyncio
 import json
 import os
-from typing import Any, Dict, List
-from supabase import create_client, Client
+import sqlite3
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
 from config import settings
 
 class MockResponse:
     def __init__(self, data: List[Dict[str, Any]]):
         self.data = data
 
+class MockUniqueViolation(Exception):
+    """Unique constraint violation in the JSON mock (same SQLSTATE as Postgres)."""
+    code = '23505'
+
+class MockRPC:
+    """Deferred call of a local stand-in for a Postgres function (db.rpc())."""
+
+    def __init__(self, fn, params: Dict[str, Any]):
+        self.fn = fn
+        self.params = params
+
+    def execute(self) -> MockResponse:
+        return MockResponse(self.fn(**self.params))
+
+def is_unique_violation(error: Exception) -> bool:
+    """Check whether a database error is a unique constraint violation."""
+    # Postgres/PostgREST report SQLSTATE 23505; SQLite raises IntegrityError
+    if getattr(error, 'code', None) == '23505':
+        return True
+    return isinstance(error, sqlite3.IntegrityError) and 'UNIQUE' in str(error)
+
 class MockQueryBuilder:
     def __init__(self, table_name: str, db: 'MockDatabase'):
         self.table_name = table_name
         self.db = db
         self._data = []
         self._filters = []
+        self._order = []
+        self._limit = None
+        self._offset = 0
 
     def insert(self, data: Dict[str, Any]) -> 'MockQueryBuilder':
         self._data = [data] if isinstance(data, dict) else data
@@ -31,14 +60,35 @@ class MockQueryBuilder:
         self._filters.append(('ilike', column, value))
         return self
 
+    def order(self, column: str, desc: bool = False) -> 'MockQueryBuilder':
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, size: int) -> 'MockQueryBuilder':
+        self._limit = size
+        return self
+
+    def offset(self, size: int) -> 'MockQueryBuilder':
+        self._offset = size
+        return self
+
     def execute(self) -> MockResponse:
-        full_data = self.db._load_table(self.table_name)
-        
         # Handle Insert
         if self._data:
-            full_data.extend(self._data)
-            self.db._save_table(self.table_name, full_data)
+            # Mirror the id column default (gen_random_uuid()) from schema.sql
+            self._data = [
+                row if row.get('id') else {'id': str(uuid.uuid4()), **row}
+                for row in self._data
+            ]
+            with self.db._write_lock:
+                full_data = self.db._load_table(self.table_name)
+                if self.table_name == 'question_templates':
+                    self.db._check_unique_template(full_data, self._data)
+                full_data.extend(self._data)
+                self.db._save_table(self.table_name, full_data)
             return MockResponse(self._data)
+
+        full_data = self.db._load_table(self.table_name)
             
         # Handle Select
         results = full_data
@@ -52,10 +102,20 @@ class MockQueryBuilder:
                     row for row in results 
                     if str(row.get(col, '')).lower().find(clean_val) != -1
                 ]
+
+        # Stable sorts applied last-key-first give multi-column ordering
+        for col, desc in reversed(self._order):
+            results = sorted(results, key=lambda row: row.get(col), reverse=desc)
+        results = results[self._offset:]
+        if self._limit is not None:
+            results = results[:self._limit]
             
         return MockResponse(results)
 
 class MockClient:
+    # Serializes read-modify-write RPCs on the JSON file
+    _write_lock = threading.Lock()
+
     def __init__(self):
         self.db_file = "local_db.json"
         if not os.path.exists(self.db_file):
@@ -63,6 +123,10 @@ class MockClient:
                 json.dump({}, f)
     
     def _load_table(self, table_name: str) -> List[Dict[str, Any]]:
+        if table_name == 'skill_counts':
+            return self._skill_counts()
+        if table_name == 'template_format_counters':
+            return self._format_counters()
         try:
             with open(self.db_file, 'r') as f:
                 data = json.load(f)
@@ -70,6 +134,57 @@ class MockClient:
         except Exception:
             return []
 
+    def _skill_counts(self) -> List[Dict[str, Any]]:
+        # Computed on read here; SQLite and Postgres maintain it by trigger
+        counts = {}
+        for row in self._load_table('question_templates'):
+            key = (row.get('topic', ''), row.get('skill_name', ''))
+            counts[key] = counts.get(key, 0) + 1
+        return [
+            {'topic': topic, 'skill_name': skill_name, 'template_count': count}
+            for (topic, skill_name), count in counts.items()
+        ]
+
+    def _format_counters(self) -> List[Dict[str, Any]]:
+        # Computed on read here; SQLite and Postgres maintain it by trigger
+        counters = {}
+        for row in self._load_table('question_templates'):
+            key = (row.get('topic', ''), row.get('skill_name', ''))
+            counters[key] = max(counters.get(key, 0), row.get('format', 0))
+        return [
+            {'topic': topic, 'skill_name': skill_name, 'last_format': last_format}
+            for (topic, skill_name), last_format in counters.items()
+        ]
+
+    def _check_unique_template(self, rows: List[Dict[str, Any]], new_rows: List[Dict[str, Any]]):
+        # Mirror the unique_template index from schema.sql
+        taken = {(row.get('topic'), row.get('skill_name'), row.get('format')) for row in rows}
+        for row in new_rows:
+            key = (row.get('topic'), row.get('skill_name'), row.get('format'))
+            if key in taken:
+                raise MockUniqueViolation(f"duplicate key value violates unique constraint \"unique_template\": {key}")
+            taken.add(key)
+
+    def _rpc_insert_template_next_format(self, p_template: Dict[str, Any]) -> List[Dict[str, Any]]:
+        with self._write_lock:
+            rows = self._load_table('question_templates')
+            last_format = max(
+                (row.get('format', 0) for row in rows
+                 if row.get('topic') == p_template['topic']
+                 and row.get('skill_name') == p_template['skill_name']),
+                default=0
+            )
+            row = {'id': str(uuid.uuid4()), **p_template, 'format': last_format + 1}
+            rows.append(row)
+            self._save_table('question_templates', rows)
+        return [row]
+
+    def rpc(self, name: str, params: Dict[str, Any]) -> MockRPC:
+        fn = getattr(self, f"_rpc_{name}", None)
+        if fn is None:
+            raise ValueError(f"Unknown function: {name}")
+        return MockRPC(fn, params)
+
     def _save_table(self, table_name: str, table_data: List[Dict[str, Any]]):
         with open(self.db_file, 'r') as f:
             full_db = json.load(f)
@@ -82,6 +197,354 @@ class MockClient:
     def table(self, table_name: str) -> MockQueryBuilder:
         return MockQueryBuilder(table_name, self)
 
+# SQLite version of database/schema.sql (keep the two in sync)
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS question_templates (
+    id TEXT PRIMARY KEY,
+    module TEXT NOT NULL,
+    category TEXT NOT NULL,
+    grade INTEGER NOT NULL CHECK (grade >= 1 AND grade <= 10),
+    topic TEXT NOT NULL,
+    skill_name TEXT NOT NULL,
+    format INTEGER NOT NULL CHECK (format >= 1),
+    type TEXT NOT NULL,
+    question_template TEXT NOT NULL,
+    answer_template TEXT NOT NULL,
+    estimated_cost_ms REAL,
+    created_by TEXT NOT NULL,
+    updated_by TEXT NOT NULL,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_topic ON question_templates(topic);
+CREATE INDEX IF NOT EXISTS idx_topic_skill ON question_templates(topic, skill_name);
+CREATE INDEX IF NOT EXISTS idx_topic_skill_format ON question_templates(topic, skill_name, format);
+CREATE INDEX IF NOT EXISTS idx_created_by ON question_templates(created_by);
+CREATE INDEX IF NOT EXISTS idx_grade ON question_templates(grade);
+CREATE UNIQUE INDEX IF NOT EXISTS unique_template ON question_templates(topic, skill_name, format);
+
+CREATE TABLE IF NOT EXISTS skill_counts (
+    topic TEXT NOT NULL,
+    skill_name TEXT NOT NULL,
+    template_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (topic, skill_name)
+);
+CREATE TRIGGER IF NOT EXISTS trg_skill_counts_insert
+AFTER INSERT ON question_templates
+BEGIN
+    INSERT INTO skill_counts (topic, skill_name, template_count)
+    VALUES (NEW.topic, NEW.skill_name, 1)
+    ON CONFLICT (topic, skill_name) DO UPDATE SET template_count = template_count + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_skill_counts_delete
+AFTER DELETE ON question_templates
+BEGIN
+    UPDATE skill_counts SET template_count = template_count - 1
+    WHERE topic = OLD.topic AND skill_name = OLD.skill_name;
+    DELETE FROM skill_counts
+    WHERE topic = OLD.topic AND skill_name = OLD.skill_name AND template_count <= 0;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_skill_counts_update
+AFTER UPDATE OF topic, skill_name ON question_templates
+BEGIN
+    UPDATE skill_counts SET template_count = template_count - 1
+    WHERE topic = OLD.topic AND skill_name = OLD.skill_name;
+    DELETE FROM skill_counts
+    WHERE topic = OLD.topic AND skill_name = OLD.skill_name AND template_count <= 0;
+    INSERT INTO skill_counts (topic, skill_name, template_count)
+    VALUES (NEW.topic, NEW.skill_name, 1)
+    ON CONFLICT (topic, skill_name) DO UPDATE SET template_count = template_count + 1;
+END;
+
+CREATE TABLE IF NOT EXISTS template_format_counters (
+    topic TEXT NOT NULL,
+    skill_name TEXT NOT NULL,
+    last_format INTEGER NOT NULL,
+    PRIMARY KEY (topic, skill_name)
+);
+CREATE TRIGGER IF NOT EXISTS trg_format_counters_insert
+AFTER INSERT ON question_templates
+BEGIN
+    INSERT INTO template_format_counters (topic, skill_name, last_format)
+    VALUES (NEW.topic, NEW.skill_name, NEW.format)
+    ON CONFLICT (topic, skill_name) DO UPDATE SET last_format = MAX(last_format, excluded.last_format);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_format_counters_update
+AFTER UPDATE OF topic, skill_name, format ON question_templates
+BEGIN
+    INSERT INTO template_format_counters (topic, skill_name, last_format)
+    VALUES (NEW.topic, NEW.skill_name, NEW.format)
+    ON CONFLICT (topic, skill_name) DO UPDATE SET last_format = MAX(last_format, excluded.last_format);
+END;
+"""
+
+# Columns added after release: (table, column, type), applied to older database files
+SQLITE_MIGRATIONS = [
+    ('question_templates', 'estimated_cost_ms', 'REAL'),
+]
+
+# Backfill for databases created before skill_counts existed
+SQLITE_BACKFILL = """
+INSERT INTO skill_counts (topic, skill_name, template_count)
+SELECT topic, skill_name, COUNT(*) FROM question_templates
+WHERE NOT EXISTS (SELECT 1 FROM skill_counts)
+GROUP BY topic, skill_name;
+
+INSERT INTO template_format_counters (topic, skill_name, last_format)
+SELECT topic, skill_name, MAX(format) FROM question_templates
+WHERE NOT EXISTS (SELECT 1 FROM template_format_counters)
+GROUP BY topic, skill_name;
+"""
+
+
+class SQLiteQueryBuilder:
+    def __init__(self, table_name: str, db: 'SQLiteClient'):
+        if table_name not in db.columns:
+            raise ValueError(f"Unknown table: {table_name}")
+        self.table_name = table_name
+        self.db = db
+        self._data = []
+        self._columns = '*'
+        self._filters = []
+        self._order = []
+        self._limit = None
+        self._offset = 0
+
+    def insert(self, data: Dict[str, Any]) -> 'SQLiteQueryBuilder':
+        self._data = [data] if isinstance(data, dict) else data
+        return self
+
+    def select(self, columns: str) -> 'SQLiteQueryBuilder':
+        self._columns = columns
+        return self
+
+    def eq(self, column: str, value: Any) -> 'SQLiteQueryBuilder':
+        self._filters.append(('=', column, value))
+        return self
+
+    def ilike(self, column: str, value: str) -> 'SQLiteQueryBuilder':
+        # SQLite LIKE is case-insensitive for ASCII, like Postgres ILIKE
+        self._filters.append(('LIKE', column, value))
+        return self
+
+    def order(self, column: str, desc: bool = False) -> 'SQLiteQueryBuilder':
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, size: int) -> 'SQLiteQueryBuilder':
+        self._limit = size
+        return self
+
+    def offset(self, size: int) -> 'SQLiteQueryBuilder':
+        self._offset = size
+        return self
+
+    def _column_list(self) -> str:
+        if self._columns.strip() == '*':
+            return '*'
+        names = [name.strip() for name in self._columns.split(',')]
+        return ', '.join(self.db.check_column(self.table_name, name) for name in names)
+
+    def execute(self) -> MockResponse:
+        if self._data:
+            return MockResponse(self.db.insert_rows(self.table_name, self._data))
+
+        sql = f"SELECT {self._column_list()} FROM {self.table_name}"
+        params = []
+        if self._filters:
+            clauses = []
+            for op, col, val in self._filters:
+                clauses.append(f"{self.db.check_column(self.table_name, col)} {op} ?")
+                params.append(val)
+            sql += " WHERE " + " AND ".join(clauses)
+        if self._order:
+            sql += " ORDER BY " + ", ".join(
+                self.db.check_column(self.table_name, col) + (" DESC" if desc else "")
+                for col, desc in self._order
+            )
+        if self._limit is not None or self._offset:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([self._limit if self._limit is not None else -1, self._offset])
+
+        return MockResponse(self.db.query(self.table_name, sql, tuple(params)))
+
+
+class SQLiteClient:
+    """
+    Embedded SQLite backend with the same query surface as the Supabase client.
+
+    Uses the indexes from database/schema.sql, one connection per thread in
+    WAL mode, transactional (atomic) inserts and an in-process cache of
+    SELECT results that is invalidated whenever the database is written,
+    by this process or another one sharing the file.
+    """
+
+    CACHE_SIZE = 256
+
+    def __init__(self, db_file: Optional[str] = None):
+        self.db_file = db_file or settings.LOCAL_DB_PATH
+        self._local = threading.local()
+        self._cache: "OrderedDict[tuple, List[Dict[str, Any]]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # Bumped on every write; triggers mean one write can touch several tables
+        self._version = 0
+
+        conn = self._connection()
+        conn.executescript(SQLITE_SCHEMA)
+        self.columns = {
+            table: [row['name'] for row in conn.execute(f"PRAGMA table_info({table})")]
+            for (table,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        }
+        for table, column, column_type in SQLITE_MIGRATIONS:
+            if column not in self.columns[table]:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+                self.columns[table].append(column)
+        self._import_json()
+        conn.executescript(SQLITE_BACKFILL)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _import_json(self, json_file: str = "local_db.json"):
+        """One-time import of the legacy JSON mock database."""
+        conn = self._connection()
+        if conn.execute("SELECT 1 FROM question_templates LIMIT 1").fetchone():
+            return
+        if not os.path.exists(json_file):
+            return
+        try:
+            with open(json_file, 'r') as f:
+                data = json.load(f)
+        except Exception:
+            return
+        for table_name, rows in data.items():
+            if table_name in self.columns and rows:
+                self.insert_rows(table_name, rows)
+
+    def check_column(self, table_name: str, column: str) -> str:
+        if column not in self.columns[table_name]:
+            raise ValueError(f"Unknown column: {table_name}.{column}")
+        return column
+
+    def insert_rows(self, table_name: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # Mirror the id column default (gen_random_uuid()) from schema.sql
+        rows = [row if row.get('id') else {'id': str(uuid.uuid4()), **row} for row in rows]
+        return self._write(lambda conn: self._insert(conn, table_name, rows))
+
+    def _write(self, fn) -> Any:
+        """Run fn(conn) in one write transaction and invalidate the query cache."""
+        conn = self._connection()
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        with self._cache_lock:
+            self._version += 1
+
+        return result
+
+    def _insert(self, conn: sqlite3.Connection, table_name: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        for row in rows:
+            cols = [self.check_column(table_name, col) for col in row]
+            conn.execute(
+                f"INSERT INTO {table_name} ({', '.join(cols)}) "
+                f"VALUES ({', '.join('?' for _ in cols)})",
+                tuple(row.values())
+            )
+        ids = [row['id'] for row in rows]
+        inserted = {
+            row['id']: dict(row)
+            for row in conn.execute(
+                f"SELECT * FROM {table_name} WHERE id IN ({', '.join('?' for _ in ids)})",
+                ids
+            )
+        }
+        # Same order as passed in, as PostgREST returns them
+        return [inserted[row_id] for row_id in ids]
+
+    def _rpc_insert_template_next_format(self, p_template: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Allocate the next format for (topic, skill_name) and insert, atomically."""
+        def allocate_and_insert(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+            key = (p_template['topic'], p_template['skill_name'])
+            conn.execute(
+                "INSERT INTO template_format_counters (topic, skill_name, last_format) "
+                "VALUES (?, ?, 1) "
+                "ON CONFLICT (topic, skill_name) DO UPDATE SET last_format = last_format + 1",
+                key
+            )
+            (last_format,) = conn.execute(
+                "SELECT last_format FROM template_format_counters "
+                "WHERE topic = ? AND skill_name = ?",
+                key
+            ).fetchone()
+            row = {'id': str(uuid.uuid4()), **p_template, 'format': last_format}
+            return self._insert(conn, 'question_templates', [row])
+
+        return self._write(allocate_and_insert)
+
+    def rpc(self, name: str, params: Dict[str, Any]) -> MockRPC:
+        fn = getattr(self, f"_rpc_{name}", None)
+        if fn is None:
+            raise ValueError(f"Unknown function: {name}")
+        return MockRPC(fn, params)
+
+    def _check_external_writes(self, conn: sqlite3.Connection) -> None:
+        """Invalidate the query cache if another connection (e.g. another API worker process) committed."""
+        # data_version changes whenever a different connection commits to the file
+        (data_version,) = conn.execute("PRAGMA data_version").fetchone()
+        if data_version != getattr(self._local, 'data_version', None):
+            self._local.data_version = data_version
+            with self._cache_lock:
+                self._version += 1
+
+    def query(self, table_name: str, sql: str, params: tuple) -> List[Dict[str, Any]]:
+        conn = self._connection()
+        self._check_external_writes(conn)
+
+        with self._cache_lock:
+            key = (self._version, sql, params)
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return [dict(row) for row in cached]
+
+        rows = [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+        with self._cache_lock:
+            self._cache[key] = rows
+            while len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+        return [dict(row) for row in rows]
+
+    def table(self, table_name: str) -> SQLiteQueryBuilder:
+        return SQLiteQueryBuilder(table_name, self)
+
+
+def create_local_client() -> Any:
+    """Create the offline database client selected by LOCAL_DB_BACKEND."""
+    if settings.LOCAL_DB_BACKEND == "json":
+        return MockClient()
+    return SQLiteClient()
+
+
+def uses_local_db() -> bool:
+    """Whether SUPABASE_KEY is missing, so the local database is used."""
+    return not settings.SUPABASE_KEY or settings.SUPABASE_KEY == "YOUR_SUPABASE_KEY"
+
+
 class Database:
     """Database client wrapper handling both Supabase and Mock."""
     
@@ -91,20 +554,23 @@ class Database:
     def get_client(self) -> Any:
         """Get the database client instance."""
         if self._client is None:
-            print(f"DEBUG: SUPABASE_KEY loaded: '{settings.SUPABASE_KEY}'")
             # Check if key is valid/present
-            if not settings.SUPABASE_KEY or settings.SUPABASE_KEY == "YOUR_SUPABASE_KEY":
-                print("WARNING: Using Mock Database (local_db.json) because SUPABASE_KEY is missing.")
-                self._client = MockClient()
+            if uses_local_db():
+                print(f"WARNING: Using local {settings.LOCAL_DB_BACKEND} database because SUPABASE_KEY is missing.")
+                self._client = create_local_client()
             else:
                 try:
+                    # Imported here: the supabase/httpx stack is the slowest
+                    # import in the app and local mode never needs it
+                    from supabase import create_client
+                    
                     self._client = create_client(
                         settings.SUPABASE_URL,
                         settings.SUPABASE_KEY
                     )
                 except Exception as e:
-                    print(f"ERROR: Failed to connect to Supabase: {e}. Falling back to Mock DB.")
-                    self._client = MockClient()
+                    print(f"ERROR: Failed to connect to Supabase: {e}. Falling back to local database.")
+                    self._client = create_local_client()
                     
         return self._client
 
@@ -113,6 +579,32 @@ class Database:
 db = Database()
 
 
+# Threads that run blocking database calls for the async routers
+_db_executor = ThreadPoolExecutor(
+    max_workers=settings.DB_POOL_SIZE,
+    thread_name_prefix="db"
+)
+
+
 def get_db() -> Any:
     """Dependency function to get database client."""
     return db.get_client()
+
+
+async def run_query(query: Any) -> Any:
+    """
+    Execute a query builder without blocking the event loop.
+
+    Both the Supabase client and the local clients are synchronous, so
+    .execute() runs on a dedicated, bounded thread pool. Concurrent
+    requests overlap their database I/O, and the Supabase client's pooled
+    HTTP connections are shared by those threads.
+
+    Args:
+        query: Query builder (anything with an .execute() method)
+
+    Returns:
+        The query response
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, query.execute)
@@ -50,11 +50,7 @@ question = f"What is {a} + {b}?"`);
 
     // Set default template
     answerEditor.setValue(`# Example: Calculate the answer
-import random
-
-a = random.randint(1, 10)
-b = random.randint(1, 10)
-
+# Runs after the question template, so a and b are already defined
 answer = a + b`);
 });
 
@@ -266,7 +262,7 @@ document.getElementById('templateForm').addEventListener('submit', async (e) =>
         hideLoading();
 
         if (response.success) {
-            showAlert('Template saved successfully!', 'success');
+            showAlert(`Template saved successfully as format ${response.data.format}!`, 'success');
 
             // Redirect after 2 seconds
             setTimeout(() => {
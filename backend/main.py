@@ -1,7 +1,18 @@
+import asyncio
+import os
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from config import settings
-from routers import users, skills, suggestions, templates, preview
+from database import get_db
+from middleware import CompressionMiddleware, ConditionalGetMiddleware
+from routers import users, skills, suggestions, templates, preview, bulk, jobs, grading, papers
+from services.code_cache import code_cache
+from services.jobs import job_scheduler
+from services.metadata_cache import metadata_cache
+from services.metrics import metrics
+from services.result_cache import result_cache
+from services.worker_pool import sandbox_pool
 
 # Create FastAPI application
 app = FastAPI(
@@ -27,12 +38,69 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ETags/Cache-Control on GET responses, then compression (outermost)
+app.add_middleware(ConditionalGetMiddleware)
+app.add_middleware(CompressionMiddleware)
+
 # Include routers
 app.include_router(users.router)
 app.include_router(skills.router)
 app.include_router(suggestions.router)
 app.include_router(templates.router)
 app.include_router(preview.router)
+app.include_router(bulk.router)
+app.include_router(jobs.router)
+app.include_router(grading.router)
+app.include_router(papers.router)
+
+
+@app.on_event("startup")
+async def connect_database():
+    """Create the database client off the event loop."""
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, get_db)
+
+
+@app.on_event("startup")
+async def start_sandbox_pool():
+    """Spawn and warm up the sandbox worker processes."""
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, sandbox_pool.start)
+
+
+@app.on_event("startup")
+async def start_job_scheduler():
+    """Open the job store and resume unfinished generation jobs."""
+    await job_scheduler.start()
+
+
+@app.on_event("startup")
+async def start_metadata_refresh():
+    """Reload template metadata on a schedule if METADATA_CACHE_REFRESH_SECONDS is set."""
+    if settings.METADATA_CACHE_REFRESH_SECONDS > 0:
+        app.state.metadata_refresh = asyncio.create_task(
+            metadata_cache.refresh_periodically(settings.METADATA_CACHE_REFRESH_SECONDS)
+        )
+
+
+@app.on_event("shutdown")
+async def stop_metadata_refresh():
+    """Stop the scheduled metadata refresh."""
+    task = getattr(app.state, 'metadata_refresh', None)
+    if task is not None:
+        task.cancel()
+
+
+@app.on_event("shutdown")
+async def stop_job_scheduler():
+    """Stop running jobs; they restart on the next start."""
+    await job_scheduler.shutdown()
+
+
+@app.on_event("shutdown")
+def stop_sandbox_pool():
+    """Stop the sandbox worker processes."""
+    sandbox_pool.shutdown()
 
 
 @app.get("/")
@@ -50,7 +118,36 @@ async def health_check():
     return {
         "status": "healthy",
         "version": "1.0.0",
-        "environment": "development"
+        "environment": "development",
+        "pid": os.getpid(),
+        "sandbox_pool": sandbox_pool.stats(),
+        "code_cache": code_cache.stats(),
+        "result_cache": result_cache.stats(),
+        "metadata_cache": metadata_cache.stats(),
+        "jobs": job_scheduler.stats()
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Sandbox timing histograms, error counters and cache stats in Prometheus text format."""
+    return metrics.render({
+        "sandbox_pool": sandbox_pool.stats(),
+        "code_cache": code_cache.stats(),
+        "result_cache": result_cache.stats(),
+        "metadata_cache": metadata_cache.stats()
+    })
+
+
+@app.get("/metrics/slowest")
+async def get_slowest_executions():
+    """
+    Slowest sandbox executions with their template id, seed and phase timings.
+    Includes cProfile/tracemalloc reports when METRICS_PROFILE is enabled.
+    """
+    return {
+        "profiling": settings.METRICS_PROFILE,
+        "executions": metrics.slowest()
     }
 
 
@@ -0,0 +1,239 @@
+import hashlib
+import zlib
+from typing import Dict, List, Optional, Tuple
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from config import settings
+from services.metadata_cache import etag_matches
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip only
+    brotli = None
+
+# Cache-Control for GET responses that do not set their own; first matching prefix wins
+CACHE_POLICIES: List[Tuple[str, str]] = [
+    ('/api/users', 'public, max-age=300'),  # Predefined in code, changes only on deploy
+    ('/api/', 'no-cache'),  # Revalidate with If-None-Match
+]
+
+# Already compressed, or not worth compressing
+_SKIP_COMPRESSION = ('image/', 'video/', 'audio/', 'application/zip', 'application/gzip')
+
+
+def _cache_policy(path: str) -> Optional[str]:
+    for prefix, policy in CACHE_POLICIES:
+        if path.startswith(prefix):
+            return policy
+    return None
+
+
+class ConditionalGetMiddleware:
+    """
+    ETag, If-None-Match and Cache-Control for GET responses.
+
+    Responses that already carry an ETag (the metadata cache routes, whose
+    ETags change with the cache version) only get a Cache-Control default.
+    Other successful GET responses with a known length of at most
+    HTTP_ETAG_MAX_BYTES are buffered and given an ETag hashed from the body;
+    if it matches If-None-Match the body is replaced by 304 Not Modified.
+    Streaming responses pass through untouched.
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: Optional[int] = None):
+        self.app = app
+        self.max_bytes = max_bytes or settings.HTTP_ETAG_MAX_BYTES
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or scope['method'] not in ('GET', 'HEAD'):
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = Headers(scope=scope).get('if-none-match')
+        policy = _cache_policy(scope['path'])
+        start: Optional[Message] = None
+        chunks: List[bytes] = []
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start
+
+            if message['type'] == 'http.response.start':
+                headers = MutableHeaders(scope=message)
+                if policy and 'cache-control' not in headers:
+                    headers['Cache-Control'] = policy
+                length = headers.get('content-length')
+                if (
+                    message['status'] == 200
+                    and 'etag' not in headers
+                    and length is not None
+                    and int(length) <= self.max_bytes
+                ):
+                    start = message
+                    return
+                await send(message)
+                return
+
+            if start is None:
+                await send(message)
+                return
+
+            chunks.append(message.get('body', b''))
+            if message.get('more_body', False):
+                return
+
+            body = b''.join(chunks)
+            etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+            headers = MutableHeaders(scope=start)
+            headers['ETag'] = etag
+
+            if etag_matches(if_none_match, etag):
+                not_modified = {
+                    key: value for key, value in headers.items()
+                    if key not in ('content-length', 'content-type')
+                }
+                await send({
+                    'type': 'http.response.start',
+                    'status': 304,
+                    'headers': [(key.encode('latin-1'), value.encode('latin-1')) for key, value in not_modified.items()]
+                })
+                await send({'type': 'http.response.body', 'body': b''})
+                return
+
+            await send(start)
+            await send({'type': 'http.response.body', 'body': body})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+class _Encoder:
+    """Incremental gzip or brotli encoder; compress(..., flush=True) emits everything so far."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._brotli = brotli.Compressor(quality=settings.HTTP_BROTLI_QUALITY)
+        else:
+            self._zlib = zlib.compressobj(settings.HTTP_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, flush: bool) -> bytes:
+        if self.encoding == 'br':
+            out = self._brotli.process(data)
+            return out + (self._brotli.flush() if flush else b'')
+        out = self._zlib.compress(data)
+        return out + (self._zlib.flush(zlib.Z_SYNC_FLUSH) if flush else b'')
+
+    def finish(self) -> bytes:
+        if self.encoding == 'br':
+            return self._brotli.finish()
+        return self._zlib.flush(zlib.Z_FINISH)
+
+
+def _choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Preferred encoding the client accepts: br (if brotli is installed), then gzip."""
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+
+    if brotli is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', accepted.get('*', 0)) > 0:
+        return 'gzip'
+    return None
+
+
+class CompressionMiddleware:
+    """
+    Brotli or gzip compression of response bodies.
+
+    Bodies shorter than HTTP_COMPRESS_MIN_BYTES are sent as is. Streaming
+    responses (generation output, job streams) are compressed chunk by
+    chunk and flushed after each one, so clients still see results as they
+    are produced. Strong ETags become weak, since the bytes on the wire
+    differ from the uncompressed representation. Brotli is used only when
+    the optional brotli package is installed.
+    """
+
+    def __init__(self, app: ASGIApp, min_bytes: Optional[int] = None):
+        self.app = app
+        self.min_bytes = min_bytes if min_bytes is not None else settings.HTTP_COMPRESS_MIN_BYTES
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        encoding = _choose_encoding(Headers(scope=scope).get('accept-encoding', ''))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        encoder: Optional[_Encoder] = None
+        passthrough = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start, encoder, passthrough
+
+            if message['type'] == 'http.response.start':
+                headers = Headers(raw=message['headers'])
+                content_type = headers.get('content-type', '')
+                if (
+                    'content-encoding' in headers
+                    or content_type.startswith(_SKIP_COMPRESSION)
+                    or message['status'] in (204, 304)
+                ):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start = message
+                return
+
+            if passthrough or message['type'] != 'http.response.body':
+                await send(message)
+                return
+
+            body = message.get('body', b'')
+            more_body = message.get('more_body', False)
+
+            if encoder is None:
+                if not more_body and len(body) < self.min_bytes:
+                    # Whole body is in hand and too small to be worth it
+                    passthrough = True
+                    MutableHeaders(scope=start).add_vary_header('Accept-Encoding')
+                    await send(start)
+                    await send(message)
+                    return
+
+                encoder = _Encoder(encoding)
+                headers = MutableHeaders(scope=start)
+                headers['Content-Encoding'] = encoding
+                headers.add_vary_header('Accept-Encoding')
+                if 'content-length' in headers:
+                    del headers['content-length']
+                etag = headers.get('etag')
+                if etag and not etag.startswith('W/'):
+                    headers['ETag'] = 'W/' + etag
+                if not more_body:
+                    compressed = encoder.compress(body, flush=False) + encoder.finish()
+                    headers['Content-Length'] = str(len(compressed))
+                    await send(start)
+                    await send({'type': 'http.response.body', 'body': compressed})
+                    return
+                await send(start)
+
+            if more_body:
+                await send({'type': 'http.response.body', 'body': encoder.compress(body, flush=True), 'more_body': True})
+            else:
+                await send({'type': 'http.response.body', 'body': encoder.compress(body, flush=False) + encoder.finish()})
+
+        await self.app(scope, receive, send_wrapper)
+
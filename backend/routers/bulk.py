@@ -0,0 +1,79 @@
+import io
+import json
+from fastapi import APIRouter, File, Query, UploadFile
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, BinaryIO, Optional
+from routers.templates import validate_template_row
+from services.template_io import export_templates, guess_file_format, import_templates, read_rows
+
+router = APIRouter(prefix="/api", tags=["bulk"])
+
+
+async def _stream_import(upload: BinaryIO, file_format: str) -> AsyncIterator[str]:
+    """Run the import and serialize its results as NDJSON."""
+    try:
+        stream = io.TextIOWrapper(upload, encoding='utf-8-sig', newline='')
+        rows = read_rows(stream, file_format)
+        async for result in import_templates(rows, validate_template_row):
+            yield json.dumps(result, default=str) + "\n"
+    finally:
+        upload.close()
+
+
+@router.post("/templates/import")
+async def import_templates_file(
+    file: UploadFile = File(...),
+    file_format: Optional[str] = Query(None, pattern="^(ndjson|csv)$")
+) -> StreamingResponse:
+    """
+    Bulk import templates from an NDJSON or CSV file.
+
+    Rows use the POST /api/templates fields (CSV: one column per field).
+    The file is processed in batches: each row is validated, compile-checked
+    across the sandbox workers and inserted, and its result streamed back
+    as soon as its batch is done. Bad rows are reported without stopping
+    the import.
+
+    Args:
+        file: Uploaded NDJSON or CSV file
+        file_format: 'ndjson' or 'csv' (guessed from the file name if omitted)
+
+    Returns:
+        Streaming NDJSON response with one result per row, then a summary line
+    """
+    file_format = file_format or guess_file_format(file.filename)
+
+    # FastAPI closes uploads when the handler returns, before the response
+    # streams; take over the spooled file and close it when the import ends
+    upload = file.file
+    file.file = io.BytesIO()
+
+    return StreamingResponse(_stream_import(upload, file_format), media_type="application/x-ndjson")
+
+
+@router.get("/templates/export")
+async def export_templates_file(
+    file_format: str = Query("ndjson", pattern="^(ndjson|csv)$")
+) -> StreamingResponse:
+    """
+    Export all templates as NDJSON or CSV.
+
+    Rows are fetched page by page and streamed as they arrive, so large
+    exports run in constant memory. The output can be imported again.
+
+    Args:
+        file_format: 'ndjson' or 'csv'
+
+    Returns:
+        Streaming file download
+    """
+    if file_format == "csv":
+        media_type = "text/csv"
+    else:
+        media_type = "application/x-ndjson"
+
+    return StreamingResponse(
+        export_templates(file_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="templates.{file_format}"'}
+    )
@@ -0,0 +1,52 @@
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from typing import Any, List, Optional
+from config import settings
+from services.grading import grade_batch
+
+router = APIRouter(prefix="/api", tags=["grading"])
+
+
+class GradeItem(BaseModel):
+    """One student response to a generated question."""
+    template_id: str = Field(..., min_length=1, description="Template the question came from")
+    seed: int = Field(..., ge=0, description="Seed the question was generated with")
+    response: Any = Field(..., description="Student's response (number, text, bool or list of options)")
+
+
+class GradeRequest(BaseModel):
+    """Schema for a batch grading request."""
+    items: List[GradeItem] = Field(..., min_length=1, max_length=settings.GRADE_MAX_ITEMS)
+    tolerance: Optional[float] = Field(None, ge=0, description="Absolute tolerance for Numerical Input")
+    include_answers: bool = Field(False, description="Return the expected answer with each result")
+
+
+@router.post("/grade")
+async def grade_responses(request: GradeRequest) -> dict:
+    """
+    Grade a batch of responses against regenerated questions.
+
+    Each item's answer is regenerated from (template_id, seed), or read from
+    the rendered question cache, and compared according to the template's
+    type: MCQ (the one correct option), MAQ (the exact set of options, in
+    any order), Numerical Input (within tolerance; '3/4' and '1,000' are
+    read as numbers), Text Input (ignoring case and extra whitespace) and
+    True-or-False (true/false, yes/no, t/f or 1/0). Every distinct seed runs
+    in the sandbox at most once per batch. Items that cannot be graded
+    (unknown template, failing template) get an error instead of a verdict.
+
+    Args:
+        request: Items to grade, numeric tolerance, and whether to return answers
+
+    Returns:
+        Dictionary with one result per item, in order, and a summary
+    """
+    try:
+        return await grade_batch(
+            [item.model_dump() for item in request.items],
+            request.tolerance,
+            request.include_answers
+        )
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to grade responses: {str(e)}")
@@ -0,0 +1,172 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Any, Dict, Optional
+from config import settings
+from routers.templates import get_template_by_id, stream_ndjson
+from routers.users import PREDEFINED_USERS
+from services.generator import TemplateCompileError, compile_template, random_seed
+from services.jobs import CANCELLED, JobLimitExceeded, job_scheduler
+
+router = APIRouter(prefix="/api", tags=["jobs"])
+
+
+class GenerateJobRequest(BaseModel):
+    """Schema for a background generation job."""
+    template_id: str = Field(..., min_length=1, description="Template to generate from")
+    count: int = Field(..., ge=1, le=settings.JOBS_MAX_COUNT, description="Number of instances")
+    seed: Optional[int] = Field(None, ge=0, description="Base seed (random if omitted)")
+    priority: int = Field(0, ge=0, le=9, description="Higher runs first")
+    created_by: str = Field(..., min_length=1, description="Username of the requester")
+
+
+async def _get_job(job_id: str) -> Dict[str, Any]:
+    """Fetch a job or raise 404."""
+    job = await job_scheduler.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
+@router.post("/jobs/generate", status_code=202)
+async def create_generate_job(request: GenerateJobRequest) -> dict:
+    """
+    Queue a large generation request as a background job.
+
+    The job is generated by the local scheduler across the sandbox workers
+    and its results are stored as they complete. Poll GET /api/jobs/{id}
+    for progress and fetch results with /results (pages) or /stream
+    (follows the job until it finishes). Instance i uses seed + i, as in
+    POST /api/templates/{template_id}/generate.
+
+    Args:
+        request: Template, count, seed, priority and requesting user
+
+    Returns:
+        The queued job, including its id
+    """
+    if request.created_by not in PREDEFINED_USERS:
+        raise HTTPException(status_code=400, detail=f"Unknown user: {request.created_by}")
+
+    try:
+        template = await get_template_by_id(request.template_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch template: {str(e)}")
+
+    try:
+        # Fail now rather than in the background; also warms the code cache
+        await compile_template(template)
+    except TemplateCompileError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    seed = request.seed if request.seed is not None else random_seed()
+
+    try:
+        job = await job_scheduler.submit(
+            request.template_id, request.count, seed, request.created_by, request.priority
+        )
+    except JobLimitExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to create job: {str(e)}")
+
+    return {"job": job}
+
+
+@router.get("/jobs")
+async def list_jobs(
+    created_by: Optional[str] = Query(None, min_length=1),
+    limit: int = Query(50, ge=1, le=500)
+) -> dict:
+    """
+    List recent jobs, newest first.
+
+    Args:
+        created_by: Only this user's jobs
+        limit: Maximum number of jobs
+
+    Returns:
+        Dictionary containing the jobs
+    """
+    try:
+        return {"jobs": await job_scheduler.list(created_by, limit)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to list jobs: {str(e)}")
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str) -> dict:
+    """
+    Get a job's status and progress.
+
+    Returns:
+        Dictionary containing the job: status (queued, running, completed,
+        failed or cancelled), completed and errors counts, progress (0-1)
+    """
+    return {"job": await _get_job(job_id)}
+
+
+@router.get("/jobs/{job_id}/results")
+async def get_job_results(
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=10000)
+) -> dict:
+    """
+    Fetch a page of a job's results, available while the job is still running.
+
+    Args:
+        job_id: Job id
+        offset: Index of the first instance
+        limit: Maximum number of instances
+
+    Returns:
+        Dictionary containing the job, its instances, and the offset of the next page
+    """
+    job = await _get_job(job_id)
+    results = await job_scheduler.results(job_id, offset, limit)
+    return {
+        "job": job,
+        "results": results,
+        "next_offset": offset + len(results)
+    }
+
+
+@router.get("/jobs/{job_id}/stream")
+async def stream_job_results(job_id: str, offset: int = Query(0, ge=0)) -> StreamingResponse:
+    """
+    Stream a job's results as NDJSON as they are generated.
+
+    Instances already stored are sent right away, then new ones as the job
+    produces them. The last line is {"job": ...} with the final status.
+
+    Args:
+        job_id: Job id
+        offset: Index of the first instance (to resume a broken stream)
+
+    Returns:
+        Streaming NDJSON response
+    """
+    await _get_job(job_id)
+    return StreamingResponse(
+        stream_ndjson(job_scheduler.stream_results(job_id, offset)),
+        media_type="application/x-ndjson"
+    )
+
+
+@router.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str) -> dict:
+    """
+    Cancel a queued or running job. Results stored so far are kept.
+
+    Returns:
+        Dictionary containing the cancelled job
+    """
+    job = await job_scheduler.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    if job['status'] != CANCELLED:
+        raise HTTPException(status_code=409, detail=f"Job {job_id} already {job['status']}")
+    return {"job": job}
@@ -0,0 +1,76 @@
+import asyncio
+import time
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from config import settings
+from routers.templates import stream_ndjson
+from services.generator import random_seed
+from services.papers import PaperBlueprintError, assemble_paper, resolve_blueprint
+
+router = APIRouter(prefix="/api", tags=["papers"])
+
+
+class BlueprintEntry(BaseModel):
+    """One section of a paper: how many questions of a grade, topic and skill."""
+    grade: int = Field(..., ge=1, le=10, description="Grade level (1-10)")
+    topic: str = Field(..., min_length=1, description="Topic name")
+    skill_name: str = Field(..., min_length=1, description="Skill name")
+    count: int = Field(..., ge=1, le=settings.PAPER_MAX_QUESTIONS, description="Number of questions")
+
+
+class PaperRequest(BaseModel):
+    """Schema for a paper assembly request."""
+    blueprint: List[BlueprintEntry] = Field(..., min_length=1, max_length=settings.PAPER_MAX_SECTIONS)
+    seed: Optional[int] = Field(None, ge=0, description="Base seed (random if omitted)")
+
+
+@router.post("/papers")
+async def create_paper(request: PaperRequest) -> StreamingResponse:
+    """
+    Assemble a paper with answer key from a blueprint of skills.
+
+    Each blueprint entry is resolved to the question_templates rows of its
+    grade, topic and skill; a section cycles through them, so it mixes the
+    skill's formats. All questions are generated concurrently across the
+    sandbox workers and the paper is streamed back as NDJSON: a 'paper'
+    line (seed and resolved sections), one 'question' line per question in
+    order, and a final line with the 'answer_key' and a 'summary'. The
+    whole paper is bounded by PAPER_TIMEOUT_SECONDS; questions not
+    generated by then carry a TimeoutError instead of failing the paper.
+    Question n uses seed + n - 1 and has an instance_id that regenerates it.
+
+    Args:
+        request: Blueprint entries (grade, topic, skill_name, count) and optional seed
+
+    Returns:
+        Streaming NDJSON response
+    """
+    total = sum(entry.count for entry in request.blueprint)
+    if total > settings.PAPER_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Paper has {total} questions; at most {settings.PAPER_MAX_QUESTIONS} are allowed"
+        )
+
+    deadline = time.monotonic() + settings.PAPER_TIMEOUT_SECONDS
+
+    try:
+        sections = await asyncio.wait_for(
+            resolve_blueprint([entry.model_dump() for entry in request.blueprint]),
+            settings.PAPER_TIMEOUT_SECONDS
+        )
+    except PaperBlueprintError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Timed out resolving the paper's templates")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to resolve paper blueprint: {str(e)}")
+
+    seed = request.seed if request.seed is not None else random_seed()
+
+    return StreamingResponse(
+        stream_ndjson(assemble_paper(sections, seed, deadline)),
+        media_type="application/x-ndjson"
+    )
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
-from services.sandbox import execute_code
+from services.generator import TemplateCompileError, compile_template, random_seed
+from services.worker_pool import sandbox_pool
 from typing import Optional, Any
 
 router = APIRouter(prefix="/api", tags=["preview"])
@@ -11,48 +12,39 @@ class PreviewRequest(BaseModel):
     question_template: str = Field(..., min_length=1, description="Python code for question")
     answer_template: str = Field(..., min_length=1, description="Python code for answer")
     type: str = Field(..., description="Question type for display purposes")
+    seed: Optional[int] = Field(None, ge=0, description="Random seed (random if omitted)")
 
 
 @router.post("/preview")
 async def preview_template(request: PreviewRequest) -> dict:
     """
-    Execute question and answer templates in sandbox and return results.
+    Execute question and answer templates in sandbox worker processes and return results.
+    The answer template can use the variables defined by the question template.
     
     Args:
         request: Preview request with question and answer templates
         
     Returns:
-        Dictionary containing question, answer, and any errors
+        Dictionary containing question, answer, the seed used, and any errors
     """
-    result = {
-        "question": None,
-        "answer": None,
-        "error": None,
-        "error_type": None
-    }
+    seed = request.seed if request.seed is not None else random_seed()
     
     try:
-        # Execute question template
-        question_result = execute_code(request.question_template)
-        
-        if question_result['error']:
-            result['error'] = f"Question Template Error: {question_result['error']}"
-            result['error_type'] = question_result['error_type']
-            return result
-        
-        result['question'] = question_result['result']
-        
-        # Execute answer template
-        answer_result = execute_code(request.answer_template)
-        
-        if answer_result['error']:
-            result['error'] = f"Answer Template Error: {answer_result['error']}"
-            result['error_type'] = answer_result['error_type']
-            return result
-        
-        result['answer'] = answer_result['result']
-        
-        return result
+        # Compile question and answer as one unit (cached by source hash)
+        code_blob, answer_line = await compile_template(request.model_dump(), 'preview')
+    except TemplateCompileError as e:
+        return {
+            "question": None,
+            "answer": None,
+            "seed": seed,
+            "error": str(e),
+            "error_type": "SyntaxError"
+        }
+    
+    try:
+        # Run both parts in one shared namespace, in a single worker job
+        result = await sandbox_pool.execute_template(code_blob, answer_line, seed, template_id='preview')
+        return {"seed": seed, **result}
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Preview failed: {str(e)}")
@@ -1,51 +1,78 @@
-from fastapi import APIRouter, HTTPException
-from database import get_db
-from typing import List, Dict
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from database import get_db, run_query
+from services.metadata_cache import cached_response, metadata_cache
+from typing import Optional
 
 router = APIRouter(prefix="/api", tags=["skills"])
 
 
+async def _load_skills(limit: Optional[int], offset: int) -> dict:
+    """Read one page of skills from the skill_counts summary table."""
+    db = get_db()
+    
+    query = db.table('skill_counts')\
+        .select('topic, skill_name, template_count')\
+        .order('topic')\
+        .order('skill_name')
+    
+    if offset:
+        query = query.offset(offset)
+    if limit is not None:
+        # Fetch one extra row to know whether another page exists
+        query = query.limit(limit + 1)
+    
+    response = await run_query(query)
+    rows = response.data or []
+    
+    has_more = limit is not None and len(rows) > limit
+    if has_more:
+        rows = rows[:limit]
+    
+    skills_list = [
+        {
+            'topic': row.get('topic', ''),
+            'skill_name': row.get('skill_name', ''),
+            'count': row.get('template_count', 0)
+        }
+        for row in rows
+    ]
+    
+    return {
+        "skills": skills_list,
+        "offset": offset,
+        "limit": limit,
+        "has_more": has_more
+    }
+
+
 @router.get("/skills")
-async def get_skills() -> dict:
+async def get_skills(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0)
+) -> Response:
     """
     Fetch existing skills from the database.
-    Groups by topic and skill_name with count of templates.
+    Reads the per-skill template counts from the skill_counts summary table,
+    which is kept up to date by a trigger on question_templates.
+    Pages are served from the template metadata cache with an ETag, so an
+    unchanged page comes back as 304 Not Modified.
     
+    Args:
+        limit: Optional page size (all skills if omitted)
+        offset: Number of skills to skip
+        
     Returns:
-        Dictionary containing list of skills with topic, skill_name, and count
+        Dictionary containing list of skills with topic, skill_name, and count,
+        plus pagination info
     """
     try:
-        db = get_db()
-        
-        # Query all templates and group by topic and skill_name
-        response = db.table('question_templates').select('topic, skill_name').execute()
-        
-        if not response.data:
-            return {"skills": []}
-        
-        # Group and count skills
-        skills_map = {}
-        for row in response.data:
-            topic = row.get('topic', '')
-            skill_name = row.get('skill_name', '')
-            key = f"{topic}:{skill_name}"
-            
-            if key in skills_map:
-                skills_map[key]['count'] += 1
-            else:
-                skills_map[key] = {
-                    'topic': topic,
-                    'skill_name': skill_name,
-                    'count': 1
-                }
-        
-        # Convert to list and sort by topic, then skill_name
-        skills_list = sorted(
-            skills_map.values(),
-            key=lambda x: (x['topic'], x['skill_name'])
+        payload, etag = await metadata_cache.get(
+            ('skills', limit, offset),
+            lambda: _load_skills(limit, offset)
         )
         
-        return {"skills": skills_list}
+        return cached_response(request, payload, etag)
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch skills: {str(e)}")
@@ -1,15 +1,21 @@
-from fastapi import APIRouter, HTTPException, Query
-from database import get_db
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from services.autocomplete import autocomplete_index
+from services.metadata_cache import cached_response, metadata_cache
 from typing import List, Optional
 
 router = APIRouter(prefix="/api", tags=["suggestions"])
 
 
+async def _suggestions(names: List[str]) -> dict:
+    return {"suggestions": names}
+
+
 @router.get("/topics/suggest")
-async def suggest_topics(q: str = Query(..., min_length=1)) -> dict:
+async def suggest_topics(request: Request, q: str = Query(..., min_length=1)) -> Response:
     """
     Get topic suggestions based on query string.
-    Returns up to 5 matching topics.
+    Returns up to 5 matching topics, ranked exact > prefix > substring > fuzzy.
+    Sent with an ETag; an unchanged result comes back as 304 Not Modified.
     
     Args:
         q: Query string for topic search
@@ -18,23 +24,15 @@ async def suggest_topics(q: str = Query(..., min_length=1)) -> dict:
         Dictionary containing list of matching topics
     """
     try:
-        db = get_db()
-        
-        # Query topics with case-insensitive partial match
-        # Note: Supabase uses PostgREST which supports ilike for case-insensitive matching
-        response = db.table('question_templates')\
-            .select('topic')\
-            .ilike('topic', f'%{q}%')\
-            .execute()
-        
-        if not response.data:
-            return {"suggestions": []}
+        # Served from the in-process autocomplete index, not the database
+        await autocomplete_index.ensure_loaded()
         
-        # Get unique topics and limit to 5
-        topics = list(set(row['topic'] for row in response.data if row.get('topic')))
-        topics.sort()
+        payload, etag = await metadata_cache.get(
+            ('topics/suggest', q),
+            lambda: _suggestions(autocomplete_index.suggest_topics(q))
+        )
         
-        return {"suggestions": topics[:5]}
+        return cached_response(request, payload, etag)
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch topic suggestions: {str(e)}")
@@ -42,12 +40,14 @@ async def suggest_topics(q: str = Query(..., min_length=1)) -> dict:
 
 @router.get("/skills/suggest")
 async def suggest_skills(
+    request: Request,
     topic: str = Query(..., min_length=1),
     q: Optional[str] = Query(None, min_length=1)
-) -> dict:
+) -> Response:
     """
     Get skill suggestions filtered by topic and optional query string.
-    Returns up to 5 matching skills.
+    Returns up to 5 matching skills, ranked exact > prefix > substring > fuzzy.
+    Sent with an ETag; an unchanged result comes back as 304 Not Modified.
     
     Args:
         topic: Topic to filter skills by
@@ -57,27 +57,15 @@ async def suggest_skills(
         Dictionary containing list of matching skill names
     """
     try:
-        db = get_db()
-        
-        # Start with topic filter
-        query = db.table('question_templates')\
-            .select('skill_name')\
-            .eq('topic', topic)
-        
-        # Add skill_name filter if query provided
-        if q:
-            query = query.ilike('skill_name', f'%{q}%')
-        
-        response = query.execute()
-        
-        if not response.data:
-            return {"suggestions": []}
+        # Served from the in-process autocomplete index, not the database
+        await autocomplete_index.ensure_loaded()
         
-        # Get unique skill names and limit to 5
-        skills = list(set(row['skill_name'] for row in response.data if row.get('skill_name')))
-        skills.sort()
+        payload, etag = await metadata_cache.get(
+            ('skills/suggest', topic, q),
+            lambda: _suggestions(autocomplete_index.suggest_skills(topic, q))
+        )
         
-        return {"suggestions": skills[:5]}
+        return cached_response(request, payload, etag)
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch skill suggestions: {str(e)}")
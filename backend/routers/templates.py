@@ -1,8 +1,24 @@
-from fastapi import APIRouter, HTTPException, Query
-from pydantic import BaseModel, Field
-from database import get_db
-from datetime import datetime
-from typing import Optional
+import json
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from config import settings
+from database import get_db, run_query
+from typing import Any, AsyncIterator, Dict, Optional
+from services.generator import (
+    TemplateCompileError,
+    TemplateValidationError,
+    compile_template,
+    generate_instances,
+    generate_seeds,
+    generate_unique_instances,
+    make_instance_id,
+    parse_instance_id,
+    random_seed,
+    validate_template
+)
+from services.metadata_cache import cached_response, metadata_cache
+from services.template_store import build_template_data, get_template, insert_template
 
 router = APIRouter(prefix="/api", tags=["templates"])
 
@@ -12,7 +28,7 @@ class TemplateCreate(BaseModel):
     grade: int = Field(..., ge=1, le=10, description="Grade level (1-10)")
     topic: str = Field(..., min_length=1, description="Topic name")
     skill_name: str = Field(..., min_length=1, description="Skill name")
-    format: int = Field(..., ge=1, description="Format number")
+    format: Optional[int] = Field(None, ge=1, description="Format number (allocated by the server if omitted or taken)")
     type: str = Field(..., description="Question type (MCQ, MAQ, etc.)")
     question_template: str = Field(..., min_length=1, description="Python code for question generation")
     answer_template: str = Field(..., min_length=1, description="Python code for answer generation")
@@ -20,13 +36,55 @@ class TemplateCreate(BaseModel):
     updated_by: Optional[str] = Field(None, description="Username of last updater")
 
 
+def validate_template_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Validate a raw template row (e.g. from a bulk import file).
+    
+    Returns:
+        Validated TemplateCreate fields
+        
+    Raises:
+        ValueError: With one message listing every invalid field
+    """
+    try:
+        return TemplateCreate(**row).model_dump()
+    except ValidationError as e:
+        problems = "; ".join(
+            f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+            for error in e.errors()
+        )
+        raise ValueError(f"Invalid template: {problems}")
+
+
+async def _load_next_format(topic: str, skill_name: str) -> dict:
+    """Read the per-(topic, skill) format counter, a single primary key lookup."""
+    db = get_db()
+    
+    response = await run_query(
+        db.table('template_format_counters')
+        .select('last_format')
+        .eq('topic', topic)
+        .eq('skill_name', skill_name)
+    )
+    
+    if not response.data:
+        # No existing templates, start at 1
+        return {"next_format": 1}
+    
+    return {"next_format": response.data[0]['last_format'] + 1}
+
+
 @router.get("/templates/next-format")
 async def get_next_format(
+    request: Request,
     topic: str = Query(..., min_length=1),
     skill_name: str = Query(..., min_length=1, alias="skill_name")
-) -> dict:
+) -> Response:
     """
     Calculate the next format number for a given topic and skill.
+    Reads the per-(topic, skill) format counter, a single primary key lookup,
+    through the template metadata cache (ETag, 304 when unchanged).
+    The number is a hint for the UI; POST /api/templates allocates atomically.
     
     Args:
         topic: Topic name
@@ -36,23 +94,12 @@ async def get_next_format(
         Dictionary containing the next format number
     """
     try:
-        db = get_db()
-        
-        # Query existing templates with matching topic and skill_name
-        response = db.table('question_templates')\
-            .select('format')\
-            .eq('topic', topic)\
-            .eq('skill_name', skill_name)\
-            .execute()
-        
-        if not response.data:
-            # No existing templates, start at 1
-            return {"next_format": 1}
-        
-        # Find max format and increment
-        max_format = max(row['format'] for row in response.data)
+        payload, etag = await metadata_cache.get(
+            ('templates/next-format', topic, skill_name),
+            lambda: _load_next_format(topic, skill_name)
+        )
         
-        return {"next_format": max_format + 1}
+        return cached_response(request, payload, etag)
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to calculate next format: {str(e)}")
@@ -64,6 +111,15 @@ async def create_template(template: TemplateCreate) -> dict:
     Create a new question template.
     Auto-injects module and category fields.
     
+    The template is validated first: it must compile, pass static checks
+    (no endless loops, huge range() calls or unavailable names) and run
+    cleanly for a few fixed seeds. The median trial runtime is stored as
+    estimated_cost_ms.
+    
+    If no format is given, or another author took the requested format
+    concurrently, the next free format is allocated and the row inserted in
+    one atomic database call (insert_template_next_format).
+    
     Args:
         template: Template data
         
@@ -71,36 +127,196 @@ async def create_template(template: TemplateCreate) -> dict:
         Dictionary containing created template data
     """
     try:
-        db = get_db()
-        
+        estimated_cost_ms = await validate_template(template.model_dump())
+    except (TemplateCompileError, TemplateValidationError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
         # Prepare template data with auto-injected fields
-        template_data = {
-            'module': 'Basic-skills',
-            'category': 'Math',
-            'grade': template.grade,
-            'topic': template.topic,
-            'skill_name': template.skill_name,
-            'format': template.format,
-            'type': template.type,
-            'question_template': template.question_template,
-            'answer_template': template.answer_template,
-            'created_by': template.created_by,
-            'updated_by': template.updated_by or template.created_by,
-            'created_at': datetime.utcnow().isoformat(),
-            'updated_at': datetime.utcnow().isoformat()
-        }
-        
-        # Insert into database
-        response = db.table('question_templates').insert(template_data).execute()
+        template_data = build_template_data({
+            **template.model_dump(),
+            'estimated_cost_ms': estimated_cost_ms
+        })
         
-        if not response.data:
-            raise HTTPException(status_code=500, detail="Failed to save template")
+        row = await insert_template(template_data)
         
         return {
             "success": True,
             "message": "Template created successfully",
-            "data": response.data[0]
+            "data": row
         }
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create template: {str(e)}")
+
+
+async def get_template_by_id(template_id: str) -> Dict[str, Any]:
+    """
+    Fetch a single template row by id.
+    
+    Raises:
+        HTTPException: 404 if no template has this id
+    """
+    template = await get_template(template_id)
+    
+    if template is None:
+        raise HTTPException(status_code=404, detail=f"Template {template_id} not found")
+    
+    return template
+
+
+async def _stream_json_array(instances: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    """Serialize instances as a JSON array, one element at a time."""
+    yield "["
+    first = True
+    async for instance in instances:
+        yield ("" if first else ",") + json.dumps(instance, default=str)
+        first = False
+    yield "]"
+
+
+async def stream_ndjson(items: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    """Serialize items (instances, job results, paper parts) as newline-delimited JSON."""
+    async for item in items:
+        yield json.dumps(item, default=str) + "\n"
+
+
+@router.post("/templates/{template_id}/generate")
+async def generate_questions(
+    template_id: str,
+    count: int = Query(1, ge=1, le=settings.GENERATION_MAX_COUNT),
+    seed: Optional[int] = Query(None, ge=0),
+    output: str = Query("json", pattern="^(json|ndjson)$")
+) -> StreamingResponse:
+    """
+    Generate many question/answer instances from a stored template.
+    
+    Instances are produced in sandbox worker batches and streamed back as
+    they complete. The question and answer code share one namespace.
+    Instance i uses seed + i and carries an instance_id that regenerates it
+    via GET /api/instances/{instance_id}; errors are reported per instance
+    without aborting the batch.
+    
+    Args:
+        template_id: Template id
+        count: Number of instances to generate
+        seed: Base seed (random if omitted)
+        output: 'json' for a streamed JSON array, 'ndjson' for one instance per line
+        
+    Returns:
+        Streaming response of instance objects
+    """
+    try:
+        template = await get_template_by_id(template_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch template: {str(e)}")
+    
+    try:
+        code_blob, answer_line = await compile_template(template)
+    except TemplateCompileError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if seed is None:
+        seed = random_seed()
+    
+    instances = generate_instances(template, code_blob, answer_line, count, seed)
+    
+    if output == "ndjson":
+        return StreamingResponse(stream_ndjson(instances), media_type="application/x-ndjson")
+    return StreamingResponse(_stream_json_array(instances), media_type="application/json")
+
+
+@router.post("/templates/{template_id}/generate/unique")
+async def generate_unique_questions(
+    template_id: str,
+    count: int = Query(..., ge=1, le=settings.GENERATION_UNIQUE_MAX_COUNT),
+    seed: Optional[int] = Query(None, ge=0),
+    unique_by: str = Query("question", pattern="^(question|question_answer)$")
+) -> dict:
+    """
+    Generate count distinct questions from a stored template.
+    
+    Runs in a single sandbox worker job: seeds are tried from seed upwards
+    and instances whose question text (or question and answer, with
+    unique_by=question_answer) was already produced are skipped. If the
+    template cannot produce enough distinct questions, generation stops
+    early and the response says so ('exhausted') together with an
+    estimate of how many distinct questions the template can produce.
+    
+    Args:
+        template_id: Template id
+        count: Number of distinct instances
+        seed: First seed to try (random if omitted)
+        unique_by: 'question' or 'question_answer'
+        
+    Returns:
+        Dictionary with the distinct instances and the attempt report
+    """
+    try:
+        template = await get_template_by_id(template_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch template: {str(e)}")
+    
+    try:
+        code_blob, answer_line = await compile_template(template)
+    except TemplateCompileError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if seed is None:
+        seed = random_seed()
+    
+    try:
+        return await generate_unique_instances(template, code_blob, answer_line, count, seed, unique_by)
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to generate questions: {str(e)}")
+
+
+@router.get("/instances/{instance_id}")
+async def get_instance(instance_id: str) -> dict:
+    """
+    Regenerate a single question from its instance id.
+    
+    Generation is deterministic per seed, so the same instance id always
+    yields the same question and answer; repeats are served from the
+    rendered question cache.
+    
+    Args:
+        instance_id: '<template_id>:<format>:<seed>' as returned by generate
+        
+    Returns:
+        Dictionary containing the instance id, seed, question, answer, and any errors
+    """
+    try:
+        template_id, template_format, seed = parse_instance_id(instance_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid instance id: {instance_id}")
+    
+    try:
+        template = await get_template_by_id(template_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch template: {str(e)}")
+    
+    if template['format'] != template_format:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Template {template_id} is no longer format {template_format}"
+        )
+    
+    try:
+        code_blob, answer_line = await compile_template(template)
+    except TemplateCompileError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    instance = (await generate_seeds(template, code_blob, answer_line, [seed]))[0]
+    
+    return {
+        'instance_id': make_instance_id(template_id, template_format, seed),
+        **instance
+    }
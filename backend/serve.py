@@ -0,0 +1,247 @@
+"""
+Production launcher: several API worker processes sharing one socket.
+
+Usage (from backend/):
+    python serve.py --workers 4 --host 0.0.0.0 --port 8000
+
+Signals to the launcher:
+    SIGHUP          Graceful reload (Unix only). Workers are replaced one
+                    at a time by fresh processes (new code and .env); an
+                    old worker is only stopped once its replacement is
+                    serving, and the listening socket stays open throughout.
+    SIGTERM/SIGINT  Graceful stop. Workers finish in-flight requests (up to
+                    SERVER_GRACEFUL_TIMEOUT seconds) and run their shutdown
+                    hooks; running generation jobs are requeued.
+
+Workers that exit unexpectedly are restarted, with exponential backoff
+if they keep failing during startup; after WORKER_MAX_FAILURES such
+failures in a row the launcher gives up and exits with status 1. State
+the workers share
+lives in SQLite files: generation jobs (JOBS_DB_PATH), cache versions
+(SHARED_STATE_DB_PATH) and, without Supabase, the local database
+(LOCAL_DB_PATH). The legacy JSON local database cannot be shared, so it
+is refused with more than one worker. Use `python main.py` for
+development (single process, auto-reload).
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from typing import List, Optional
+
+import uvicorn
+
+from config import settings
+from database import get_db, uses_local_db
+
+# Seconds a new worker may take to start before a reload is abandoned
+WORKER_START_TIMEOUT = 120
+# A worker that exits before it is serving, or within this many seconds,
+# counts as a failed start
+WORKER_MIN_UPTIME = 10
+# Restart delay after the first failed start, doubled for each further one
+WORKER_BACKOFF = 0.5
+WORKER_BACKOFF_MAX = 30
+# Failed starts in a row (per worker slot) before the launcher gives up
+WORKER_MAX_FAILURES = 6
+
+
+class _Server(uvicorn.Server):
+    """uvicorn server that signals once startup, including the app's startup hooks, is done."""
+
+    def __init__(self, config: uvicorn.Config, ready):
+        super().__init__(config)
+        self._ready = ready
+
+    async def startup(self, sockets=None) -> None:
+        await super().startup(sockets=sockets)
+        if not self.should_exit:
+            self._ready.set()
+
+
+def _run_worker(sockets, ready, graceful_timeout: float) -> None:
+    """Entry point of an API worker process."""
+    config = uvicorn.Config("main:app", timeout_graceful_shutdown=graceful_timeout)
+    _Server(config, ready).run(sockets=sockets)
+
+
+class _Worker:
+    """Handle on one API worker process."""
+
+    def __init__(self, ctx, sockets, graceful_timeout: float):
+        self.ready = ctx.Event()
+        self.process = ctx.Process(
+            target=_run_worker,
+            args=(sockets, self.ready, graceful_timeout),
+            name="api-worker"
+        )
+        self.process.start()
+        self.started_at = time.monotonic()
+
+    def failed_start(self) -> bool:
+        """Whether the (exited) worker died before serving or soon after."""
+        return not self.ready.is_set() or time.monotonic() - self.started_at < WORKER_MIN_UPTIME
+
+    def stop(self, timeout: float) -> None:
+        """Ask the worker to finish its requests and exit; kill it after timeout."""
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+
+
+class Supervisor:
+    """Starts, restarts and gracefully reloads the API worker processes."""
+
+    def __init__(self, workers: int, host: str, port: int, graceful_timeout: float):
+        self.size = workers
+        self.host = host
+        self.port = port
+        self.graceful_timeout = graceful_timeout
+        self._ctx = multiprocessing.get_context("spawn")
+        self._workers: List[_Worker] = []
+        # Per worker slot: failed starts in a row, and when a dead worker is due for restart
+        self._failures: List[int] = []
+        self._restart_at: List[Optional[float]] = []
+        self._sockets = []
+        self._reload = False
+        self._stop = False
+        self.exit_code = 0
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self._ctx, self._sockets, self.graceful_timeout)
+
+    def _request_reload(self, signum, frame) -> None:
+        self._reload = True
+
+    def _request_stop(self, signum, frame) -> None:
+        self._stop = True
+
+    def reload(self) -> None:
+        """Replace every worker with a fresh process, one at a time."""
+        print(f"INFO: Reloading {len(self._workers)} workers")
+        for old in list(self._workers):
+            new = self._spawn()
+            if not new.ready.wait(WORKER_START_TIMEOUT):
+                print("ERROR: New worker failed to start; keeping the remaining old workers")
+                new.stop(0)
+                return
+            index = self._workers.index(old)
+            self._workers[index] = new
+            self._restart_at[index] = None
+            old.stop(self.graceful_timeout + 5)
+        print("INFO: Reload complete")
+
+    def _check_workers(self) -> None:
+        """Restart dead workers, backing off while they keep failing to start."""
+        now = time.monotonic()
+        for index, worker in enumerate(self._workers):
+            if worker.process.is_alive():
+                continue
+
+            if self._restart_at[index] is None:
+                # Newly exited
+                self._failures[index] = self._failures[index] + 1 if worker.failed_start() else 0
+                failures = self._failures[index]
+                if failures >= WORKER_MAX_FAILURES:
+                    print(
+                        f"ERROR: Worker failed to start {failures} times in a row "
+                        f"(last exit code {worker.process.exitcode}); stopping. See the errors above."
+                    )
+                    self.exit_code = 1
+                    self._stop = True
+                    return
+                delay = min(WORKER_BACKOFF * 2 ** (failures - 1), WORKER_BACKOFF_MAX) if failures else 0
+                print(f"WARNING: Worker {worker.process.pid} exited with code {worker.process.exitcode}; restarting in {delay:g}s")
+                self._restart_at[index] = now + delay
+
+            if now >= self._restart_at[index]:
+                self._workers[index] = self._spawn()
+                self._restart_at[index] = None
+
+    def run(self) -> int:
+        """
+        Bind the socket, start the workers and supervise them until stopped.
+
+        Returns:
+            Exit status: 0 when stopped by a signal, 1 if workers kept failing
+        """
+        config = uvicorn.Config("main:app", host=self.host, port=self.port)
+        self._sockets = [config.bind_socket()]
+
+        if hasattr(signal, 'SIGHUP'):  # Not on Windows, so no graceful reload there
+            signal.signal(signal.SIGHUP, self._request_reload)
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+
+        print(f"INFO: Starting {self.size} workers on http://{self.host}:{self.port} (pid {os.getpid()})")
+        self._workers = [self._spawn() for _ in range(self.size)]
+        self._failures = [0] * self.size
+        self._restart_at = [None] * self.size
+
+        while not self._stop:
+            time.sleep(0.5)
+            if self._reload:
+                self._reload = False
+                self.reload()
+            if not self._stop:
+                self._check_workers()
+
+        print("INFO: Stopping workers")
+        for worker in self._workers:
+            if worker.process.is_alive():
+                worker.process.terminate()
+        for worker in self._workers:
+            worker.stop(self.graceful_timeout + 5)
+        for sock in self._sockets:
+            sock.close()
+        return self.exit_code
+
+
+def _prepare_shared_state(workers: int) -> Optional[str]:
+    """
+    Create the shared SQLite files once, before workers race to migrate them.
+
+    Returns:
+        An error message if this configuration cannot run several workers
+    """
+    from services.jobs import JobStore
+    from services.shared_state import get_shared_state
+
+    if uses_local_db():
+        if settings.LOCAL_DB_BACKEND == "json" and workers > 1:
+            return "LOCAL_DB_BACKEND=json cannot be shared by several workers; use sqlite or Supabase"
+        get_db()
+    JobStore()
+    get_shared_state()
+    return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run the API with several worker processes")
+    parser.add_argument('--workers', type=int, default=settings.SERVER_WORKERS, help="Worker processes (0 = one per CPU core)")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args()
+
+    workers = args.workers or os.cpu_count() or 1
+
+    error = _prepare_shared_state(workers)
+    if error:
+        print(f"ERROR: {error}")
+        return 1
+
+    if not settings.SANDBOX_POOL_SIZE:
+        # Split the cores between the workers' sandbox pools instead of
+        # giving every worker one sandbox process per core
+        os.environ['SANDBOX_POOL_SIZE'] = str(max(1, (os.cpu_count() or 1) // workers))
+
+    return Supervisor(workers, args.host, args.port, settings.SERVER_GRACEFUL_TIMEOUT).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+from database import get_db, run_query
+
+# Minimum trigram similarity for a fuzzy (non-substring) match
+FUZZY_THRESHOLD = 0.3
+
+
+def _trigrams(text: str) -> Set[str]:
+    """Padded, lower-cased trigrams of text (as in pg_trgm)."""
+    padded = f"  {text.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _TrigramSet:
+    """Set of names with a trigram index for ranked substring/fuzzy search."""
+
+    def __init__(self):
+        self.names: Set[str] = set()
+        self._postings: Dict[str, Set[str]] = defaultdict(set)
+        self._grams: Dict[str, Set[str]] = {}
+
+    def add(self, name: str) -> None:
+        if not name or name in self.names:
+            return
+        self.names.add(name)
+        grams = _trigrams(name)
+        self._grams[name] = grams
+        for gram in grams:
+            self._postings[gram].add(name)
+
+    def search(self, q: Optional[str], k: int) -> List[str]:
+        """
+        Return the top-k names for q.
+
+        Ranking: exact match, prefix, word prefix, substring, then fuzzy
+        matches by trigram similarity; ties break alphabetically.
+        """
+        if not q:
+            return sorted(self.names)[:k]
+
+        needle = q.lower()
+        query_grams = _trigrams(q)
+
+        if len(needle) < 3:
+            # Too short for trigrams to cover substrings; the set of distinct
+            # names is small, so scan it
+            candidates = self.names
+        else:
+            candidates = set()
+            for gram in query_grams:
+                candidates |= self._postings.get(gram, set())
+
+        ranked = []
+        for name in candidates:
+            lowered = name.lower()
+            if lowered == needle:
+                rank = 0
+            elif lowered.startswith(needle):
+                rank = 1
+            elif f" {needle}" in f" {lowered}":
+                rank = 2
+            elif needle in lowered:
+                rank = 3
+            else:
+                grams = self._grams[name]
+                similarity = len(grams & query_grams) / len(grams | query_grams)
+                if similarity < FUZZY_THRESHOLD:
+                    continue
+                ranked.append((4, -similarity, name))
+                continue
+            ranked.append((rank, 0, name))
+
+        ranked.sort()
+        return [name for _, _, name in ranked[:k]]
+
+
+class AutocompleteIndex:
+    """
+    In-process autocomplete index over distinct topics and (topic, skill) pairs.
+
+    Loaded once from the skill_counts summary table and updated
+    incrementally when templates are created, so suggestion requests are
+    answered from memory without a database round-trip.
+    """
+
+    def __init__(self):
+        self._topics = _TrigramSet()
+        self._skills: Dict[str, _TrigramSet] = defaultdict(_TrigramSet)
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def add(self, topic: str, skill_name: str) -> None:
+        """Add a (topic, skill_name) pair to the index."""
+        with self._lock:
+            self._topics.add(topic)
+            self._skills[topic].add(skill_name)
+
+    def suggest_topics(self, q: str, k: int = 5) -> List[str]:
+        """Return up to k topics matching q."""
+        with self._lock:
+            return self._topics.search(q, k)
+
+    def suggest_skills(self, topic: str, q: Optional[str] = None, k: int = 5) -> List[str]:
+        """Return up to k skills of topic matching q (all skills if q is empty)."""
+        with self._lock:
+            skills = self._skills.get(topic)
+            return skills.search(q, k) if skills else []
+
+    async def _fetch_pairs(self) -> List[Dict[str, str]]:
+        db = get_db()
+        response = await run_query(
+            db.table('skill_counts').select('topic, skill_name')
+        )
+        return response.data or []
+
+    async def ensure_loaded(self) -> None:
+        """Load all distinct (topic, skill_name) pairs on first use."""
+        if self.loaded:
+            return
+
+        for row in await self._fetch_pairs():
+            self.add(row.get('topic', ''), row.get('skill_name', ''))
+        self.loaded = True
+
+    async def reload(self) -> None:
+        """
+        Rebuild the index from the database, dropping pairs that no longer exist.
+
+        The new index is built aside and swapped in, so suggestions keep
+        being served while it loads.
+        """
+        rows = await self._fetch_pairs()
+
+        topics = _TrigramSet()
+        skills: Dict[str, _TrigramSet] = defaultdict(_TrigramSet)
+        for row in rows:
+            topics.add(row.get('topic', ''))
+            skills[row.get('topic', '')].add(row.get('skill_name', ''))
+
+        with self._lock:
+            self._topics = topics
+            self._skills = skills
+        self.loaded = True
+
+
+# Global autocomplete index
+autocomplete_index = AutocompleteIndex()
@@ -0,0 +1,112 @@
+import hashlib
+import marshal
+import threading
+from collections import OrderedDict
+from types import CodeType
+from typing import Any, Dict, Optional, Tuple
+from RestrictedPython import compile_restricted
+from config import settings
+
+
+def source_hash(source: str) -> str:
+    """Return the cache key for a piece of template source code."""
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+class CompiledCodeCache:
+    """
+    Bounded LRU cache of RestrictedPython code objects keyed by source hash.
+
+    Entries keep both the code object (for in-process execution) and its
+    marshalled bytes (for shipping to sandbox worker processes). Because the
+    key is a hash of the source, an edited template can never hit stale
+    bytecode; invalidate() only frees the slot early.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of compiled sources kept (default from settings)
+        """
+        self.max_entries = max_entries or settings.CODE_CACHE_SIZE
+        self._entries: "OrderedDict[str, Tuple[CodeType, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _get_entry(self, source: str) -> Tuple[CodeType, bytes]:
+        key = source_hash(source)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        # Compile outside the lock; raises SyntaxError for invalid code
+        byte_code = compile_restricted(source, filename='<user_code>', mode='exec')
+        entry = (byte_code, marshal.dumps(byte_code))
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+        return entry
+
+    def get(self, source: str) -> CodeType:
+        """
+        Get the compiled code object for source, compiling on a miss.
+
+        Raises:
+            SyntaxError: If the source does not compile under RestrictedPython
+        """
+        return self._get_entry(source)[0]
+
+    def get_marshalled(self, source: str) -> bytes:
+        """
+        Get the marshalled code object for source, compiling on a miss.
+
+        Raises:
+            SyntaxError: If the source does not compile under RestrictedPython
+        """
+        return self._get_entry(source)[1]
+
+    def contains(self, source: str) -> bool:
+        """Check whether source is already compiled (does not touch counters)."""
+        with self._lock:
+            return source_hash(source) in self._entries
+
+    def invalidate(self, *sources: str) -> None:
+        """Drop the compiled code for the given sources, if cached."""
+        with self._lock:
+            for source in sources:
+                if source:
+                    self._entries.pop(source_hash(source), None)
+
+    def clear(self) -> None:
+        """Drop all compiled code."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache size and hit/miss/eviction counters."""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+# Global compiled code cache shared by preview and generation
+code_cache = CompiledCodeCache()
@@ -0,0 +1,301 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from config import settings
+from services.code_cache import source_hash
+from services.metrics import metrics
+from services.result_cache import result_cache
+from services.sandbox import join_template
+from services.template_lint import lint_template
+from services.worker_pool import sandbox_pool
+
+
+class TemplateCompileError(Exception):
+    """Raised when a stored template does not compile."""
+    pass
+
+
+class TemplateValidationError(Exception):
+    """Raised when a template fails static checks or trial runs at save time."""
+    pass
+
+
+def random_seed() -> int:
+    """Pick a fresh base seed for a generation request."""
+    return random.SystemRandom().randrange(2 ** 31)
+
+
+def make_instance_id(template_id: str, template_format: int, seed: int) -> str:
+    """
+    Build the compact key that identifies a generated question.
+
+    A question is fully determined by its template and seed, so
+    '<template_id>:<format>:<seed>' is enough to regenerate it on demand.
+    """
+    return f"{template_id}:{template_format}:{seed}"
+
+
+def parse_instance_id(instance_id: str) -> Tuple[str, int, int]:
+    """
+    Split an instance id into (template_id, format, seed).
+
+    Raises:
+        ValueError: If the id is malformed
+    """
+    template_id, template_format, seed = instance_id.rsplit(":", 2)
+    if not template_id:
+        raise ValueError("Missing template id")
+    return template_id, int(template_format), int(seed)
+
+
+def trial_seeds() -> List[int]:
+    """Fixed seeds for save-time trial runs, so validation is reproducible."""
+    return list(range(settings.TEMPLATE_TRIAL_RUNS))
+
+
+def chunk_size_for(template: Dict[str, Any], limit: int) -> int:
+    """
+    Instances per sandbox worker job for a template, at most limit.
+
+    Sized from the template's estimated_cost_ms (median trial runtime
+    measured at save time) so that a job takes about
+    GENERATION_CHUNK_TARGET_MS: slow templates are split into smaller jobs
+    and spread over more workers. Templates without an estimate use limit.
+    """
+    cost = template.get('estimated_cost_ms')
+    if not cost or cost <= 0:
+        return limit
+    return max(1, min(limit, int(settings.GENERATION_CHUNK_TARGET_MS / cost)))
+
+
+def template_version(template: Dict[str, Any]) -> str:
+    """Hash of a template's code; changes whenever the code is edited."""
+    source, _ = join_template(template['question_template'], template['answer_template'])
+    return source_hash(source)
+
+
+async def generate_seeds(
+    template: Dict[str, Any],
+    code_blob: bytes,
+    answer_line: int,
+    seeds: List[int]
+) -> List[Dict[str, Any]]:
+    """
+    Generate instances for specific seeds, serving repeats from the result cache.
+
+    Only seeds missing from the cache are sent to the sandbox, as one worker
+    job. Successful results are cached under (template id, code hash, seed).
+
+    Args:
+        template: question_templates row the code was compiled from
+        code_blob: Marshalled template code (see compile_template)
+        answer_line: First line of the answer part
+        seeds: Random seeds, one per instance
+
+    Returns:
+        List of instance dictionaries in seed order
+    """
+    version = template_version(template)
+    cached = await result_cache.get_many([(template['id'], version, seed) for seed in seeds])
+    rendered = {key[2]: instance for key, instance in cached.items()}
+    missing = [seed for seed in seeds if seed not in rendered]
+
+    if missing:
+        for instance in await sandbox_pool.generate(code_blob, answer_line, missing, template_id=template['id']):
+            seed = instance.pop('seed')
+            rendered[seed] = instance
+            # Errors may be transient (timeouts, crashed workers); don't pin them
+            if not instance['error']:
+                result_cache.put((template['id'], version, seed), instance)
+
+    return [{'seed': seed, **rendered[seed]} for seed in seeds]
+
+
+async def compile_template(template: Dict[str, Any], template_id: Optional[str] = None) -> Tuple[bytes, int]:
+    """
+    Compile a template's question and answer code as one unit.
+
+    The joined source goes through the shared code cache, so repeated
+    previews and generations of the same template compile only once.
+
+    Args:
+        template: Mapping with 'question_template' and 'answer_template'
+        template_id: Label for metrics (default: the template's id)
+
+    Returns:
+        Tuple of (marshalled code object, first line of the answer part)
+
+    Raises:
+        TemplateCompileError: If either part fails to compile
+    """
+    source, answer_line = join_template(
+        template['question_template'],
+        template['answer_template']
+    )
+
+    started = time.perf_counter()
+    try:
+        return await sandbox_pool.compile(source), answer_line
+    except SyntaxError:
+        pass
+    finally:
+        metrics.observe_compile(template_id or template.get('id'), time.perf_counter() - started)
+
+    # Compile the parts on their own to report which one is broken
+    try:
+        await sandbox_pool.compile(template['question_template'])
+    except SyntaxError as e:
+        raise TemplateCompileError(f"Question Template Error: Syntax Error: {e}")
+    try:
+        await sandbox_pool.compile(template['answer_template'])
+    except SyntaxError as e:
+        raise TemplateCompileError(f"Answer Template Error: Syntax Error: {e}")
+    raise TemplateCompileError("Answer Template Error: Syntax Error: templates do not compile together")
+
+
+async def generate_instances(
+    template: Dict[str, Any],
+    code_blob: bytes,
+    answer_line: int,
+    count: int,
+    seed: int
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Generate question/answer instances for compiled template code.
+
+    Instance i uses seed + i and is yielded with its instance id, so it can
+    be regenerated later from (template id, format, seed). The work is
+    split into chunks of at most GENERATION_CHUNK_SIZE instances (see
+    chunk_size_for); each chunk is served from the result cache where
+    possible and otherwise runs as one sandbox worker job, and a bounded
+    window of chunks runs concurrently across the pool. Instances are
+    yielded in order as their chunks complete.
+
+    Args:
+        template: question_templates row the code was compiled from
+        code_blob: Marshalled template code (see compile_template)
+        answer_line: First line of the answer part
+        count: Number of instances to generate
+        seed: Base seed
+
+    Yields:
+        Instance dictionaries with 'index', 'instance_id', 'seed',
+        'question', 'answer', 'error' and 'error_type' keys
+    """
+    chunk_size = chunk_size_for(template, settings.GENERATION_CHUNK_SIZE)
+    window = sandbox_pool.size * 2
+    pending = deque()
+    index = 0
+
+    def submit(start: int) -> None:
+        seeds = list(range(seed + start, seed + min(start + chunk_size, count)))
+        pending.append(asyncio.ensure_future(
+            generate_seeds(template, code_blob, answer_line, seeds)
+        ))
+
+    try:
+        next_start = 0
+        while next_start < count or pending:
+            while next_start < count and len(pending) < window:
+                submit(next_start)
+                next_start += chunk_size
+
+            for instance in await pending.popleft():
+                instance_id = make_instance_id(template['id'], template['format'], instance['seed'])
+                yield {'index': index, 'instance_id': instance_id, **instance}
+                index += 1
+    finally:
+        # Client went away or the caller stopped early
+        for task in pending:
+            task.cancel()
+
+
+async def generate_unique_instances(
+    template: Dict[str, Any],
+    code_blob: bytes,
+    answer_line: int,
+    count: int,
+    seed: int,
+    unique_by: str = 'question'
+) -> Dict[str, Any]:
+    """
+    Generate count distinct question instances in one sandbox worker job.
+
+    Seeds are tried from seed upwards inside the worker and repeats of an
+    already rendered question (or question and answer) are skipped, so the
+    client never has to re-request to fill gaps. At most
+    count * GENERATION_UNIQUE_ATTEMPTS_FACTOR seeds are tried, and the
+    worker gives up after GENERATION_UNIQUE_STALL_LIMIT repeats in a row.
+    Kept instances go into the result cache like any other, and their
+    instance ids regenerate them as usual.
+
+    Args:
+        template: question_templates row the code was compiled from
+        code_blob: Marshalled template code (see compile_template)
+        answer_line: First line of the answer part
+        count: Distinct instances wanted
+        seed: First seed to try
+        unique_by: 'question' or 'question_answer'
+
+    Returns:
+        Dictionary with 'instances' (as from generate_instances), 'requested',
+        'generated', 'max_attempts', 'attempts', 'duplicates', 'errors',
+        'last_error', 'exhausted' and 'estimated_distinct_outputs'
+    """
+    max_attempts = count * settings.GENERATION_UNIQUE_ATTEMPTS_FACTOR
+    report = await sandbox_pool.generate_unique(
+        code_blob, answer_line, count, seed, max_attempts,
+        settings.GENERATION_UNIQUE_STALL_LIMIT, unique_by,
+        template_id=template['id']
+    )
+
+    version = template_version(template)
+    instances = []
+    for index, instance in enumerate(report.pop('instances')):
+        result_cache.put(
+            (template['id'], version, instance['seed']),
+            {key: value for key, value in instance.items() if key != 'seed'}
+        )
+        instance_id = make_instance_id(template['id'], template['format'], instance['seed'])
+        instances.append({'index': index, 'instance_id': instance_id, **instance})
+
+    return {
+        'instances': instances,
+        'requested': count,
+        'generated': len(instances),
+        'max_attempts': max_attempts,
+        **report
+    }
+
+
+async def validate_template(template: Dict[str, Any]) -> float:
+    """
+    Check a template before it is saved.
+
+    Compiles it through the shared code cache (so later previews and
+    generations start warm), lints it for code that can only hang or fail,
+    and trial-runs it once per trial seed in the sandbox.
+
+    Args:
+        template: Mapping with 'question_template' and 'answer_template'
+
+    Returns:
+        Median trial runtime in milliseconds (estimated_cost_ms)
+
+    Raises:
+        TemplateCompileError: If either part fails to compile
+        TemplateValidationError: If linting or a trial run fails
+    """
+    code_blob, answer_line = await compile_template(template, 'validation')
+
+    problems = lint_template(template['question_template'], template['answer_template'])
+    if problems:
+        raise TemplateValidationError("; ".join(problems))
+
+    trial = await sandbox_pool.trial(code_blob, answer_line, trial_seeds(), template_id='validation')
+    if trial['error']:
+        raise TemplateValidationError(trial['error'])
+
+    return trial['estimated_cost_ms']
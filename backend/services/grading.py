@@ -0,0 +1,239 @@
+import asyncio
+import math
+from fractions import Fraction
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+from config import settings
+from services.generator import TemplateCompileError, chunk_size_for, compile_template, generate_seeds
+from services.template_store import get_template
+
+_TRUE = {'true', 't', 'yes', 'y', '1'}
+_FALSE = {'false', 'f', 'no', 'n', '0'}
+
+
+class AnswerFormatError(Exception):
+    """Raised when a template's answer cannot be read as its question type requires."""
+    pass
+
+
+def normalize_text(value: Any) -> str:
+    """Case-folded text with runs of whitespace collapsed."""
+    return " ".join(str(value).split()).casefold()
+
+
+def parse_number(value: Any) -> Optional[float]:
+    """
+    Read a number from an answer or response.
+
+    Accepts ints, floats and strings such as '42', '-1.5', '3/4', '1e3'
+    or '1,000'. Returns None for anything else (including booleans).
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float, Fraction)):
+        number = float(value)
+    else:
+        text = str(value).strip().replace(',', '').replace(' ', '')
+        try:
+            number = float(Fraction(text))
+        except (ValueError, ZeroDivisionError):
+            return None
+    return number if math.isfinite(number) else None
+
+
+def parse_bool(value: Any) -> Optional[bool]:
+    """Read True/False from a bool, 0/1, or words like 'true', 'F', 'yes', 'no'."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)) and value in (0, 1):
+        return bool(value)
+    text = normalize_text(value)
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    return None
+
+
+def _choice_key(value: Any) -> Tuple[str, Any]:
+    """Comparable key for one choice: numbers compare by value, text case-insensitively."""
+    number = parse_number(value)
+    if number is not None:
+        return ('number', number)
+    return ('text', normalize_text(value))
+
+
+def _choices(value: Any, split_text: bool) -> FrozenSet[Tuple[str, Any]]:
+    """Set of choice keys from a list/tuple/set, or from one value (comma separated if split_text)."""
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items: Iterable[Any] = value
+    elif split_text and isinstance(value, str):
+        items = [item for item in value.replace(';', ',').split(',') if item.strip()]
+    else:
+        items = [value]
+    return frozenset(_choice_key(item) for item in items)
+
+
+def _grade_mcq(answer: Any, response: Any, tolerance: float) -> bool:
+    # One correct option; a one-element list counts as that option
+    return _choices(response, split_text=False) == _choices(answer, split_text=False)
+
+
+def _grade_maq(answer: Any, response: Any, tolerance: float) -> bool:
+    # Every correct option and nothing else, in any order
+    return _choices(response, split_text=True) == _choices(answer, split_text=True)
+
+
+def _grade_numerical(answer: Any, response: Any, tolerance: float) -> bool:
+    expected = parse_number(answer)
+    if expected is None:
+        raise AnswerFormatError(f"Answer {answer!r} is not a number")
+    given = parse_number(response)
+    return given is not None and math.isclose(
+        given, expected, rel_tol=settings.GRADE_NUMERIC_REL_TOLERANCE, abs_tol=tolerance
+    )
+
+
+def _grade_text(answer: Any, response: Any, tolerance: float) -> bool:
+    # A list of answers means any of them is accepted
+    accepted = answer if isinstance(answer, (list, tuple, set, frozenset)) else [answer]
+    return normalize_text(response) in {normalize_text(item) for item in accepted}
+
+
+def _grade_true_false(answer: Any, response: Any, tolerance: float) -> bool:
+    expected = parse_bool(answer)
+    if expected is None:
+        raise AnswerFormatError(f"Answer {answer!r} is not true or false")
+    return parse_bool(response) is expected
+
+
+# Question type (schema.sql CHECK constraint) -> grader
+GRADERS = {
+    'MCQ': _grade_mcq,
+    'MAQ': _grade_maq,
+    'Numerical Input': _grade_numerical,
+    'Text Input': _grade_text,
+    'True-or-False': _grade_true_false,
+}
+
+
+def grade_response(question_type: str, answer: Any, response: Any, tolerance: Optional[float] = None) -> bool:
+    """
+    Check one response against a generated answer.
+
+    Args:
+        question_type: Template type; unknown types are compared as text
+        answer: The template's 'answer' value
+        response: The student's response
+        tolerance: Absolute tolerance for Numerical Input (default from settings)
+
+    Returns:
+        Whether the response is correct
+
+    Raises:
+        AnswerFormatError: If the answer does not fit the question type
+    """
+    if tolerance is None:
+        tolerance = settings.GRADE_NUMERIC_TOLERANCE
+    grader = GRADERS.get(question_type, _grade_text)
+    return grader(answer, response, tolerance)
+
+
+async def _answers_for_template(template_id: str, seeds: List[int]) -> Dict[int, Dict[str, Any]]:
+    """
+    Regenerate one template's instances for the given distinct seeds.
+
+    Seeds go through generate_seeds() in chunks (see chunk_size_for), so
+    cached instances are reused and each missing seed runs once, with the
+    chunks spread across the sandbox pool.
+
+    Returns:
+        seed -> {'type', 'answer'} or {'error'} (for every seed if the template
+        cannot be fetched or compiled)
+    """
+    try:
+        template = await get_template(template_id)
+    except Exception as e:
+        # e.g. Supabase rejects an id that is not a UUID; fail only this template's items
+        return {seed: {'error': f"Failed to fetch template {template_id}: {str(e)}"} for seed in seeds}
+    if template is None:
+        return {seed: {'error': f"Template {template_id} not found"} for seed in seeds}
+
+    try:
+        code_blob, answer_line = await compile_template(template)
+    except TemplateCompileError as e:
+        return {seed: {'error': str(e)} for seed in seeds}
+
+    chunk_size = chunk_size_for(template, settings.GENERATION_CHUNK_SIZE)
+    chunks = await asyncio.gather(*(
+        generate_seeds(template, code_blob, answer_line, seeds[start:start + chunk_size])
+        for start in range(0, len(seeds), chunk_size)
+    ))
+
+    answers = {}
+    for chunk in chunks:
+        for instance in chunk:
+            if instance['error']:
+                answers[instance['seed']] = {'error': instance['error']}
+            else:
+                answers[instance['seed']] = {'type': template['type'], 'answer': instance['answer']}
+    return answers
+
+
+async def grade_batch(
+    items: List[Dict[str, Any]],
+    tolerance: Optional[float] = None,
+    include_answers: bool = False
+) -> Dict[str, Any]:
+    """
+    Grade many responses against regenerated (template, seed) instances.
+
+    Items are grouped by template and every template is handled
+    concurrently; within a template each distinct seed is generated (or
+    read from the result cache) once, however many responses share it.
+
+    Args:
+        items: Dictionaries with 'template_id', 'seed' and 'response'
+        tolerance: Absolute tolerance for Numerical Input answers
+        include_answers: Add the expected answer to each result
+
+    Returns:
+        Dictionary with one result per item, in order ('index', 'template_id',
+        'seed', 'correct' and 'error', plus 'expected' if requested), and a
+        summary with correct, incorrect and error counts
+    """
+    seeds_by_template: Dict[str, set] = {}
+    for item in items:
+        seeds_by_template.setdefault(item['template_id'], set()).add(item['seed'])
+
+    template_ids = list(seeds_by_template)
+    generated = await asyncio.gather(*(
+        _answers_for_template(template_id, sorted(seeds_by_template[template_id]))
+        for template_id in template_ids
+    ))
+    answers = dict(zip(template_ids, generated))
+
+    results = []
+    summary = {'total': len(items), 'correct': 0, 'incorrect': 0, 'errors': 0}
+    for index, item in enumerate(items):
+        instance = answers[item['template_id']][item['seed']]
+        result = {'index': index, 'template_id': item['template_id'], 'seed': item['seed'], 'correct': None, 'error': None}
+
+        if instance.get('error'):
+            result['error'] = instance['error']
+        else:
+            try:
+                result['correct'] = grade_response(instance['type'], instance['answer'], item['response'], tolerance)
+            except AnswerFormatError as e:
+                result['error'] = str(e)
+            if include_answers:
+                result['expected'] = instance['answer']
+
+        if result['error']:
+            summary['errors'] += 1
+        elif result['correct']:
+            summary['correct'] += 1
+        else:
+            summary['incorrect'] += 1
+        results.append(result)
+
+    return {'results': results, 'summary': summary}
@@ -0,0 +1,622 @@
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from config import settings
+from services.generator import TemplateCompileError, compile_template, generate_instances
+from services.template_store import get_template
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED = (COMPLETED, FAILED, CANCELLED)
+
+JOBS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    created_by TEXT NOT NULL,
+    template_id TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    seed INTEGER NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0,
+    errors INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT,
+    owner TEXT,
+    heartbeat_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status);
+CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs(status, priority DESC, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_created_by ON jobs(created_by);
+CREATE INDEX IF NOT EXISTS idx_jobs_finished_at ON jobs(finished_at);
+
+CREATE TABLE IF NOT EXISTS job_results (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (job_id, idx)
+) WITHOUT ROWID;
+"""
+
+
+# Columns added after the first release of jobs.sqlite3
+JOBS_MIGRATIONS = [
+    ('owner', 'TEXT'),
+    ('heartbeat_at', 'TEXT'),
+]
+
+
+class JobLimitExceeded(Exception):
+    """Raised when a user already has the maximum number of active jobs."""
+    pass
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+def process_owner() -> str:
+    """Id of this process as a job owner: host:pid."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def owner_alive(owner: Optional[str]) -> bool:
+    """
+    Whether the process that owns a job may still be running.
+
+    Only processes on this host can be checked; owners on other hosts
+    count as alive and are left to the heartbeat timeout.
+    """
+    if not owner:
+        return False
+    host, _, pid = owner.rpartition(':')
+    if host != socket.gethostname():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, ValueError):
+        return True
+    return True
+
+
+class JobStore:
+    """
+    SQLite store for generation jobs and their results.
+
+    One connection per thread in WAL mode, as in SQLiteClient. Results are
+    stored one row per instance, so they can be read back in pages while
+    the job is still running. The store is also the queue: API worker
+    processes claim queued jobs from it in write transactions, so limits
+    hold across all of them.
+    """
+
+    def __init__(self, db_file: Optional[str] = None):
+        self.db_file = db_file or settings.JOBS_DB_PATH
+        self._local = threading.local()
+        conn = self._connection()
+        conn.executescript(JOBS_SCHEMA)
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for column, column_type in JOBS_MIGRATIONS:
+            if column not in columns:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _job(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job['progress'] = round(job['completed'] / job['count'], 4) if job['count'] else 1.0
+        return job
+
+    def _transaction(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Run fn(conn) in one write transaction (BEGIN IMMEDIATE serializes writers across processes)."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def create(self, job: Dict[str, Any], max_active: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Insert a job.
+
+        Args:
+            max_active: Refuse if the job's user already has this many queued or running jobs
+
+        Returns:
+            The job, or None if refused
+        """
+        columns = ", ".join(job)
+        placeholders = ", ".join("?" for _ in job)
+
+        def insert(conn: sqlite3.Connection) -> bool:
+            if max_active is not None:
+                (active,) = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE created_by = ? AND status IN (?, ?)",
+                    (job['created_by'], QUEUED, RUNNING)
+                ).fetchone()
+                if active >= max_active:
+                    return False
+            conn.execute(f"INSERT INTO jobs ({columns}) VALUES ({placeholders})", tuple(job.values()))
+            return True
+
+        return self.get(job['id']) if self._transaction(insert) else None
+
+    def claim(self, owner: str, max_running: int, max_running_per_user: int) -> Optional[Dict[str, Any]]:
+        """
+        Mark the next queued job as running and owned by owner.
+
+        Highest priority first, then oldest, skipping users already at
+        max_running_per_user; nothing is claimed while max_running jobs run.
+
+        Returns:
+            The claimed job, or None
+        """
+        def claim_next(conn: sqlite3.Connection) -> Optional[str]:
+            (running,) = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (RUNNING,)).fetchone()
+            if running >= max_running:
+                return None
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? AND created_by NOT IN ("
+                " SELECT created_by FROM jobs WHERE status = ? GROUP BY created_by HAVING COUNT(*) >= ?)"
+                " ORDER BY priority DESC, created_at, rowid LIMIT 1",
+                (QUEUED, RUNNING, max_running_per_user)
+            ).fetchone()
+            if row is None:
+                return None
+            now = _now()
+            conn.execute(
+                "UPDATE jobs SET status = ?, owner = ?, started_at = ?, heartbeat_at = ? WHERE id = ?",
+                (RUNNING, owner, now, now, row['id'])
+            )
+            return row['id']
+
+        job_id = self._transaction(claim_next)
+        return self.get(job_id) if job_id else None
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row else None
+
+    def list(self, created_by: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        sql = "SELECT * FROM jobs"
+        params: Tuple[Any, ...] = ()
+        if created_by:
+            sql += " WHERE created_by = ?"
+            params = (created_by,)
+        sql += " ORDER BY created_at DESC LIMIT ?"
+        return [self._job(row) for row in self._connection().execute(sql, params + (limit,))]
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per status."""
+        rows = self._connection().execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")
+        return {row['status']: row['n'] for row in rows}
+
+    def statuses(self, job_ids: List[str]) -> Dict[str, str]:
+        if not job_ids:
+            return {}
+        rows = self._connection().execute(
+            f"SELECT id, status FROM jobs WHERE id IN ({', '.join('?' for _ in job_ids)})", tuple(job_ids)
+        )
+        return {row['id']: row['status'] for row in rows}
+
+    def heartbeat(self, owner: str, job_ids: List[str]) -> None:
+        """Record that owner is still running these jobs."""
+        if not job_ids:
+            return
+        self._connection().execute(
+            f"UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND status = ? "
+            f"AND id IN ({', '.join('?' for _ in job_ids)})",
+            (_now(), owner, RUNNING) + tuple(job_ids)
+        )
+
+    def requeue_orphans(self, stale_before: str, is_alive: Callable[[Optional[str]], bool]) -> int:
+        """
+        Requeue running jobs whose owner has stopped (dead process or no heartbeat since stale_before).
+
+        Returns:
+            Number of jobs requeued
+        """
+        rows = self._connection().execute(
+            "SELECT id, owner, heartbeat_at FROM jobs WHERE status = ?", (RUNNING,)
+        ).fetchall()
+        orphans = [
+            row['id'] for row in rows
+            if not row['heartbeat_at'] or row['heartbeat_at'] < stale_before or not is_alive(row['owner'])
+        ]
+        for job_id in orphans:
+            self.requeue(job_id)
+        return len(orphans)
+
+    def update(self, job_id: str, expect: Tuple[str, ...] = (), **fields: Any) -> bool:
+        """
+        Update a job's columns.
+
+        Args:
+            expect: Only update if the job's status is one of these (any status if empty),
+                so a late write cannot undo e.g. a cancellation
+
+        Returns:
+            Whether the job was updated
+        """
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        sql = f"UPDATE jobs SET {assignments} WHERE id = ?"
+        params = tuple(fields.values()) + (job_id,)
+        if expect:
+            sql += f" AND status IN ({', '.join('?' for _ in expect)})"
+            params += tuple(expect)
+        return self._connection().execute(sql, params).rowcount > 0
+
+    def append_results(self, job_id: str, instances: List[Dict[str, Any]]) -> bool:
+        """
+        Store a run of consecutive instances and advance the job's progress, atomically.
+
+        Returns:
+            False (and stores nothing) if the job is no longer running, e.g.
+            because it was cancelled from another process
+        """
+        errors = sum(1 for instance in instances if instance.get('error'))
+
+        def append(conn: sqlite3.Connection) -> bool:
+            advanced = conn.execute(
+                "UPDATE jobs SET completed = completed + ?, errors = errors + ?, heartbeat_at = ? "
+                "WHERE id = ? AND status = ?",
+                (len(instances), errors, _now(), job_id, RUNNING)
+            ).rowcount
+            if not advanced:
+                return False
+            conn.executemany(
+                "INSERT OR REPLACE INTO job_results (job_id, idx, data) VALUES (?, ?, ?)",
+                [(job_id, instance['index'], json.dumps(instance, default=str)) for instance in instances]
+            )
+            return True
+
+        return self._transaction(append)
+
+    def results(self, job_id: str, offset: int = 0, limit: int = 1000) -> List[Dict[str, Any]]:
+        rows = self._connection().execute(
+            "SELECT data FROM job_results WHERE job_id = ? AND idx >= ? ORDER BY idx LIMIT ?",
+            (job_id, offset, limit)
+        )
+        return [json.loads(row['data']) for row in rows]
+
+    def requeue(self, job_id: str) -> None:
+        """Put a running job back in the queue and drop its partial results (e.g. after a restart)."""
+        def requeue_job(conn: sqlite3.Connection) -> None:
+            requeued = conn.execute(
+                "UPDATE jobs SET status = ?, completed = 0, errors = 0, started_at = NULL, owner = NULL, "
+                "heartbeat_at = NULL WHERE id = ? AND status = ?",
+                (QUEUED, job_id, RUNNING)
+            ).rowcount
+            if requeued:
+                conn.execute("DELETE FROM job_results WHERE job_id = ?", (job_id,))
+
+        self._transaction(requeue_job)
+
+    def purge(self, before: str) -> int:
+        """Delete finished jobs (and their results) that finished before the given time."""
+        conn = self._connection()
+        job_ids = [
+            row['id'] for row in conn.execute("SELECT id FROM jobs WHERE finished_at < ?", (before,))
+        ]
+        for job_id in job_ids:
+            conn.execute("DELETE FROM job_results WHERE job_id = ?", (job_id,))
+            conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        return len(job_ids)
+
+
+class JobScheduler:
+    """
+    Runs generation jobs in the background of the API process.
+
+    Queued jobs live in the job store, and every API worker process runs a
+    scheduler that claims them from it (higher priority first, then
+    oldest). Up to JOBS_MAX_RUNNING jobs run at once across all processes,
+    at most JOBS_MAX_RUNNING_PER_USER per user. A running job generates its
+    instances with generate_instances(), which spreads chunks across the
+    sandbox worker pool, and stores them as they complete, so progress and
+    partial results are visible while it runs.
+
+    Every JOBS_POLL_INTERVAL seconds the scheduler claims jobs submitted to
+    other processes, records a heartbeat for its running jobs, stops jobs
+    cancelled elsewhere and requeues jobs whose owner died or stopped
+    sending heartbeats. Jobs running when the process stops are restarted
+    from scratch.
+    """
+
+    def __init__(
+        self,
+        store: Optional[JobStore] = None,
+        max_running: Optional[int] = None,
+        max_running_per_user: Optional[int] = None,
+        max_active_per_user: Optional[int] = None
+    ):
+        """
+        Initialize the scheduler.
+
+        Args:
+            store: Job store (default: JobStore at JOBS_DB_PATH, created on start)
+            max_running: Jobs running at once, across processes (default from settings)
+            max_running_per_user: Jobs running at once per user (default from settings)
+            max_active_per_user: Queued plus running jobs per user (default from settings)
+        """
+        self.store = store
+        self.max_running = max_running or settings.JOBS_MAX_RUNNING
+        self.max_running_per_user = max_running_per_user or settings.JOBS_MAX_RUNNING_PER_USER
+        self.max_active_per_user = max_active_per_user or settings.JOBS_MAX_ACTIVE_PER_USER
+        self.owner = process_owner()
+        # Jobs running in this process
+        self._running: Dict[str, asyncio.Task] = {}
+        self._updates: Dict[str, asyncio.Event] = {}
+        self._waiters: Dict[str, int] = {}
+        self._claiming: Optional[asyncio.Task] = None
+        self._poller: Optional[asyncio.Task] = None
+        self._counts: Dict[str, int] = {}
+        self._stopping = False
+
+    async def _call(self, fn, *args, **kwargs) -> Any:
+        """Run a blocking store call off the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: fn(*args, **kwargs))
+
+    async def start(self) -> None:
+        """Open the store, purge expired jobs, requeue orphaned ones and start claiming."""
+        if self.store is None:
+            self.store = await self._call(JobStore)
+        self.owner = process_owner()
+        self._stopping = False
+        await self._purge()
+        await self._requeue_orphans()
+        self._counts = await self._call(self.store.counts)
+        self._dispatch()
+        self._poller = asyncio.ensure_future(self._poll())
+
+    async def shutdown(self) -> None:
+        """Stop running jobs; they are requeued and restart on the next start."""
+        self._stopping = True
+        tasks = list(self._running.values())
+        for task in [self._poller, self._claiming] + tasks:
+            if task is not None:
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _purge(self) -> None:
+        before = (datetime.utcnow() - timedelta(hours=settings.JOBS_RETENTION_HOURS)).isoformat()
+        await self._call(self.store.purge, before)
+
+    async def _requeue_orphans(self) -> None:
+        stale_before = (datetime.utcnow() - timedelta(seconds=settings.JOBS_STALE_SECONDS)).isoformat()
+        await self._call(self.store.requeue_orphans, stale_before, owner_alive)
+
+    async def _poll(self) -> None:
+        """Heartbeats, cross-process cancellations, orphans and claiming, every JOBS_POLL_INTERVAL."""
+        while True:
+            await asyncio.sleep(settings.JOBS_POLL_INTERVAL)
+            try:
+                job_ids = list(self._running)
+                await self._call(self.store.heartbeat, self.owner, job_ids)
+                statuses = await self._call(self.store.statuses, job_ids)
+                for job_id in job_ids:
+                    task = self._running.get(job_id)
+                    if task is not None and statuses.get(job_id) != RUNNING:
+                        # Cancelled (or requeued) by another process
+                        task.cancel()
+                        self._notify(job_id)
+                await self._requeue_orphans()
+                self._counts = await self._call(self.store.counts)
+            except Exception as e:
+                print(f"WARNING: Job scheduler poll failed: {e}")
+            self._dispatch()
+
+    async def submit(
+        self,
+        template_id: str,
+        count: int,
+        seed: int,
+        created_by: str,
+        priority: int = 0
+    ) -> Dict[str, Any]:
+        """
+        Queue a generation job.
+
+        Raises:
+            JobLimitExceeded: If the user already has max_active_per_user jobs queued or running
+        """
+        job = await self._call(self.store.create, {
+            'id': str(uuid.uuid4()),
+            'created_by': created_by,
+            'template_id': template_id,
+            'count': count,
+            'seed': seed,
+            'priority': priority,
+            'status': QUEUED,
+            'created_at': _now()
+        }, self.max_active_per_user)
+        if job is None:
+            raise JobLimitExceeded(
+                f"{created_by} already has {self.max_active_per_user} active jobs; "
+                "wait for one to finish or cancel it"
+            )
+        self._dispatch()
+        return job
+
+    def _dispatch(self) -> None:
+        """Start claiming queued jobs unless a claim round is already going."""
+        if self._stopping or (self._claiming is not None and not self._claiming.done()):
+            return
+        self._claiming = asyncio.ensure_future(self._claim())
+
+    async def _claim(self) -> None:
+        """Claim and start queued jobs while the store has free slots."""
+        while not self._stopping:
+            job = await self._call(self.store.claim, self.owner, self.max_running, self.max_running_per_user)
+            if job is None:
+                return
+            self._running[job['id']] = asyncio.ensure_future(self._run(job))
+            self._notify(job['id'])
+
+    def _notify(self, job_id: str) -> None:
+        """Wake up everyone waiting for news about a job."""
+        event = self._updates.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    async def wait_for_update(self, job_id: str, timeout: float) -> None:
+        """
+        Wait until the job stores more results or changes status, or timeout passes.
+
+        Only news from jobs running in this process wakes waiters early; other
+        processes' jobs are seen when the timeout passes.
+        """
+        event = self._updates.setdefault(job_id, asyncio.Event())
+        self._waiters[job_id] = self._waiters.get(job_id, 0) + 1
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            # Drop the event with its last waiter; otherwise events for jobs
+            # that never finish here (other processes' jobs) would pile up
+            self._waiters[job_id] -= 1
+            if not self._waiters[job_id]:
+                del self._waiters[job_id]
+                if self._updates.get(job_id) is event:
+                    del self._updates[job_id]
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        """Generate a claimed job's instances and store them as they complete."""
+        job_id = job['id']
+        batch_size = settings.GENERATION_CHUNK_SIZE
+        try:
+            template = await get_template(job['template_id'])
+            if template is None:
+                raise LookupError(f"Template {job['template_id']} not found")
+            code_blob, answer_line = await compile_template(template)
+
+            batch = []
+            async for instance in generate_instances(template, code_blob, answer_line, job['count'], job['seed']):
+                batch.append(instance)
+                if len(batch) >= batch_size:
+                    if not await self._call(self.store.append_results, job_id, batch):
+                        # Cancelled from another process
+                        return
+                    batch = []
+                    self._notify(job_id)
+            if batch and not await self._call(self.store.append_results, job_id, batch):
+                return
+
+            await self._call(self.store.update, job_id, (RUNNING,), status=COMPLETED, finished_at=_now())
+
+        except asyncio.CancelledError:
+            if self._stopping:
+                # Shutting down: start over on the next start
+                await self._call(self.store.requeue, job_id)
+            # Otherwise the job has already been marked cancelled
+            raise
+
+        except (LookupError, TemplateCompileError) as e:
+            await self._call(self.store.update, job_id, (RUNNING,), status=FAILED, error=str(e), finished_at=_now())
+
+        except Exception as e:
+            await self._call(
+                self.store.update, job_id, (RUNNING,),
+                status=FAILED, error=f"Generation failed: {str(e)}", finished_at=_now()
+            )
+
+        finally:
+            self._running.pop(job_id, None)
+            self._notify(job_id)
+            self._dispatch()
+
+        await self._purge()
+
+    async def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Cancel a queued or running job; results stored so far are kept.
+
+        A job running in another process stops at its next poll or flush.
+
+        Returns:
+            The job after cancelling (unchanged if it had already finished), or None if unknown
+        """
+        job = await self._call(self.store.get, job_id)
+        if job is None or job['status'] in FINISHED:
+            return job
+
+        await self._call(self.store.update, job_id, (QUEUED, RUNNING), status=CANCELLED, finished_at=_now())
+        running = self._running.get(job_id)
+        if running is not None:
+            running.cancel()
+        self._notify(job_id)
+        return await self._call(self.store.get, job_id)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self._call(self.store.get, job_id)
+
+    async def list(self, created_by: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        return await self._call(self.store.list, created_by, limit)
+
+    async def results(self, job_id: str, offset: int = 0, limit: int = 1000) -> List[Dict[str, Any]]:
+        return await self._call(self.store.results, job_id, offset, limit)
+
+    async def stream_results(self, job_id: str, offset: int = 0) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield a job's instances from offset on, waiting for new ones until the job finishes.
+
+        Yields:
+            Instance dictionaries in index order, then a final {'job': job}
+        """
+        while True:
+            job = await self.get(job_id)
+            rows = await self.results(job_id, offset)
+            for row in rows:
+                yield row
+            offset += len(rows)
+
+            if not rows:
+                if job is None or job['status'] in FINISHED:
+                    # Re-read: results may have landed between the two queries above
+                    if job is None or offset >= job['completed']:
+                        yield {'job': job}
+                        return
+                    continue
+                await self.wait_for_update(job_id, timeout=1.0)
+
+    def stats(self) -> Dict[str, Any]:
+        """Jobs running here, plus queued/running counts across processes as of the last poll."""
+        return {
+            'queued': self._counts.get(QUEUED, 0),
+            'running': self._counts.get(RUNNING, 0),
+            'running_here': len(self._running),
+            'max_running': self.max_running
+        }
+
+
+# Global job scheduler
+job_scheduler = JobScheduler()
@@ -0,0 +1,207 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from config import settings
+from services.autocomplete import autocomplete_index
+from services.shared_state import get_shared_state
+
+# Shared counter bumped by every process that writes templates
+SHARED_VERSION_KEY = 'template_metadata_version'
+
+
+def make_etag(payload: Any) -> str:
+    """Strong ETag for a JSON payload (a digest of its canonical serialization)."""
+    body = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return '"' + hashlib.blake2b(body.encode('utf-8'), digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header value matches etag (weak comparison, as RFC 9110 asks)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return etag in candidates or f"W/{etag}" in candidates
+
+
+class TemplateMetadataCache:
+    """
+    Read-through cache of question_templates metadata responses.
+
+    Skills lists, topic/skill suggestions and next-format hints change only
+    when a template is written, so each response is cached in memory under
+    its endpoint and query parameters, together with an ETag. Entries are
+    LRU-bounded. Every write (insert_template/insert_templates) bumps the
+    version, which drops all entries; a load that started before the bump
+    is returned to its caller but not cached. Concurrent misses for the
+    same key share one database round-trip.
+
+    Writes also bump a counter in the shared state store, which reads check
+    at most every METADATA_CACHE_SYNC_SECONDS, so a template saved through
+    one API worker process clears the other processes' caches (and reloads
+    their autocomplete index) within that interval. Shared state store
+    calls run in a thread, never on the event loop.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum responses kept (default from settings)
+        """
+        self.max_entries = max_entries or settings.METADATA_CACHE_MAX_ENTRIES
+        self.version = 0
+        self._entries: "OrderedDict[Hashable, Tuple[Any, str]]" = OrderedDict()
+        self._inflight: Dict[Tuple[int, Hashable], asyncio.Future] = {}
+        self._lock = threading.Lock()
+        # Last shared version seen, and the autocomplete reload it triggered
+        self._shared_seen: Optional[int] = None
+        self._reload: Optional[asyncio.Future] = None
+        self._next_sync = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    async def get(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Tuple[Any, str]:
+        """
+        Return (payload, etag) for key, calling loader on a miss.
+
+        Args:
+            key: Endpoint name and query parameters
+            loader: Coroutine function producing the JSON payload
+
+        Returns:
+            The payload and its ETag
+        """
+        await self._sync()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+            version = self.version
+            inflight = self._inflight.get((version, key))
+            if inflight is None:
+                inflight = asyncio.get_running_loop().create_future()
+                self._inflight[(version, key)] = inflight
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            return await asyncio.shield(inflight)
+
+        try:
+            payload = await loader()
+            entry = (payload, make_etag(payload))
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop((version, key), None)
+            if isinstance(e, Exception):
+                inflight.set_exception(e)
+                # Mark retrieved so a failed load with no waiters is not logged
+                inflight.exception()
+            else:
+                inflight.cancel()
+            raise
+
+        with self._lock:
+            self._inflight.pop((version, key), None)
+            if version == self.version:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        inflight.set_result(entry)
+        return entry
+
+    async def _sync(self) -> None:
+        """Drop entries and reload the autocomplete index if another process wrote templates."""
+        now = time.monotonic()
+        if now >= self._next_sync:
+            # Set before awaiting, so concurrent reads don't check again
+            self._next_sync = now + settings.METADATA_CACHE_SYNC_SECONDS
+            loop = asyncio.get_running_loop()
+            shared = await loop.run_in_executor(None, lambda: get_shared_state().get(SHARED_VERSION_KEY))
+            if shared != self._shared_seen:
+                if self._shared_seen is not None:
+                    self._drop()
+                    self._reload = asyncio.ensure_future(autocomplete_index.reload())
+                self._shared_seen = shared
+        if self._reload is not None and not self._reload.done():
+            await asyncio.shield(self._reload)
+
+    def _drop(self) -> None:
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            self.invalidations += 1
+
+    async def invalidate(self) -> None:
+        """Drop every entry here and in the other processes; called after templates are written."""
+        self._drop()
+        loop = asyncio.get_running_loop()
+        shared = await loop.run_in_executor(None, lambda: get_shared_state().incr(SHARED_VERSION_KEY))
+        if self._shared_seen is None or shared == self._shared_seen + 1:
+            self._shared_seen = shared
+        # Otherwise other processes wrote too; _sync() will reload the autocomplete index
+
+    async def refresh_periodically(self, interval: float) -> None:
+        """
+        Invalidate the cache and reload the autocomplete index every interval seconds.
+
+        Picks up templates written directly in the database. Every process
+        refreshes itself, so the shared version is left alone. Runs until
+        cancelled.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await autocomplete_index.reload()
+            except Exception as e:
+                print(f"WARNING: Failed to reload autocomplete index: {e}")
+            self._drop()
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry count, version and hit/miss/eviction/invalidation counters."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'version': self.version,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+
+def cached_response(request: Request, payload: Any, etag: str) -> Response:
+    """
+    JSON response for a cached payload, or 304 if the client already has it.
+
+    Clients must revalidate (Cache-Control: no-cache), so a write shows up
+    on the next request.
+    """
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=payload, headers=headers)
+
+
+# Global template metadata cache
+metadata_cache = TemplateMetadataCache()
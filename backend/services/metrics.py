@@ -0,0 +1,230 @@
+import heapq
+import itertools
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from config import settings
+
+# Upper bounds in seconds; sandbox phases range from microseconds to the timeout
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+PHASES = ('globals', 'exec', 'extract')
+
+# error_type values that mean a time limit stopped the execution
+TIMEOUT_ERROR_TYPES = {'TimeoutError': 'wall_clock', 'CpuLimitExceeded': 'cpu'}
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    """Monotonic counter with labels, rendered in Prometheus text format."""
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = defaultdict(float)
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] += amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, rendered in Prometheus text format."""
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (+inf last), sum]
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                bucket_labels = _format_labels(self.labelnames, labels, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {total:.6f}")
+            lines.append(f"{self.name}_count{label_str} {cumulative}")
+        return lines
+
+
+class SandboxMetrics:
+    """
+    Timing histograms and error counters for sandboxed template execution.
+
+    Sandbox workers time each execution's phases (globals setup, exec,
+    result extraction) and send the timings back with every job reply; the
+    API process times compilation. Everything is labelled with the template
+    id the job ran for. The number of distinct template labels is capped,
+    with the rest counted under 'other', so /metrics stays bounded.
+
+    The slowest executions are kept with their template id and seed, plus
+    a cProfile/tracemalloc report when METRICS_PROFILE is on.
+    """
+
+    def __init__(self, max_templates: Optional[int] = None, slowest_count: Optional[int] = None):
+        """
+        Initialize the metrics.
+
+        Args:
+            max_templates: Distinct template labels before folding into 'other' (default from settings)
+            slowest_count: Number of slowest executions kept (default from settings)
+        """
+        self.max_templates = max_templates or settings.METRICS_MAX_TEMPLATES
+        self.slowest_count = slowest_count or settings.METRICS_SLOWEST_COUNT
+        self._lock = threading.Lock()
+        self._templates = set()
+        self._slowest: List[Tuple[float, int, Dict[str, Any]]] = []
+        self._tiebreak = itertools.count()
+
+        self.phase_seconds = Histogram(
+            'sandbox_phase_seconds',
+            'Time spent in each phase of a sandboxed template execution',
+            ('template_id', 'phase')
+        )
+        self.executions = Counter(
+            'sandbox_executions_total',
+            'Sandboxed template executions',
+            ('template_id',)
+        )
+        self.errors = Counter(
+            'sandbox_errors_total',
+            'Failed sandboxed executions by error type',
+            ('error_type',)
+        )
+        self.timeouts = Counter(
+            'sandbox_timeouts_total',
+            'Executions stopped by a time limit',
+            ('limit',)
+        )
+
+    def _template_label(self, template_id: Optional[str]) -> str:
+        """Bounded label for a template id (lock held)."""
+        label = str(template_id or 'unknown')
+        if label in self._templates:
+            return label
+        if len(self._templates) >= self.max_templates:
+            return 'other'
+        self._templates.add(label)
+        return label
+
+    def _count_error(self, error_type: str, amount: int = 1) -> None:
+        self.errors.inc(error_type, amount=amount)
+        limit = TIMEOUT_ERROR_TYPES.get(error_type)
+        if limit:
+            self.timeouts.inc(limit, amount=amount)
+
+    def observe_compile(self, template_id: Optional[str], seconds: float) -> None:
+        """Record the compile phase (code cache lookup or compilation) for a template."""
+        with self._lock:
+            self.phase_seconds.observe(seconds, self._template_label(template_id), 'compile')
+
+    def observe_job(self, template_id: Optional[str], observations: Iterable[tuple]) -> None:
+        """
+        Record the executions a worker job reported.
+
+        Args:
+            template_id: Template the job ran for
+            observations: (seed, globals, exec, extract, error_type, profile)
+                tuples from sandbox.drain_observations()
+        """
+        with self._lock:
+            label = self._template_label(template_id)
+            for seed, globals_s, exec_s, extract_s, error_type, profile in observations:
+                for phase, seconds in zip(PHASES, (globals_s, exec_s, extract_s)):
+                    self.phase_seconds.observe(seconds, label, phase)
+                self.executions.inc(label)
+                if error_type:
+                    self._count_error(error_type)
+                self._keep_if_slow(exec_s, {
+                    'template_id': template_id,
+                    'seed': seed,
+                    'error_type': error_type,
+                    'phases_ms': {
+                        phase: round(seconds * 1000, 3)
+                        for phase, seconds in zip(PHASES, (globals_s, exec_s, extract_s))
+                    },
+                    'profile': profile
+                })
+
+    def observe_failure(self, template_id: Optional[str], error_type: str, executions: int = 1) -> None:
+        """Record executions lost to a worker-level failure (timeout, crash)."""
+        with self._lock:
+            self.executions.inc(self._template_label(template_id), amount=executions)
+            self._count_error(error_type, executions)
+
+    def _keep_if_slow(self, exec_seconds: float, record: Dict[str, Any]) -> None:
+        """Keep record if it is among the slowest executions (lock held)."""
+        entry = (exec_seconds, next(self._tiebreak), record)
+        if len(self._slowest) < self.slowest_count:
+            heapq.heappush(self._slowest, entry)
+        elif exec_seconds > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    def slowest(self) -> List[Dict[str, Any]]:
+        """Return the slowest executions, slowest first."""
+        with self._lock:
+            entries = sorted(self._slowest, reverse=True)
+        return [{'exec_ms': round(seconds * 1000, 3), **record} for seconds, _, record in entries]
+
+    def render(self, gauges: Optional[Dict[str, Dict[str, Any]]] = None) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format.
+
+        Args:
+            gauges: Extra numeric stats to export as gauges, e.g.
+                {'code_cache': code_cache.stats()} -> code_cache_hits ...
+        """
+        with self._lock:
+            lines = []
+            for metric in (self.phase_seconds, self.executions, self.errors, self.timeouts):
+                lines.extend(metric.render())
+
+        for prefix, stats in (gauges or {}).items():
+            for key, value in sorted(stats.items()):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                lines.append(f"# TYPE {prefix}_{key} gauge")
+                lines.append(f"{prefix}_{key} {value:g}")
+
+        return "\n".join(lines) + "\n"
+
+
+# Global sandbox metrics
+metrics = SandboxMetrics()
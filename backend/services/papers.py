@@ -0,0 +1,250 @@
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from config import settings
+from database import get_db, run_query
+from services.generator import TemplateCompileError, chunk_size_for, compile_template, generate_seeds, make_instance_id
+from services.worker_pool import sandbox_pool
+
+
+class PaperBlueprintError(Exception):
+    """Raised when a blueprint entry has no usable templates."""
+    pass
+
+
+async def _matching_templates(grade: int, topic: str, skill_name: str) -> List[Dict[str, Any]]:
+    """question_templates rows for one grade, topic and skill, in format order."""
+    db = get_db()
+    response = await run_query(
+        db.table('question_templates')
+        .select('*')
+        .eq('grade', grade)
+        .eq('topic', topic)
+        .eq('skill_name', skill_name)
+        .order('format')
+    )
+    return response.data or []
+
+
+async def _compile(template: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[Tuple[bytes, int]], Optional[str]]:
+    try:
+        return template, await compile_template(template), None
+    except TemplateCompileError as e:
+        return template, None, str(e)
+
+
+async def resolve_blueprint(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Find and compile the templates for each blueprint entry.
+
+    Every entry's lookup, and then every distinct template's compilation,
+    runs concurrently. Templates that do not compile are left out.
+
+    Args:
+        entries: Dictionaries with 'grade', 'topic', 'skill_name' and 'count'
+
+    Returns:
+        One section per entry: the entry plus 'templates', a list of
+        (template, code_blob, answer_line) in format order
+
+    Raises:
+        PaperBlueprintError: If an entry matches no template that compiles
+    """
+    matches = await asyncio.gather(*(
+        _matching_templates(entry['grade'], entry['topic'], entry['skill_name'])
+        for entry in entries
+    ))
+
+    distinct = {template['id']: template for rows in matches for template in rows}
+    compiled = {
+        template['id']: (template, code, error)
+        for template, code, error in await asyncio.gather(*(_compile(t) for t in distinct.values()))
+    }
+
+    sections = []
+    for entry, rows in zip(entries, matches):
+        label = f"grade {entry['grade']}, {entry['topic']} / {entry['skill_name']}"
+        if not rows:
+            raise PaperBlueprintError(f"No templates match {label}")
+
+        templates = []
+        errors = []
+        for row in rows:
+            template, code, error = compiled[row['id']]
+            if error:
+                errors.append(f"{template['id']}: {error}")
+            else:
+                templates.append((template, code[0], code[1]))
+        if not templates:
+            raise PaperBlueprintError(f"No template for {label} compiles ({'; '.join(errors)})")
+
+        sections.append({**entry, 'templates': templates})
+    return sections
+
+
+def plan_questions(sections: List[Dict[str, Any]], seed: int) -> List[Dict[str, Any]]:
+    """
+    Lay out the paper: which template and seed each question uses.
+
+    Sections follow the blueprint order and cycle through their templates
+    (so a section mixes formats); question n (from 1) uses seed + n - 1,
+    which keeps the paper reproducible from the blueprint and seed.
+
+    Returns:
+        Questions with 'number', 'section', 'template', 'code_blob',
+        'answer_line' and 'seed'
+    """
+    questions = []
+    for index, section in enumerate(sections):
+        templates = section['templates']
+        for position in range(section['count']):
+            template, code_blob, answer_line = templates[position % len(templates)]
+            number = len(questions) + 1
+            questions.append({
+                'number': number,
+                'section': index,
+                'template': template,
+                'code_blob': code_blob,
+                'answer_line': answer_line,
+                'seed': seed + number - 1
+            })
+    return questions
+
+
+def _chunks(questions: List[Dict[str, Any]], limit: int) -> List[List[Dict[str, Any]]]:
+    """Group questions by template into sandbox jobs (see chunk_size_for), ordered by their first question."""
+    by_template: Dict[str, List[Dict[str, Any]]] = {}
+    for question in questions:
+        by_template.setdefault(question['template']['id'], []).append(question)
+
+    chunks = []
+    for group in by_template.values():
+        chunk_size = chunk_size_for(group[0]['template'], limit)
+        chunks += [group[start:start + chunk_size] for start in range(0, len(group), chunk_size)]
+    chunks.sort(key=lambda chunk: chunk[0]['number'])
+    return chunks
+
+
+def _question_line(question: Dict[str, Any], instance: Dict[str, Any]) -> Dict[str, Any]:
+    template = question['template']
+    return {
+        'number': question['number'],
+        'section': question['section'],
+        'template_id': template['id'],
+        'type': template['type'],
+        'instance_id': make_instance_id(template['id'], template['format'], question['seed']),
+        'question': instance['question'],
+        'error': instance['error'],
+        'error_type': instance['error_type']
+    }
+
+
+async def assemble_paper(
+    sections: List[Dict[str, Any]],
+    seed: int,
+    deadline: float
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Generate a paper's questions across the sandbox pool and yield it piece by piece.
+
+    Questions are grouped by template into jobs of at most PAPER_CHUNK_SIZE
+    (fewer for slow templates), and a window of jobs runs concurrently
+    across the pool; results are served from the result cache where
+    possible. Questions are yielded in paper order as soon as they and
+    every earlier question are ready. At the deadline no further jobs are
+    started, the running ones are cancelled (their workers are replaced,
+    so the pool is free again) and the questions still missing are
+    reported with a TimeoutError, so a paper of any size finishes on time.
+    A job that fails only fails its own questions.
+
+    Args:
+        sections: Output of resolve_blueprint()
+        seed: Base seed
+        deadline: time.monotonic() value by which the paper must be complete
+
+    Yields:
+        {'paper': header}, then {'question': ...} per question in order,
+        then {'answer_key': [...], 'summary': {...}}
+    """
+    questions = plan_questions(sections, seed)
+    chunks = _chunks(questions, settings.PAPER_CHUNK_SIZE)
+    window = sandbox_pool.size * 2
+    started = time.monotonic()
+
+    yield {'paper': {
+        'seed': seed,
+        'total': len(questions),
+        'sections': [
+            {
+                'grade': section['grade'],
+                'topic': section['topic'],
+                'skill_name': section['skill_name'],
+                'count': section['count'],
+                'template_ids': [template['id'] for template, _, _ in section['templates']]
+            }
+            for section in sections
+        ]
+    }}
+
+    pending: Dict[asyncio.Future, List[Dict[str, Any]]] = {}
+    rendered: Dict[int, Dict[str, Any]] = {}
+    answer_key = []
+    summary = {'total': len(questions), 'generated': 0, 'errors': 0, 'timed_out': 0}
+    next_chunk = 0
+    emitted = 0
+
+    def emit(question: Dict[str, Any], instance: Dict[str, Any]) -> Dict[str, Any]:
+        line = _question_line(question, instance)
+        answer_key.append({'number': line['number'], 'instance_id': line['instance_id'], 'answer': instance['answer']})
+        summary['errors' if line['error'] else 'generated'] += 1
+        return {'question': line}
+
+    try:
+        while emitted < len(questions):
+            while next_chunk < len(chunks) and len(pending) < window:
+                chunk = chunks[next_chunk]
+                pending[asyncio.ensure_future(generate_seeds(
+                    chunk[0]['template'], chunk[0]['code_blob'], chunk[0]['answer_line'],
+                    [question['seed'] for question in chunk]
+                ))] = chunk
+                next_chunk += 1
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, _ = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                chunk = pending.pop(task)
+                try:
+                    instances = task.result()
+                except Exception as e:
+                    # Fail this chunk's questions, not the whole paper
+                    error = {'question': None, 'answer': None, 'error': f"Generation failed: {str(e)}", 'error_type': type(e).__name__}
+                    instances = [error] * len(chunk)
+                for question, instance in zip(chunk, instances):
+                    rendered[question['number']] = instance
+
+            while emitted < len(questions) and questions[emitted]['number'] in rendered:
+                yield emit(questions[emitted], rendered.pop(questions[emitted]['number']))
+                emitted += 1
+    finally:
+        # Deadline passed or the client went away; cancelling reaches the
+        # sandbox pool, which drops queued jobs and kills running ones
+        for task in pending:
+            task.cancel()
+
+    timeout_error = {
+        'question': None,
+        'answer': None,
+        'error': f"Paper exceeded its {settings.PAPER_TIMEOUT_SECONDS:g} second deadline",
+        'error_type': 'TimeoutError'
+    }
+    for question in questions[emitted:]:
+        instance = rendered.pop(question['number'], None)
+        if instance is None:
+            summary['timed_out'] += 1
+            instance = timeout_error
+        yield emit(question, instance)
+
+    summary['elapsed_ms'] = round((time.monotonic() - started) * 1000, 2)
+    yield {'answer_key': answer_key, 'summary': summary}
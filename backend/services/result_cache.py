@@ -0,0 +1,283 @@
+import asyncio
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+from config import settings
+
+# Bound on SQL variables per statement (SQLite's default limit is 999)
+_SPILL_BATCH = 500
+
+
+class _SpillStore:
+    """
+    SQLite-backed second tier for entries evicted from memory.
+
+    All disk I/O goes through one background thread (executor), so it never
+    runs on the event loop or under the memory tier's lock.
+    """
+
+    def __init__(self, directory: str, max_entries: int):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "rendered_questions.sqlite3")
+        self.max_entries = max_entries
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rendered ("
+            " key BLOB PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)"
+        )
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="result-cache-spill")
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, Tuple[bytes, Optional[float]]]:
+        rows = []
+        with self._lock:
+            for start in range(0, len(keys), _SPILL_BATCH):
+                batch = keys[start:start + _SPILL_BATCH]
+                rows += self._conn.execute(
+                    f"SELECT key, value, expires_at FROM rendered WHERE key IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+        return {key: (value, expires_at) for key, value, expires_at in rows}
+
+    def put_many(self, rows: List[Tuple[bytes, bytes, Optional[float]]]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO rendered (key, value, expires_at) VALUES (?, ?, ?)",
+                rows
+            )
+            self._writes += len(rows)
+            # Trim periodically rather than on every write
+            if self._writes >= 1000:
+                self._writes = 0
+                self._trim()
+
+    def delete_many(self, keys: List[bytes]) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM rendered WHERE key = ?", [(key,) for key in keys])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM rendered")
+
+    def _trim(self) -> None:
+        self._conn.execute(
+            "DELETE FROM rendered WHERE expires_at IS NOT NULL AND expires_at < ?",
+            (time.time(),)
+        )
+        self._conn.execute(
+            "DELETE FROM rendered WHERE rowid IN ("
+            " SELECT rowid FROM rendered ORDER BY rowid DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+
+class RenderedQuestionCache:
+    """
+    LRU + TTL cache of rendered question/answer results.
+
+    Generation is deterministic per (template, seed), so a rendered result
+    can be served again without touching the sandbox. Memory use is bounded
+    by entry count and by the pickled size of the values. With a spill
+    directory configured, entries evicted from memory move to an on-disk
+    SQLite tier instead of being dropped.
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        ttl: Optional[float] = None,
+        spill_dir: Optional[str] = None
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum entries kept in memory (default from settings)
+            max_bytes: Maximum pickled bytes kept in memory (default from settings)
+            ttl: Seconds an entry stays valid, 0 for no expiry (default from settings)
+            spill_dir: Directory for the on-disk tier, empty to disable (default from settings)
+        """
+        self.max_entries = max_entries or settings.RESULT_CACHE_MAX_ENTRIES
+        self.max_bytes = max_bytes or settings.RESULT_CACHE_MAX_BYTES
+        self.ttl = ttl if ttl is not None else settings.RESULT_CACHE_TTL
+        spill_dir = spill_dir if spill_dir is not None else settings.RESULT_CACHE_SPILL_DIR
+
+        self._entries: "OrderedDict[Hashable, Tuple[bytes, Optional[float]]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._spill = _SpillStore(spill_dir, settings.RESULT_CACHE_SPILL_MAX_ENTRIES) if spill_dir else None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _expires_at(self) -> Optional[float]:
+        return time.time() + self.ttl if self.ttl else None
+
+    def _memory_get(self, key: Hashable, now: float) -> Optional[bytes]:
+        """Pickled value for key from the memory tier, or None (lock held)."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is None or expires_at > now:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+        self._remove(key)
+        self.expirations += 1
+        return None
+
+    def _disk_get(self, keys: List[Hashable], now: float) -> Dict[Hashable, bytes]:
+        """Look keys up in the spill tier and move hits back to memory (blocking)."""
+        spill_keys = {pickle.dumps(key): key for key in keys}
+        found = {}
+        expired = []
+        for spill_key, (value, expires_at) in self._spill.get_many(list(spill_keys)).items():
+            if expires_at is None or expires_at > now:
+                found[spill_keys[spill_key]] = (value, expires_at)
+            else:
+                expired.append(spill_key)
+        if expired:
+            self._spill.delete_many(expired)
+
+        evicted = []
+        with self._lock:
+            self.disk_hits += len(found)
+            self.expirations += len(expired)
+            self.misses += len(spill_keys) - len(found)
+            for key, (value, expires_at) in found.items():
+                evicted += self._store(key, value, expires_at)
+        self._spill_evicted(evicted)
+        return {key: value for key, (value, _) in found.items()}
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        """
+        Return the cached result for key, or None.
+
+        A memory miss reads the spill tier in the calling thread; from
+        async code use get_many(), which reads it off the event loop.
+        """
+        now = time.time()
+
+        with self._lock:
+            value = self._memory_get(key, now)
+            if value is None and self._spill is None:
+                self.misses += 1
+        if value is None and self._spill is not None:
+            value = self._disk_get([key], now).get(key)
+        return pickle.loads(value) if value is not None else None
+
+    async def get_many(self, keys: List[Hashable]) -> Dict[Hashable, Dict[str, Any]]:
+        """
+        Return the cached results for keys (missing keys are left out).
+
+        Memory hits are served inline; the remaining keys are looked up in
+        the spill tier with one query on its background thread.
+        """
+        now = time.time()
+        found = {}
+        missing = []
+
+        with self._lock:
+            for key in keys:
+                value = self._memory_get(key, now)
+                if value is None:
+                    missing.append(key)
+                else:
+                    found[key] = value
+            if self._spill is None:
+                self.misses += len(missing)
+
+        if missing and self._spill is not None:
+            loop = asyncio.get_running_loop()
+            found.update(await loop.run_in_executor(self._spill.executor, self._disk_get, missing, now))
+        return {key: pickle.loads(value) for key, value in found.items()}
+
+    def put(self, key: Hashable, result: Dict[str, Any]) -> None:
+        """Cache a rendered result under key."""
+        value = pickle.dumps(result)
+        if len(value) > self.max_bytes:
+            return
+
+        with self._lock:
+            evicted = self._store(key, value, self._expires_at())
+        self._spill_evicted(evicted)
+
+    def _store(
+        self,
+        key: Hashable,
+        value: bytes,
+        expires_at: Optional[float]
+    ) -> List[Tuple[Hashable, bytes, Optional[float]]]:
+        """Insert an entry and evict down to the limits (lock held); returns the evicted entries."""
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, expires_at)
+        self._bytes += len(value)
+
+        evicted = []
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            old_key, (old_value, old_expires_at) = self._entries.popitem(last=False)
+            self._bytes -= len(old_value)
+            self.evictions += 1
+            evicted.append((old_key, old_value, old_expires_at))
+        return evicted
+
+    def _spill_evicted(self, evicted: List[Tuple[Hashable, bytes, Optional[float]]]) -> None:
+        """Queue evicted entries for the spill tier's background writer."""
+        if evicted and self._spill is not None:
+            rows = [(pickle.dumps(key), value, expires_at) for key, value, expires_at in evicted]
+            self._spill.executor.submit(self._spill.put_many, rows)
+
+    def flush(self) -> None:
+        """Wait until queued spill writes are on disk."""
+        if self._spill is not None:
+            self._spill.executor.submit(lambda: None).result()
+
+    def _remove(self, key: Hashable) -> None:
+        value, _ = self._entries.pop(key)
+        self._bytes -= len(value)
+
+    def clear(self) -> None:
+        """Drop all entries from both tiers."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self._spill is not None:
+            # Behind any queued writes, so evicted entries don't reappear
+            self._spill.executor.submit(self._spill.clear).result()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache size, counters and hit ratios."""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'spill_enabled': self._spill is not None,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_ratio': round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                'memory_hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+# Global rendered question cache
+result_cache = RenderedQuestionCache()
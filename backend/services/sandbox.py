@@ -1,10 +1,21 @@
+import hashlib
 import signal
 import random
 import math
-from typing import Any, Dict, Optional
-from RestrictedPython import compile_restricted, safe_globals
-from RestrictedPython.Guards import guarded_iter_unpack_sequence, guarded_unpack_sequence
+import marshal
+import operator
+import pickle
+import statistics
+import sys
+import time
+from types import CodeType, MappingProxyType
+from typing import Any, Dict, List, Optional, Tuple
+from RestrictedPython import safe_builtins
+from RestrictedPython.Guards import full_write_guard, guarded_iter_unpack_sequence, guarded_unpack_sequence
+from RestrictedPython.PrintCollector import PrintCollector
 from config import settings
+from services.code_cache import code_cache
+from services.template_lint import lint_template
 
 
 class TimeoutException(Exception):
@@ -12,15 +23,215 @@ class TimeoutException(Exception):
     pass
 
 
+class CpuLimitExceeded(Exception):
+    """Raised when code execution exceeds its CPU time budget."""
+    pass
+
+
+class OutputTooLarge(Exception):
+    """Raised when a template's question or answer exceeds the output size limit."""
+    pass
+
+
 def timeout_handler(signum, frame):
     """Signal handler for execution timeout."""
     raise TimeoutException("Execution timed out")
 
 
+def cpu_limit_handler(signum, frame):
+    """Signal handler for CPU time limits (SIGPROF timer, SIGXCPU rlimit)."""
+    raise CpuLimitExceeded("Execution exceeded CPU time limit")
+
+
+# Per-execution timings recorded in this process, drained by the worker loop
+# after each job: (seed, globals, exec, extract seconds, error_type, profile)
+_observations: List[tuple] = []
+# Bound in case nothing drains them (execution outside a worker process)
+_MAX_OBSERVATIONS = 10000
+
+# Exec times of the slowest profiled runs in this process; only runs that
+# make this list get a (costly) profile report
+_profiled_slowest: List[float] = []
+
+
+def drain_observations() -> List[tuple]:
+    """Return and clear the execution timings recorded since the last call."""
+    observations = _observations[:]
+    del _observations[:]
+    return observations
+
+
+def _start_profile() -> Tuple[Any, float]:
+    """Start cProfile and tracemalloc for one execution (METRICS_PROFILE)."""
+    # Only needed when profiling is switched on
+    import cProfile
+    import tracemalloc
+    
+    tracemalloc.start()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler, time.perf_counter()
+
+
+def _finish_profile(state: Tuple[Any, float]) -> Optional[Dict[str, Any]]:
+    """
+    Stop profiling and build a report if this run is among the slowest seen.
+    
+    Returns:
+        Dictionary with 'stats' (cProfile, by cumulative time),
+        'memory_peak_bytes' and 'top_allocations', or None
+    """
+    import heapq
+    import io
+    import pstats
+    import tracemalloc
+    
+    profiler, started = state
+    profiler.disable()
+    elapsed = time.perf_counter() - started
+    
+    try:
+        if len(_profiled_slowest) < settings.METRICS_SLOWEST_COUNT:
+            heapq.heappush(_profiled_slowest, elapsed)
+        elif elapsed > _profiled_slowest[0]:
+            heapq.heapreplace(_profiled_slowest, elapsed)
+        else:
+            return None
+        
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(15)
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(True, '<user_code>')])
+        return {
+            'stats': stream.getvalue(),
+            'memory_peak_bytes': peak,
+            'top_allocations': [str(stat) for stat in snapshot.statistics('lineno')[:5]]
+        }
+    finally:
+        tracemalloc.stop()
+
+
+def _guarded_getitem(obj: Any, key: Any) -> Any:
+    """_getitem_ guard: subscripting is allowed on every object."""
+    return obj[key]
+
+
+def _guarded_getiter(obj: Any) -> Any:
+    """_getiter_ guard for for-loops and comprehensions."""
+    return obj
+
+
+def _guarded_apply(fn: Any, *args: Any, **kwargs: Any) -> Any:
+    """_apply_ guard for calls with *args / **kwargs."""
+    return fn(*args, **kwargs)
+
+
+_INPLACE_OPS = {
+    '+=': operator.iadd,
+    '-=': operator.isub,
+    '*=': operator.imul,
+    '/=': operator.itruediv,
+    '//=': operator.ifloordiv,
+    '%=': operator.imod,
+    '**=': operator.ipow,
+    '<<=': operator.ilshift,
+    '>>=': operator.irshift,
+    '&=': operator.iand,
+    '|=': operator.ior,
+    '^=': operator.ixor,
+}
+
+
+def _guarded_inplacevar(op: str, x: Any, y: Any) -> Any:
+    """_inplacevar_ guard: augmented assignment to a name (total += i)."""
+    fn = _INPLACE_OPS.get(op)
+    if fn is None:
+        raise SyntaxError(f"Operator '{op}' is not allowed")
+    return fn(x, y)
+
+
+def _safe_import(name, globals=None, locals=None, fromlist=(), level=0):
+    """__import__ for templates: random (the execution's own generator) and math only."""
+    # 'import random' binds the execution's own seeded generator
+    if name == 'random' and globals and '_rng_' in globals:
+        return globals['_rng_']
+    if name in ['random', 'math']:
+        return __import__(name, globals, locals, fromlist, level)
+    raise ImportError(f"Import of {name} is not allowed")
+
+
+def _create_safe_builtins() -> Dict[str, Any]:
+    """Create the builtins layer shared by every execution in this process."""
+    # Start with RestrictedPython's safe builtins
+    builtins = dict(safe_builtins)
+    
+    # Add math module (safe for math questions); 'random' is a
+    # per-execution random.Random instance, see PythonSandbox._new_globals()
+    builtins['math'] = math
+    
+    # Add safe built-in functions
+    builtins['range'] = range
+    builtins['len'] = len
+    builtins['str'] = str
+    builtins['int'] = int
+    builtins['float'] = float
+    builtins['list'] = list
+    builtins['dict'] = dict
+    builtins['tuple'] = tuple
+    builtins['set'] = set
+    builtins['abs'] = abs
+    builtins['min'] = min
+    builtins['max'] = max
+    builtins['sum'] = sum
+    builtins['round'] = round
+    
+    # Add RestrictedPython guards
+    builtins['_iter_unpack_sequence_'] = guarded_iter_unpack_sequence
+    builtins['_unpack_sequence_'] = guarded_unpack_sequence
+    builtins['_getattr_'] = getattr
+    builtins['_getitem_'] = _guarded_getitem
+    builtins['_getiter_'] = _guarded_getiter
+    builtins['_inplacevar_'] = _guarded_inplacevar
+    builtins['_apply_'] = _guarded_apply
+    # Item/attribute writes only on lists, dicts and sets (never on math or random)
+    builtins['_write_'] = full_write_guard
+    # print() output is collected and discarded
+    builtins['_print_'] = PrintCollector
+    builtins['__import__'] = _safe_import
+    
+    # Block dangerous functions
+    builtins['open'] = None
+    builtins['eval'] = None
+    builtins['exec'] = None
+    builtins['compile'] = None
+    
+    return builtins
+
+
+# Built once per process and shared by every execution: each execution's
+# globals hold only its own names and fall back to this through
+# '__builtins__'. Restricted code cannot name '__builtins__', so it can
+# shadow these names but never change them for other executions.
+_SAFE_BUILTINS = _create_safe_builtins()
+
+# Read-only view of the shared builtins layer
+SAFE_BUILTINS = MappingProxyType(_SAFE_BUILTINS)
+
+
+def _stack_depth() -> int:
+    """Number of frames on the current call stack."""
+    depth = 0
+    frame = sys._getframe()
+    while frame is not None:
+        depth += 1
+        frame = frame.f_back
+    return depth
+
+
 class PythonSandbox:
     """Secure Python code execution sandbox."""
     
-    def __init__(self, timeout: int = None):
+    def __init__(self, timeout: Optional[float] = None):
         """
         Initialize the sandbox.
         
@@ -28,62 +239,53 @@ class PythonSandbox:
             timeout: Maximum execution time in seconds (default from settings)
         """
         self.timeout = timeout or settings.EXECUTION_TIMEOUT
-        self.safe_builtins = self._create_safe_builtins()
-    
-    def _create_safe_builtins(self) -> Dict[str, Any]:
-        """Create a safe set of builtins for code execution."""
-        # Start with RestrictedPython's safe globals
-        builtins = safe_globals.copy()
-        
-        # Add math and random modules (safe for math questions)
-        builtins['random'] = random
-        builtins['math'] = math
-        
-        # Add safe built-in functions
-        builtins['range'] = range
-        builtins['len'] = len
-        builtins['str'] = str
-        builtins['int'] = int
-        builtins['float'] = float
-        builtins['list'] = list
-        builtins['dict'] = dict
-        builtins['tuple'] = tuple
-        builtins['set'] = set
-        builtins['abs'] = abs
-        builtins['min'] = min
-        builtins['max'] = max
-        builtins['sum'] = sum
-        builtins['round'] = round
-        
-        # Add RestrictedPython guards
-        builtins['_iter_unpack_sequence_'] = guarded_iter_unpack_sequence
-        builtins['_unpack_sequence_'] = guarded_unpack_sequence
-        builtins['_getattr_'] = getattr
-        builtins['_getitem_'] = lambda obj, key: obj[key]
-        
-        def safe_import(name, globals=None, locals=None, fromlist=(), level=0):
-            if name in ['random', 'math']:
-                return __import__(name, globals, locals, fromlist, level)
-            raise ImportError(f"Import of {name} is not allowed")
-            
-        builtins['__import__'] = safe_import
-
-        # Block dangerous functions
-        # builtins['__import__'] = None # Replaced by safe_import
-        builtins['open'] = None
-        builtins['eval'] = None
-        builtins['exec'] = None
-        builtins['compile'] = None
-        builtins['__builtins__'] = builtins
+        self.cpu_limit = settings.EXECUTION_CPU_LIMIT
+        self.max_output_bytes = settings.EXECUTION_MAX_OUTPUT_BYTES
+        self.max_recursion_depth = settings.EXECUTION_MAX_RECURSION_DEPTH
+        self._profile = None
+    
+    def _new_globals(self, seed: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Build the globals for one execution.
         
-        return builtins
+        Only the per-execution names live here; everything else resolves
+        through '__builtins__' to the shared SAFE_BUILTINS layer. Each
+        execution gets its own random.Random(seed), so results are
+        reproducible from the seed and no RNG state is shared between runs.
+        """
+        rng = random.Random(seed)
+        return {'__builtins__': _SAFE_BUILTINS, 'random': rng, '_rng_': rng}
     
-    def execute(self, code: str) -> Dict[str, Any]:
+    def execute(self, code: str, seed: Optional[int] = None) -> Dict[str, Any]:
         """
         Execute Python code in a restricted environment.
         
         Args:
             code: Python code to execute
+            seed: Optional seed for the execution's random generator
+            
+        Returns:
+            Dictionary with 'result', 'error', and 'error_type' keys
+        """
+        try:
+            # Compile the code with RestrictedPython (cached by source hash)
+            byte_code = code_cache.get(code)
+        except SyntaxError as e:
+            return {
+                'result': None,
+                'error': f"Syntax Error: {e}",
+                'error_type': 'SyntaxError'
+            }
+        
+        return self.execute_compiled(byte_code, seed)
+    
+    def execute_compiled(self, byte_code: CodeType, seed: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Execute code already compiled with RestrictedPython.
+        
+        Args:
+            byte_code: Code object produced by compile_restricted
+            seed: Optional seed for the execution's random generator
             
         Returns:
             Dictionary with 'result', 'error', and 'error_type' keys
@@ -94,78 +296,504 @@ class PythonSandbox:
             'error_type': None
         }
         
+        # Set up execution environment
+        marks = [time.perf_counter()]
+        exec_globals = self._new_globals(seed)
+        exec_locals = {}
+        marks.append(time.perf_counter())
+        
         try:
-            # Compile the code with RestrictedPython
-            byte_code = compile_restricted(
-                code,
-                filename='<user_code>',
-                mode='exec'
-            )
+            try:
+                self._run(byte_code, exec_globals, exec_locals)
+            finally:
+                marks.append(time.perf_counter())
             
-            # Set up execution environment
-            exec_globals = self.safe_builtins.copy()
-            exec_locals = {}
+            # Look for return value in locals
+            # Check for common return patterns
+            if 'result' in exec_locals:
+                result['result'] = exec_locals['result']
+            elif 'answer' in exec_locals:
+                result['result'] = exec_locals['answer']
+            elif 'question' in exec_locals:
+                result['result'] = exec_locals['question']
+            else:
+                # Get the last assigned variable if any
+                if exec_locals:
+                    result['result'] = list(exec_locals.values())[-1]
             
-            # Set up timeout (Unix-based systems)
-            # Note: signal.alarm doesn't work on Windows
-            # For Windows, we'll use a simple execution without timeout
-            # Production use should consider multiprocessing or threading alternatives
-            try:
-                # Try to set alarm (works on Unix/Linux/Mac)
-                signal.signal(signal.SIGALRM, timeout_handler)
-                signal.alarm(self.timeout)
-                has_alarm = True
-            except (AttributeError, ValueError):
-                # Windows doesn't support SIGALRM
-                has_alarm = False
+            self._check_output('result', result['result'])
+        
+        except Exception as e:
+            result['result'] = None
+            result['error'], result['error_type'] = self._describe_error(e)
+        
+        marks.append(time.perf_counter())
+        self._observe(seed, marks, result['error_type'])
+        return result
+    
+    def execute_template(
+        self,
+        byte_code: CodeType,
+        answer_line: int,
+        seed: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Execute a joined question + answer template in one shared namespace.
+        
+        The answer part sees every variable the question part defined, and
+        'question' and 'answer' are read directly from the namespace.
+        
+        Args:
+            byte_code: Compiled output of join_template()
+            answer_line: First line of the answer part in the joined source
+            seed: Optional seed for the execution's random generator
             
-            try:
-                # Execute the code
-                exec(byte_code, exec_globals, exec_locals)
-                
-                # Look for return value in locals
-                # Check for common return patterns
-                if 'result' in exec_locals:
-                    result['result'] = exec_locals['result']
-                elif 'answer' in exec_locals:
-                    result['result'] = exec_locals['answer']
-                elif 'question' in exec_locals:
-                    result['result'] = exec_locals['question']
-                else:
-                    # Get the last assigned variable if any
-                    if exec_locals:
-                        result['result'] = list(exec_locals.values())[-1]
-                
-            finally:
-                # Cancel alarm
-                if has_alarm:
-                    signal.alarm(0)
+        Returns:
+            Dictionary with 'question', 'answer', 'error', and 'error_type' keys
+        """
+        marks = [time.perf_counter()]
+        result = self._execute_template(byte_code, answer_line, seed, marks)
+        marks.append(time.perf_counter())
+        self._observe(seed, marks, result['error_type'])
+        return result
+    
+    def _execute_template(
+        self,
+        byte_code: CodeType,
+        answer_line: int,
+        seed: Optional[int],
+        marks: List[float]
+    ) -> Dict[str, Any]:
+        """execute_template() body; appends the end of the globals and exec phases to marks."""
+        result = {
+            'question': None,
+            'answer': None,
+            'error': None,
+            'error_type': None
+        }
         
-        except SyntaxError as e:
-            result['error'] = f"Syntax Error: {e}"
-            result['error_type'] = 'SyntaxError'
-
-        except TimeoutException:
-            result['error'] = f"Code execution exceeded {self.timeout} second timeout"
-            result['error_type'] = 'TimeoutError'
+        namespace = self._new_globals(seed)
+        marks.append(time.perf_counter())
         
+        try:
+            self._run(byte_code, namespace, namespace)
         except Exception as e:
-            result['error'] = str(e)
-            result['error_type'] = type(e).__name__
+            error, result['error_type'] = self._describe_error(e)
+            lineno = _user_code_lineno(e)
+            part = "Answer" if lineno is not None and lineno >= answer_line else "Question"
+            result['error'] = f"{part} Template Error: {error}"
+            return result
+        finally:
+            marks.append(time.perf_counter())
+        
+        for part, name in (("Question", 'question'), ("Answer", 'answer')):
+            if name not in namespace:
+                result['error'] = f"{part} Template Error: '{name}' was not assigned"
+                result['error_type'] = 'MissingVariable'
+                return result
+            try:
+                self._check_output(name, namespace[name])
+            except OutputTooLarge as e:
+                result['question'] = None
+                result['error'] = f"{part} Template Error: {e}"
+                result['error_type'] = 'OutputTooLarge'
+                return result
+            result[name] = namespace[name]
         
         return result
+    
+    def _observe(self, seed: Optional[int], marks: List[float], error_type: Optional[str]) -> None:
+        """Record phase timings from [start, globals done, exec done, finished] marks."""
+        if len(_observations) >= _MAX_OBSERVATIONS:
+            return
+        start, prepared, executed, finished = marks
+        _observations.append((
+            seed, prepared - start, executed - prepared, finished - executed,
+            error_type, self._profile
+        ))
+        self._profile = None
+    
+    def _check_output(self, name: str, value: Any) -> None:
+        """
+        Make sure a result can be sent back and is within the size limit.
+        
+        Raises:
+            OutputTooLarge: If the pickled value exceeds max_output_bytes
+                or cannot be pickled at all
+        """
+        try:
+            size = len(pickle.dumps(value))
+        except Exception as e:
+            raise OutputTooLarge(f"'{name}' cannot be returned ({type(e).__name__}: {e})")
+        if size > self.max_output_bytes:
+            raise OutputTooLarge(
+                f"'{name}' is {size} bytes, over the {self.max_output_bytes} byte output limit"
+            )
+    
+    def _run(self, byte_code: CodeType, exec_globals: Dict[str, Any], exec_locals: Dict[str, Any]) -> None:
+        """Execute byte_code under the sandbox time, CPU and recursion limits."""
+        # Interval timers allow sub-second limits: ITIMER_REAL for wall-clock
+        # time, ITIMER_PROF for CPU time (Unix only; Windows runs without them)
+        # Sandbox worker processes add RLIMIT_CPU, RLIMIT_AS and a hard kill on top
+        try:
+            signal.signal(signal.SIGALRM, timeout_handler)
+            signal.signal(signal.SIGPROF, cpu_limit_handler)
+            signal.setitimer(signal.ITIMER_REAL, self.timeout)
+            if self.cpu_limit:
+                signal.setitimer(signal.ITIMER_PROF, self.cpu_limit)
+            has_timers = True
+        except (AttributeError, ValueError):
+            # No interval timers on this platform, or not on the main thread
+            has_timers = False
+        
+        # Count template recursion from here, not from the interpreter's default
+        recursion_limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(_stack_depth() + self.max_recursion_depth)
+        
+        profile = _start_profile() if settings.METRICS_PROFILE else None
+        
+        try:
+            # Execute the code
+            exec(byte_code, exec_globals, exec_locals)
+        finally:
+            sys.setrecursionlimit(recursion_limit)
+            if has_timers:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+                signal.setitimer(signal.ITIMER_PROF, 0)
+            if profile is not None:
+                self._profile = _finish_profile(profile)
+    
+    def _describe_error(self, e: Exception) -> Tuple[str, str]:
+        """Map an execution exception to (error message, error_type)."""
+        if isinstance(e, TimeoutException):
+            return f"Code execution exceeded {self.timeout:g} second timeout", 'TimeoutError'
+        if isinstance(e, CpuLimitExceeded):
+            return str(e), 'CpuLimitExceeded'
+        if isinstance(e, MemoryError):
+            return "Code execution exceeded the memory limit", 'MemoryLimitExceeded'
+        if isinstance(e, RecursionError):
+            return (
+                f"Code execution exceeded the maximum recursion depth of {self.max_recursion_depth}",
+                'RecursionLimitExceeded'
+            )
+        if isinstance(e, OutputTooLarge):
+            return str(e), 'OutputTooLarge'
+        return str(e), type(e).__name__
+
+
+def _user_code_lineno(e: Exception) -> Optional[int]:
+    """Line of the template's top-level code that was running when e was raised."""
+    tb = e.__traceback__
+    while tb is not None:
+        if tb.tb_frame.f_code.co_filename == '<user_code>':
+            return tb.tb_lineno
+        tb = tb.tb_next
+    return None
+
+
+def join_template(question_template: str, answer_template: str) -> Tuple[str, int]:
+    """
+    Join question and answer code into a single compilation unit.
+    
+    Args:
+        question_template: Python code for the question
+        answer_template: Python code for the answer
+        
+    Returns:
+        Tuple of (joined source, first line of the answer part)
+    """
+    source = question_template + "\n" + answer_template
+    return source, question_template.count("\n") + 2
 
 
-def execute_code(code: str, timeout: Optional[int] = None) -> Dict[str, Any]:
+def execute_code(code: str, timeout: Optional[float] = None, seed: Optional[int] = None) -> Dict[str, Any]:
     """
     Convenience function to execute code in sandbox.
     
     Args:
         code: Python code to execute
         timeout: Optional custom timeout
+        seed: Optional seed for the execution's random generator
+        
+    Returns:
+        Execution result dictionary
+    """
+    sandbox = PythonSandbox(timeout=timeout)
+    return sandbox.execute(code, seed)
+
+
+def execute_marshalled(
+    code_blob: bytes,
+    timeout: Optional[float] = None,
+    seed: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Execute marshalled RestrictedPython bytecode in sandbox.
+    
+    Used by sandbox worker processes, which receive code already compiled
+    (and cached) by the API process.
+    
+    Args:
+        code_blob: marshal.dumps() of a compile_restricted code object
+        timeout: Optional custom timeout
+        seed: Optional seed for the execution's random generator
         
     Returns:
         Execution result dictionary
     """
     sandbox = PythonSandbox(timeout=timeout)
-    return sandbox.execute(code)
+    return sandbox.execute_compiled(marshal.loads(code_blob), seed)
+
+
+def execute_template_marshalled(
+    code_blob: bytes,
+    answer_line: int,
+    timeout: Optional[float] = None,
+    seed: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Execute a marshalled joined template in sandbox.
+    
+    Args:
+        code_blob: Marshalled compiled output of join_template()
+        answer_line: First line of the answer part in the joined source
+        timeout: Optional custom timeout
+        seed: Optional seed for the execution's random generator
+        
+    Returns:
+        Dictionary with 'question', 'answer', 'error', and 'error_type' keys
+    """
+    sandbox = PythonSandbox(timeout=timeout)
+    return sandbox.execute_template(marshal.loads(code_blob), answer_line, seed)
+
+
+def generate_batch(
+    code_blob: bytes,
+    answer_line: int,
+    seeds: List[int],
+    timeout: Optional[float] = None
+) -> List[Dict[str, Any]]:
+    """
+    Generate one question/answer instance per seed in a single sandbox session.
+    
+    The code object is unmarshalled and the sandbox globals prepared once,
+    then reused for every instance. Errors are reported per instance and do
+    not abort the batch.
+    
+    Args:
+        code_blob: Marshalled compiled output of join_template()
+        answer_line: First line of the answer part in the joined source
+        seeds: Random seeds, one per instance
+        timeout: Optional per-instance timeout
+        
+    Returns:
+        List of dictionaries with 'seed', 'question', 'answer', 'error'
+        and 'error_type' keys
+    """
+    sandbox = PythonSandbox(timeout=timeout)
+    byte_code = marshal.loads(code_blob)
+    instances = []
+    
+    for seed in seeds:
+        instances.append({'seed': seed, **sandbox.execute_template(byte_code, answer_line, seed)})
+    
+    return instances
+
+
+def _instance_key(instance: Dict[str, Any], unique_by: str) -> str:
+    """Hash identifying a rendered question (and answer, if unique_by is 'question_answer')."""
+    text = str(instance['question'])
+    if unique_by == 'question_answer':
+        text += "\0" + repr(instance['answer'])
+    return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest()
+
+
+def estimate_distinct_outputs(frequencies: List[int]) -> int:
+    """
+    Estimate how many distinct outputs a template can produce (bias-corrected Chao1).
+    
+    Args:
+        frequencies: How many times each distinct output was seen
+    
+    Returns:
+        Estimated number of distinct outputs, at least the number seen
+    """
+    seen_once = sum(1 for count in frequencies if count == 1)
+    seen_twice = sum(1 for count in frequencies if count == 2)
+    return len(frequencies) + round(seen_once * (seen_once - 1) / (2 * (seen_twice + 1)))
+
+
+def generate_unique(
+    code_blob: bytes,
+    answer_line: int,
+    count: int,
+    seed: int,
+    max_attempts: int,
+    stall_limit: int,
+    unique_by: str = 'question',
+    timeout: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Generate count distinct instances in a single sandbox session.
+    
+    Seeds seed, seed + 1, ... are tried in order and an instance is kept
+    only if its hash (see _instance_key) has not been seen. Generation stops
+    once count instances are kept, after max_attempts tries, or early when
+    stall_limit tries in a row produced nothing new, which means the
+    template's output space is too small for count.
+    
+    Args:
+        code_blob: Marshalled compiled output of join_template()
+        answer_line: First line of the answer part in the joined source
+        count: Distinct instances wanted
+        seed: First seed to try
+        max_attempts: Executions allowed in total
+        stall_limit: Executions in a row without a new instance before giving up
+        unique_by: 'question' or 'question_answer'
+        timeout: Optional per-instance timeout
+    
+    Returns:
+        Dictionary with 'instances' (distinct instances with their seeds),
+        'attempts', 'duplicates', 'errors', 'last_error', 'exhausted'
+        (stopped short of count) and 'estimated_distinct_outputs' (set when
+        exhausted)
+    """
+    sandbox = PythonSandbox(timeout=timeout)
+    byte_code = marshal.loads(code_blob)
+    frequencies: Dict[str, int] = {}
+    instances = []
+    attempts = duplicates = errors = stalled = 0
+    last_error = None
+    
+    while len(instances) < count and attempts < max_attempts and stalled < stall_limit:
+        instance = {'seed': seed + attempts, **sandbox.execute_template(byte_code, answer_line, seed + attempts)}
+        attempts += 1
+    
+        if instance['error']:
+            errors += 1
+            stalled += 1
+            last_error = instance['error']
+            continue
+    
+        key = _instance_key(instance, unique_by)
+        if key in frequencies:
+            frequencies[key] += 1
+            duplicates += 1
+            stalled += 1
+            continue
+    
+        frequencies[key] = 1
+        stalled = 0
+        instances.append(instance)
+    
+    exhausted = len(instances) < count
+    return {
+        'instances': instances,
+        'attempts': attempts,
+        'duplicates': duplicates,
+        'errors': errors,
+        'last_error': last_error,
+        'exhausted': exhausted,
+        'estimated_distinct_outputs': estimate_distinct_outputs(list(frequencies.values())) if exhausted else None
+    }
+
+
+def run_trials(
+    byte_code: CodeType,
+    answer_line: int,
+    seeds: List[int],
+    timeout: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Run a compiled template once per seed and measure its cost.
+    
+    Stops at the first failing seed, since a template that errors for any
+    seed is not fit to save.
+    
+    Args:
+        byte_code: Compiled output of join_template()
+        answer_line: First line of the answer part in the joined source
+        seeds: Trial seeds
+        timeout: Optional per-run timeout
+        
+    Returns:
+        Dictionary with 'error', 'error_type' and 'estimated_cost_ms'
+        (median wall time per run, None if a run failed)
+    """
+    sandbox = PythonSandbox(timeout=timeout)
+    timings = []
+    
+    for seed in seeds:
+        start = time.perf_counter()
+        result = sandbox.execute_template(byte_code, answer_line, seed)
+        timings.append((time.perf_counter() - start) * 1000)
+        if result['error']:
+            return {
+                'error': f"{result['error']} (trial seed {seed})",
+                'error_type': result['error_type'],
+                'estimated_cost_ms': None
+            }
+    
+    return {
+        'error': None,
+        'error_type': None,
+        'estimated_cost_ms': round(statistics.median(timings), 3) if timings else None
+    }
+
+
+def run_trials_marshalled(
+    code_blob: bytes,
+    answer_line: int,
+    seeds: List[int],
+    timeout: Optional[float] = None
+) -> Dict[str, Any]:
+    """Worker entry point for run_trials() on marshalled template code."""
+    return run_trials(marshal.loads(code_blob), answer_line, seeds, timeout)
+
+
+def check_templates(
+    templates: List[Tuple[str, str]],
+    seeds: List[int],
+    timeout: Optional[float] = None
+) -> List[Dict[str, Any]]:
+    """
+    Validate (question, answer) template pairs as at save time.
+    
+    Each pair is compiled, linted (see template_lint) and trial-run once
+    per seed. Used by bulk import to spread validation across the sandbox
+    worker processes.
+    
+    Args:
+        templates: List of (question_template, answer_template) pairs
+        seeds: Trial seeds
+        timeout: Optional per-run timeout
+        
+    Returns:
+        One dictionary per pair with 'error', 'error_type' and 'estimated_cost_ms'
+    """
+    results = []
+    
+    for question_template, answer_template in templates:
+        source, answer_line = join_template(question_template, answer_template)
+        try:
+            byte_code = code_cache.get(source)
+        except SyntaxError:
+            # Compile the parts on their own to report which one is broken
+            error = "Answer Template Error: Syntax Error: templates do not compile together"
+            for label, part in (("Question", question_template), ("Answer", answer_template)):
+                try:
+                    code_cache.get(part)
+                except SyntaxError as e:
+                    error = f"{label} Template Error: Syntax Error: {e}"
+                    break
+            results.append({'error': error, 'error_type': 'SyntaxError', 'estimated_cost_ms': None})
+            continue
+        
+        problems = lint_template(question_template, answer_template)
+        if problems:
+            results.append({'error': "; ".join(problems), 'error_type': 'LintError', 'estimated_cost_ms': None})
+            continue
+        
+        results.append(run_trials(byte_code, answer_line, seeds, timeout))
+    
+    return results
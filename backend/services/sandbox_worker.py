@@ -0,0 +1,102 @@
+import math
+import signal
+from typing import Callable
+from services.sandbox import cpu_limit_handler, drain_observations
+
+try:
+    import resource
+except ImportError:
+    # resource is Unix-only; CPU limits are skipped on Windows
+    resource = None
+
+
+def _limit_cpu(seconds: int) -> Callable[[], None]:
+    """
+    Cap the CPU time available to the next job in this process.
+
+    RLIMIT_CPU counts the whole lifetime of the process, so the soft limit
+    is set relative to the CPU time already used.
+
+    Returns:
+        Callable that restores the previous limit
+    """
+    if resource is None or not seconds:
+        return lambda: None
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = usage.ru_utime + usage.ru_stime
+    new_soft = math.ceil(used + seconds)
+    if hard != resource.RLIM_INFINITY:
+        new_soft = min(new_soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (new_soft, hard))
+
+    return lambda: resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _limit_memory(megabytes: int) -> None:
+    """
+    Cap this process's address space at its current size plus megabytes.
+
+    Allocations past the cap raise MemoryError inside the sandboxed code
+    instead of pushing the node into swap. The current size is read from
+    /proc, so the cap is only applied on Linux.
+    """
+    if resource is None or not megabytes:
+        return
+
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+    limit = pages * resource.getpagesize() + megabytes * 1024 * 1024
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def worker_main(conn, cpu_limit: int, memory_limit_mb: int = 0) -> None:
+    """
+    Entry point of a sandbox worker process.
+
+    This module imports only the sandbox and the standard library. With the
+    forkserver start method it is the fork server's only preload, so
+    workers are forked already warm and never import the API (routers,
+    database client, FastAPI).
+
+    Receives (function, args, cpu_limit) jobs over the pipe and answers
+    with (ok, payload, observations) tuples until it gets None or the pipe
+    is closed. observations are the job's execution timings (see
+    sandbox.drain_observations). A cpu_limit of None falls back to the
+    worker's default.
+    """
+    # Ctrl+C is handled by the parent, which shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if hasattr(signal, 'SIGXCPU'):
+        signal.signal(signal.SIGXCPU, cpu_limit_handler)
+    _limit_memory(memory_limit_mb)
+
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            break
+        if job is None:
+            break
+
+        fn, args, job_cpu_limit = job
+        restore = _limit_cpu(job_cpu_limit if job_cpu_limit is not None else cpu_limit)
+        try:
+            reply = (True, fn(*args), drain_observations())
+        except BaseException as e:
+            reply = (False, f"{type(e).__name__}: {e}", drain_observations())
+        finally:
+            restore()
+
+        try:
+            conn.send(reply)
+        except (EOFError, OSError):
+            break
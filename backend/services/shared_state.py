@@ -0,0 +1,68 @@
+import sqlite3
+import threading
+from typing import Optional
+from config import settings
+
+
+class SharedState:
+    """
+    Named integer counters shared by the API worker processes on one host.
+
+    Backed by a small SQLite file in WAL mode (one connection per thread,
+    as in SQLiteClient), so reads are a single indexed lookup and an
+    increment is atomic across processes. Used for data versions that
+    per-process caches compare against to notice writes made by other
+    workers.
+    """
+
+    def __init__(self, db_file: Optional[str] = None):
+        self.db_file = db_file or settings.SHARED_STATE_DB_PATH
+        self._local = threading.local()
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL) WITHOUT ROWID"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, name: str) -> int:
+        """Current value of a counter (0 if it was never incremented)."""
+        row = self._connection().execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def incr(self, name: str, amount: int = 1) -> int:
+        """Atomically add amount to a counter and return the new value."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO counters (name, value) VALUES (?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+                (name, amount)
+            )
+            (value,) = conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return value
+
+
+_shared_state: Optional[SharedState] = None
+_shared_state_lock = threading.Lock()
+
+
+def get_shared_state() -> SharedState:
+    """Shared state store, opened on first use."""
+    global _shared_state
+    if _shared_state is None:
+        with _shared_state_lock:
+            if _shared_state is None:
+                _shared_state = SharedState()
+    return _shared_state
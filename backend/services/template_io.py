@@ -0,0 +1,211 @@
+import asyncio
+import csv
+import io
+import itertools
+import json
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+from config import settings
+from database import get_db, run_query
+from services.generator import trial_seeds
+from services.template_store import build_template_data, insert_templates
+from services.worker_pool import sandbox_pool
+
+FILE_FORMATS = ('ndjson', 'csv')
+
+EXPORT_COLUMNS = [
+    'id', 'module', 'category', 'grade', 'topic', 'skill_name', 'format', 'type',
+    'question_template', 'answer_template', 'estimated_cost_ms',
+    'created_by', 'updated_by', 'created_at', 'updated_at'
+]
+
+# (line number, parsed row or None, parse error or None)
+ParsedRow = Tuple[int, Optional[Dict[str, Any]], Optional[str]]
+
+
+def guess_file_format(filename: Optional[str]) -> str:
+    """Pick 'csv' or 'ndjson' from a file name (ndjson unless it ends in .csv)."""
+    return 'csv' if filename and filename.lower().endswith('.csv') else 'ndjson'
+
+
+def read_rows(stream: TextIO, file_format: str) -> Iterator[ParsedRow]:
+    """
+    Lazily parse template rows from a text stream.
+
+    Rows are read one at a time, so memory use does not grow with the file.
+    Empty CSV cells are dropped so optional fields fall back to their defaults.
+
+    Args:
+        stream: Text stream positioned at the start of the file
+        file_format: 'ndjson' or 'csv'
+
+    Yields:
+        (line number, row, error) tuples; row is None when error is set
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        try:
+            reader.fieldnames
+        except csv.Error as e:
+            yield 1, None, f"Invalid CSV: {e}"
+            return
+
+        while True:
+            line = reader.line_num + 1
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                # The reader cannot resynchronise after a malformed record
+                yield line, None, f"Invalid CSV: {e}"
+                return
+            yield line, {k: v for k, v in row.items() if k and v not in ('', None)}, None
+    else:
+        for line, text in enumerate(stream, 1):
+            if not text.strip():
+                continue
+            try:
+                row = json.loads(text)
+            except ValueError as e:
+                yield line, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(row, dict):
+                yield line, None, "Invalid JSON: expected an object"
+                continue
+            yield line, row, None
+
+
+async def _import_batch(
+    batch: List[ParsedRow],
+    validate: Callable[[Dict[str, Any]], Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """Validate, check (compile, lint, trial runs) and insert one batch; one result per row."""
+    errors: Dict[int, str] = {}
+    valid: List[Tuple[int, Dict[str, Any]]] = []
+
+    for i, (_, row, error) in enumerate(batch):
+        if error is not None:
+            errors[i] = error
+            continue
+        try:
+            valid.append((i, build_template_data(validate(row))))
+        except ValueError as e:
+            errors[i] = str(e)
+
+    checks = await sandbox_pool.check(
+        [(data['question_template'], data['answer_template']) for _, data in valid],
+        trial_seeds(),
+        template_id='import'
+    )
+    compiled = []
+    for (i, data), check in zip(valid, checks):
+        if check['error'] is None:
+            data['estimated_cost_ms'] = check['estimated_cost_ms']
+            compiled.append((i, data))
+        else:
+            errors[i] = check['error']
+
+    inserted = {}
+    saved = await insert_templates([data for _, data in compiled])
+    for (i, _), result in zip(compiled, saved):
+        if 'error' in result:
+            errors[i] = f"Failed to save template: {result['error']}"
+        else:
+            inserted[i] = result['row']
+
+    results = []
+    for i, (line, _, _) in enumerate(batch):
+        if i in inserted:
+            row = inserted[i]
+            results.append({'line': line, 'status': 'created', 'id': row.get('id'), 'format': row.get('format')})
+        else:
+            results.append({'line': line, 'status': 'failed', 'error': errors[i]})
+    return results
+
+
+async def import_templates(
+    rows: Iterable[ParsedRow],
+    validate: Callable[[Dict[str, Any]], Dict[str, Any]],
+    batch_size: Optional[int] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Import template rows in batches, reporting a result for every row.
+
+    Each batch is read off the event loop, validated, checked as at save
+    time (compile, lint, trial runs) in parallel across the sandbox worker
+    pool, and inserted with one multi-row insert where possible. Only one
+    batch is held in memory at a time. Formats are handled as in
+    POST /api/templates: a missing or taken format is allocated by the
+    server.
+
+    Args:
+        rows: Parsed rows, e.g. from read_rows()
+        validate: Turns a raw row into template fields; raises ValueError if invalid
+        batch_size: Rows per batch (default from settings)
+
+    Yields:
+        Per-row results {'line', 'status', 'id', 'format'} or {'line', 'status', 'error'},
+        then a final {'summary': {'created', 'failed'}}
+    """
+    batch_size = batch_size or settings.BULK_BATCH_SIZE
+    loop = asyncio.get_running_loop()
+    rows = iter(rows)
+    summary = {'created': 0, 'failed': 0}
+
+    while True:
+        batch = await loop.run_in_executor(None, lambda: list(itertools.islice(rows, batch_size)))
+        if not batch:
+            break
+
+        for result in await _import_batch(batch, validate):
+            summary[result['status']] += 1
+            yield result
+
+    yield {'summary': summary}
+
+
+async def export_rows(page_size: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+    """Yield every question_templates row, one page of queries at a time."""
+    page_size = page_size or settings.BULK_EXPORT_PAGE_SIZE
+    db = get_db()
+    offset = 0
+
+    while True:
+        response = await run_query(
+            db.table('question_templates')
+            .select('*')
+            .order('id')
+            .limit(page_size)
+            .offset(offset)
+        )
+        rows = response.data or []
+        for row in rows:
+            yield row
+        if len(rows) < page_size:
+            return
+        offset += page_size
+
+
+async def export_templates(file_format: str) -> AsyncIterator[str]:
+    """
+    Serialize all templates as NDJSON or CSV, row by row.
+
+    Args:
+        file_format: 'ndjson' or 'csv'
+
+    Yields:
+        Chunks of the export file
+    """
+    if file_format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, EXPORT_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        async for row in export_rows():
+            writer.writerow(row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    else:
+        async for row in export_rows():
+            yield json.dumps({col: row.get(col) for col in EXPORT_COLUMNS}, default=str) + "\n"
@@ -0,0 +1,155 @@
+import ast
+from typing import List, Optional, Set
+from config import settings
+
+# Modules the sandbox's import hook allows
+ALLOWED_IMPORTS = {'random', 'math'}
+
+# Builtins that are disabled or missing in the sandbox; using them can only fail at runtime
+FORBIDDEN_NAMES = {
+    'open', 'eval', 'exec', 'compile', 'globals', 'locals', 'vars', 'input',
+    'breakpoint', 'exit', 'quit', 'help', 'memoryview'
+}
+
+_INT_OPS = {
+    ast.Add: lambda a, b: a + b,
+    ast.Sub: lambda a, b: a - b,
+    ast.Mult: lambda a, b: a * b,
+    ast.FloorDiv: lambda a, b: a // b,
+}
+
+
+def _const_int(node: ast.AST) -> Optional[int]:
+    """Evaluate a constant integer expression (literals and + - * // **), else None."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, int) and not isinstance(node.value, bool):
+        return node.value
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        value = _const_int(node.operand)
+        return -value if value is not None else None
+    if isinstance(node, ast.BinOp):
+        left, right = _const_int(node.left), _const_int(node.right)
+        if left is None or right is None:
+            return None
+        if isinstance(node.op, ast.Pow):
+            # Enough to spot 10**9 without evaluating something like 10**10**10
+            if right < 0 or right * abs(left).bit_length() > 4096:
+                return None
+            return left ** right
+        op = _INT_OPS.get(type(node.op))
+        if op is None or (isinstance(node.op, ast.FloorDiv) and right == 0):
+            return None
+        return op(left, right)
+    return None
+
+
+def _range_length(*args: int) -> int:
+    """len(range(*args)) without OverflowError for huge ranges."""
+    start, stop, step = (0, args[0], 1) if len(args) == 1 else (args[0], args[1], args[2] if len(args) > 2 else 1)
+    if step > 0:
+        return max(0, -(-(stop - start) // step))
+    return max(0, -(-(start - stop) // -step))
+
+
+def _mutated_names(body: List[ast.stmt]) -> Set[str]:
+    """Names assigned, deleted, or called through (e.g. items.pop()) anywhere in body."""
+    names = set()
+    for node in ast.walk(ast.Module(body=body, type_ignores=[])):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            names.add(node.id)
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+            target = node.func.value
+            if isinstance(target, ast.Name):
+                names.add(target.id)
+    return names
+
+
+def _can_exit(body: List[ast.stmt]) -> bool:
+    """Whether a loop body contains a break (not inside a nested loop), return or raise."""
+    stack = list(body)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (ast.Break, ast.Return, ast.Raise)):
+            return True
+        if isinstance(node, (ast.While, ast.For)):
+            # A break in a nested loop only leaves that loop
+            stack.extend(node.orelse)
+            continue
+        if isinstance(node, (ast.FunctionDef, ast.Lambda)):
+            continue
+        stack.extend(ast.iter_child_nodes(node))
+    return False
+
+
+def _unbounded_loop(node: ast.While) -> bool:
+    """Whether a while loop can never stop: nothing in it can end the loop or change its condition."""
+    if _can_exit(node.body):
+        return False
+    test = node.test
+    if any(isinstance(child, ast.Call) for child in ast.walk(test)):
+        # The condition may change on its own (e.g. random.random() < 0.9)
+        return False
+    if isinstance(test, ast.Constant):
+        return bool(test.value)
+    test_names = {child.id for child in ast.walk(test) if isinstance(child, ast.Name)}
+    return bool(test_names) and not (test_names & _mutated_names(node.body))
+
+
+def lint_source(source: str, max_range: Optional[int] = None) -> List[str]:
+    """
+    Statically check template code for constructs that can only fail or hang.
+
+    Flags while loops that can never end, range() calls longer than
+    max_range, imports other than random/math, and builtins the sandbox
+    disables.
+
+    Args:
+        source: Python source of one template part
+        max_range: Longest allowed constant range() (default from settings)
+
+    Returns:
+        Problems as 'Line N: ...' messages, empty if none were found
+    """
+    max_range = max_range or settings.TEMPLATE_MAX_RANGE
+
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        # Compilation reports syntax errors with more context
+        return []
+
+    problems = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.While) and _unbounded_loop(node):
+            problems.append((node.lineno, "loop can never end (nothing in it changes its condition or breaks out)"))
+
+        elif (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+              and node.func.id == 'range' and node.args and not node.keywords):
+            args = [_const_int(arg) for arg in node.args[:3]]
+            if None not in args and (len(args) < 3 or args[2] != 0):
+                length = _range_length(*args)
+                if length > max_range:
+                    problems.append((node.lineno, f"range() of {length} items exceeds the limit of {max_range}"))
+
+        elif isinstance(node, ast.Name) and node.id in FORBIDDEN_NAMES:
+            problems.append((node.lineno, f"'{node.id}' is not available in templates"))
+
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            modules = [alias.name for alias in node.names] if isinstance(node, ast.Import) else [node.module or '']
+            for module in modules:
+                if module.split('.')[0] not in ALLOWED_IMPORTS:
+                    problems.append((node.lineno, f"import of '{module}' is not allowed"))
+
+    return [f"Line {lineno}: {message}" for lineno, message in sorted(problems)]
+
+
+def lint_template(question_template: str, answer_template: str) -> List[str]:
+    """
+    Lint both parts of a template.
+
+    Returns:
+        Problems prefixed with 'Question Template Error: ' or 'Answer Template Error: '
+    """
+    problems = []
+    for part, source in (("Question", question_template), ("Answer", answer_template)):
+        problems.extend(f"{part} Template Error: {problem}" for problem in lint_source(source))
+    return problems
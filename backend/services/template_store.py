@@ -0,0 +1,124 @@
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from database import get_db, is_unique_violation, run_query
+from services.autocomplete import autocomplete_index
+from services.metadata_cache import metadata_cache
+
+
+def build_template_data(fields: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build a question_templates row from validated template fields.
+    Auto-injects module, category and timestamps.
+
+    Args:
+        fields: TemplateCreate fields, plus estimated_cost_ms if measured
+
+    Returns:
+        Row ready to insert
+    """
+    now = datetime.utcnow().isoformat()
+    return {
+        'module': 'Basic-skills',
+        'category': 'Math',
+        'grade': fields['grade'],
+        'topic': fields['topic'],
+        'skill_name': fields['skill_name'],
+        'format': fields.get('format'),
+        'type': fields['type'],
+        'question_template': fields['question_template'],
+        'answer_template': fields['answer_template'],
+        'estimated_cost_ms': fields.get('estimated_cost_ms'),
+        'created_by': fields['created_by'],
+        'updated_by': fields.get('updated_by') or fields['created_by'],
+        'created_at': now,
+        'updated_at': now
+    }
+
+
+async def get_template(template_id: str) -> Optional[Dict[str, Any]]:
+    """Fetch a single question_templates row by id, or None if there is none."""
+    db = get_db()
+    response = await run_query(
+        db.table('question_templates')
+        .select('*')
+        .eq('id', template_id)
+    )
+    return response.data[0] if response.data else None
+
+
+async def insert_template(template_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Insert one template row.
+
+    If the row has no format, or another author took the requested format
+    concurrently, the next free format is allocated and the row inserted in
+    one atomic database call (insert_template_next_format).
+
+    Returns:
+        The inserted row, including its id and format
+    """
+    db = get_db()
+    allocate = db.rpc('insert_template_next_format', {'p_template': template_data})
+
+    if template_data.get('format') is None:
+        response = await run_query(allocate)
+    else:
+        try:
+            response = await run_query(
+                db.table('question_templates').insert(template_data)
+            )
+        except Exception as e:
+            if not is_unique_violation(e):
+                raise
+            # Format was taken concurrently; allocate the next free one
+            response = await run_query(allocate)
+
+    if not response.data:
+        raise RuntimeError("Failed to save template")
+
+    # Keep topic/skill autocomplete current without reloading it
+    autocomplete_index.add(template_data['topic'], template_data['skill_name'])
+    await metadata_cache.invalidate()
+
+    return response.data[0]
+
+
+async def insert_templates(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Insert many template rows, batching where possible.
+
+    Rows with an explicit format go in as one multi-row insert. If that
+    fails (e.g. one row hits unique_template), or a row needs a format
+    allocated, rows are inserted one by one so every row gets its own result.
+
+    Returns:
+        One result per input row, in order: {'row': inserted_row} or {'error': message}
+    """
+    if not rows:
+        return []
+
+    db = get_db()
+
+    if all(row.get('format') is not None for row in rows):
+        # Assign ids up front so inserted rows can be matched back to inputs
+        batch = [{'id': str(uuid.uuid4()), **row} for row in rows]
+        try:
+            response = await run_query(db.table('question_templates').insert(batch))
+        except Exception:
+            pass
+        else:
+            inserted = {row['id']: row for row in response.data or []}
+            if len(inserted) == len(batch):
+                for row in batch:
+                    autocomplete_index.add(row['topic'], row['skill_name'])
+                await metadata_cache.invalidate()
+                return [{'row': inserted[row['id']]} for row in batch]
+
+    results = []
+    for row in rows:
+        try:
+            results.append({'row': await insert_template(row)})
+        except Exception as e:
+            results.append({'error': str(e)})
+    return results
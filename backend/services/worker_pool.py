@@ -0,0 +1,670 @@
+import asyncio
+import contextlib
+import multiprocessing
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from config import settings
+from services.code_cache import code_cache
+from services.metrics import metrics
+from services.sandbox import (
+    check_templates,
+    execute_code,
+    execute_marshalled,
+    execute_template_marshalled,
+    generate_batch,
+    generate_unique,
+    run_trials_marshalled
+)
+from services.sandbox_worker import worker_main
+
+# Serializes worker starts while the parent's __main__ is hidden
+_start_lock = threading.Lock()
+
+# Seconds between checks for a cancelled job while waiting on a worker
+_CANCEL_POLL_INTERVAL = 0.05
+
+
+class WorkerError(Exception):
+    """Raised when a sandbox job fails outside of the sandboxed code."""
+    pass
+
+
+class WorkerTimeoutError(WorkerError):
+    """Raised when a worker does not answer within its wall-clock budget."""
+    pass
+
+
+class WorkerCrashedError(WorkerError):
+    """Raised when a worker process dies while running a job."""
+    pass
+
+
+class WorkerCancelledError(WorkerError):
+    """Raised in a dispatch thread when the caller stopped waiting for its job."""
+    pass
+
+
+def _get_context(method: str):
+    """
+    Multiprocessing context for the workers.
+
+    forkserver falls back to spawn where it is unavailable (Windows). The
+    fork server preloads only services.sandbox_worker, so starting or
+    recycling a worker is a fork of a warm process rather than a fresh
+    interpreter. Workers must be started inside _main_hidden(), or they
+    re-import the API's main module anyway.
+    """
+    if method == 'forkserver' and method not in multiprocessing.get_all_start_methods():
+        method = 'spawn'
+    ctx = multiprocessing.get_context(method)
+    if method == 'forkserver':
+        ctx.set_forkserver_preload(['services.sandbox_worker'])
+    return ctx
+
+
+def _worker_error(e: WorkerError, timeout: float) -> Dict[str, str]:
+    """Map a worker failure to sandbox-style 'error'/'error_type' fields."""
+    if isinstance(e, WorkerTimeoutError):
+        return {
+            'error': f"Code execution exceeded {timeout:g} second timeout",
+            'error_type': 'TimeoutError'
+        }
+    return {'error': str(e), 'error_type': type(e).__name__}
+
+
+@contextlib.contextmanager
+def _main_hidden():
+    """
+    Hide the parent's __main__ module from multiprocessing.
+
+    Spawned and fork-server children re-run the parent's __main__ (as
+    __mp_main__) before calling their target, which under `python main.py`
+    or serve.py loads the whole API into every sandbox worker. Without a
+    __file__ or __spec__ to go by they skip that step; worker_main needs
+    nothing from __main__.
+    """
+    main = sys.modules['__main__']
+    saved = {name: main.__dict__[name] for name in ('__file__', '__spec__') if name in main.__dict__}
+    with _start_lock:
+        main.__dict__.pop('__file__', None)
+        main.__spec__ = None
+        try:
+            yield
+        finally:
+            main.__dict__.pop('__spec__', None)
+            main.__dict__.update(saved)
+
+
+class _Worker:
+    """Handle on a single sandbox worker process."""
+
+    def __init__(self, ctx, cpu_limit: int, memory_limit_mb: int = 0):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=worker_main,
+            args=(child_conn, cpu_limit, memory_limit_mb),
+            daemon=True
+        )
+        with _main_hidden():
+            self.process.start()
+        child_conn.close()
+        self.jobs_done = 0
+
+    def call(
+        self,
+        fn: Callable,
+        args: tuple,
+        timeout: float,
+        cpu_limit: Optional[int] = None,
+        cancelled: Optional[threading.Event] = None
+    ) -> Tuple[Any, List[tuple]]:
+        """
+        Run a job in the worker and block until it answers.
+
+        Raises WorkerCancelledError as soon as cancelled is set; the worker
+        is then still busy with the job and must be killed.
+
+        Returns:
+            Tuple of (return value, execution timings recorded by the job)
+        """
+        deadline = time.monotonic() + timeout
+        try:
+            self.conn.send((fn, args, cpu_limit))
+            while not self.conn.poll(min(max(deadline - time.monotonic(), 0), _CANCEL_POLL_INTERVAL)):
+                if time.monotonic() >= deadline:
+                    raise WorkerTimeoutError(f"Worker did not answer within {timeout} seconds")
+                if cancelled is not None and cancelled.is_set():
+                    raise WorkerCancelledError("Job cancelled")
+            ok, payload, observations = self.conn.recv()
+        except (EOFError, OSError, BrokenPipeError):
+            raise WorkerCrashedError("Sandbox worker exited unexpectedly")
+
+        self.jobs_done += 1
+        if not ok:
+            raise WorkerError(payload)
+        return payload, observations
+
+    def stop(self) -> None:
+        """Ask the worker to exit, killing it if it does not."""
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.kill()
+        self.conn.close()
+
+    def kill(self) -> None:
+        """Terminate the worker immediately."""
+        self.process.kill()
+        self.process.join()
+
+
+class SandboxPool:
+    """
+    Pool of pre-warmed worker processes that run sandboxed code.
+
+    Jobs are dispatched from a small thread pool so that awaiting a result
+    never blocks the event loop. Workers are recycled after a fixed number
+    of jobs and killed when they exceed their wall-clock budget.
+    """
+
+    def __init__(
+        self,
+        size: Optional[int] = None,
+        max_jobs_per_worker: Optional[int] = None,
+        cpu_limit: Optional[int] = None,
+        memory_limit_mb: Optional[int] = None
+    ):
+        """
+        Initialize the pool without starting any processes.
+
+        Args:
+            size: Number of worker processes (default from settings)
+            max_jobs_per_worker: Jobs before a worker is recycled (default from settings)
+            cpu_limit: CPU seconds allowed per job (default from settings)
+            memory_limit_mb: Memory each worker may allocate beyond its baseline (default from settings)
+        """
+        self.size = size or settings.sandbox_pool_size
+        self.max_jobs_per_worker = max_jobs_per_worker or settings.SANDBOX_MAX_JOBS_PER_WORKER
+        self.cpu_limit = cpu_limit if cpu_limit is not None else settings.SANDBOX_CPU_LIMIT
+        self.memory_limit_mb = memory_limit_mb if memory_limit_mb is not None else settings.SANDBOX_MEMORY_LIMIT_MB
+
+        self._ctx = _get_context(settings.SANDBOX_START_METHOD)
+        self._idle: "queue.Queue[Optional[_Worker]]" = queue.Queue()
+        self._workers: List[_Worker] = []
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._started = False
+
+        self._stats = {
+            'jobs_completed': 0,
+            'jobs_failed': 0,
+            'jobs_cancelled': 0,
+            'workers_recycled': 0,
+            'workers_killed': 0
+        }
+
+    def start(self) -> None:
+        """Spawn and warm up all worker processes (idempotent)."""
+        with self._lock:
+            if self._started:
+                return
+
+            self._threads = ThreadPoolExecutor(
+                max_workers=self.size * 2,
+                thread_name_prefix="sandbox-dispatch"
+            )
+            workers = [self._spawn() for _ in range(self.size)]
+
+            # Warm up: imports and the first RestrictedPython compile happen here
+            for worker in workers:
+                try:
+                    worker.call(execute_code, ("result = 1",), timeout=30)
+                except WorkerError:
+                    pass
+                worker.jobs_done = 0
+                self._idle.put(worker)
+
+            self._started = True
+
+    def shutdown(self) -> None:
+        """Stop all worker processes."""
+        with self._lock:
+            if not self._started:
+                return
+
+            for worker in list(self._workers):
+                worker.stop()
+            self._workers.clear()
+            # Wake up dispatch threads still waiting for a worker
+            for _ in range(self.size * 2):
+                self._idle.put(None)
+            self._idle = queue.Queue()
+            self._threads.shutdown(wait=False)
+            self._threads = None
+            self._started = False
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self._ctx, self.cpu_limit, self.memory_limit_mb)
+        self._workers.append(worker)
+        return worker
+
+    def _count(self, name: str) -> None:
+        """Increment a stats counter (from any dispatch thread)."""
+        with self._lock:
+            self._stats[name] += 1
+
+    def _retire(self, worker: _Worker, kill: bool = False) -> None:
+        """Replace a worker with a fresh process."""
+        if kill:
+            worker.kill()
+            self._count('workers_killed')
+        else:
+            worker.stop()
+            self._count('workers_recycled')
+
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+            if not self._started:
+                return
+            replacement = self._spawn()
+        self._idle.put(replacement)
+
+    def _dispatch(
+        self,
+        fn: Callable,
+        args: tuple,
+        timeout: float,
+        cpu_limit: Optional[int],
+        template_id: Optional[str],
+        cancelled: threading.Event
+    ) -> Any:
+        """
+        Run a job on the next idle worker (called from a dispatch thread).
+
+        If cancelled is set while the job waits for a worker it is dropped;
+        if it is set while the job runs, the worker is killed and replaced.
+        """
+        idle = self._idle  # shutdown() swaps the queue after waking its waiters
+        while True:
+            try:
+                worker = idle.get(timeout=_CANCEL_POLL_INTERVAL)
+                break
+            except queue.Empty:
+                if cancelled.is_set():
+                    self._count('jobs_cancelled')
+                    raise WorkerCancelledError("Job cancelled")
+        if worker is None:
+            raise WorkerError("Sandbox pool is shut down")
+
+        try:
+            result, observations = worker.call(fn, args, timeout, cpu_limit, cancelled)
+        except WorkerCancelledError:
+            self._count('jobs_cancelled')
+            self._retire(worker, kill=True)
+            raise
+        except (WorkerTimeoutError, WorkerCrashedError):
+            self._count('jobs_failed')
+            self._retire(worker, kill=True)
+            raise
+        except WorkerError:
+            self._count('jobs_failed')
+            self._idle.put(worker)
+            raise
+        except Exception:
+            # E.g. an unpicklable job or a broken pipe: the worker's state is
+            # unknown, so replace it rather than let the pool shrink
+            self._count('jobs_failed')
+            self._retire(worker, kill=True)
+            raise
+
+        self._count('jobs_completed')
+        metrics.observe_job(template_id, observations)
+        if worker.jobs_done >= self.max_jobs_per_worker:
+            # Recycle off the request path so the caller is not delayed
+            self._threads.submit(self._retire, worker)
+        else:
+            self._idle.put(worker)
+
+        return result
+
+    async def run(
+        self,
+        fn: Callable,
+        *args: Any,
+        timeout: Optional[float] = None,
+        cpu_limit: Optional[int] = None,
+        template_id: Optional[str] = None
+    ) -> Any:
+        """
+        Run a picklable function in a worker process and await its result.
+
+        Cancelling the awaiting task cancels the job: it is dropped if it
+        has not started, and its worker is killed (and replaced) if it has.
+
+        Args:
+            fn: Module-level function to call in the worker
+            *args: Picklable arguments for the function
+            timeout: Wall-clock seconds before the worker is killed
+            cpu_limit: CPU seconds for this job (default: the pool's limit)
+            template_id: Template the job runs for, used to label metrics
+
+        Returns:
+            The function's return value
+        """
+        if not self._started:
+            await asyncio.get_running_loop().run_in_executor(None, self.start)
+
+        if timeout is None:
+            timeout = settings.EXECUTION_TIMEOUT + settings.SANDBOX_KILL_GRACE
+
+        loop = asyncio.get_running_loop()
+        cancelled = threading.Event()
+        try:
+            return await loop.run_in_executor(
+                self._threads, self._dispatch, fn, args, timeout, cpu_limit, template_id, cancelled
+            )
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    def _failed(
+        self,
+        e: WorkerError,
+        timeout: float,
+        template_id: Optional[str],
+        executions: int = 1
+    ) -> Dict[str, str]:
+        """Map a worker failure to error fields and count it in the metrics."""
+        error = _worker_error(e, timeout)
+        metrics.observe_failure(template_id, error['error_type'], executions)
+        return error
+
+    async def compile(self, code: str) -> bytes:
+        """
+        Compile code through the shared code cache.
+
+        Cache hits are served inline; misses compile in a thread so that a
+        large template does not stall the event loop.
+
+        Returns:
+            Marshalled code object ready to ship to a worker
+
+        Raises:
+            SyntaxError: If the code does not compile under RestrictedPython
+        """
+        if code_cache.contains(code):
+            return code_cache.get_marshalled(code)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, code_cache.get_marshalled, code)
+
+    async def execute(
+        self,
+        code: str,
+        timeout: Optional[float] = None,
+        seed: Optional[int] = None,
+        template_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Execute code in a worker process.
+
+        Args:
+            code: Python code to execute
+            timeout: Optional custom timeout in seconds
+            seed: Optional seed for the execution's random generator
+            template_id: Label for metrics
+
+        Returns:
+            Execution result dictionary (same shape as execute_code)
+        """
+        timeout = timeout or settings.EXECUTION_TIMEOUT
+
+        try:
+            code_blob = await self.compile(code)
+        except SyntaxError as e:
+            return {
+                'result': None,
+                'error': f"Syntax Error: {e}",
+                'error_type': 'SyntaxError'
+            }
+
+        try:
+            return await self.run(
+                execute_marshalled, code_blob, timeout, seed,
+                timeout=timeout + settings.SANDBOX_KILL_GRACE,
+                template_id=template_id
+            )
+        except WorkerError as e:
+            return {'result': None, **self._failed(e, timeout, template_id)}
+
+    async def execute_template(
+        self,
+        code_blob: bytes,
+        answer_line: int,
+        seed: Optional[int] = None,
+        timeout: Optional[float] = None,
+        template_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Execute a compiled question + answer template in a worker process.
+
+        Args:
+            code_blob: Marshalled template code (see generator.compile_template)
+            answer_line: First line of the answer part
+            seed: Optional seed for the execution's random generator
+            timeout: Optional custom timeout in seconds
+            template_id: Label for metrics
+
+        Returns:
+            Dictionary with 'question', 'answer', 'error', and 'error_type' keys
+        """
+        timeout = timeout or settings.EXECUTION_TIMEOUT
+
+        try:
+            return await self.run(
+                execute_template_marshalled, code_blob, answer_line, timeout, seed,
+                timeout=timeout + settings.SANDBOX_KILL_GRACE,
+                template_id=template_id
+            )
+        except WorkerError as e:
+            return {'question': None, 'answer': None, **self._failed(e, timeout, template_id)}
+
+    async def generate(
+        self,
+        code_blob: bytes,
+        answer_line: int,
+        seeds: List[int],
+        timeout: Optional[float] = None,
+        template_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Generate a batch of question/answer instances in one worker job.
+
+        The job's wall-clock and CPU budgets scale with the batch size.
+        If the worker itself fails, every instance reports the error.
+
+        Args:
+            code_blob: Marshalled template code (see generator.compile_template)
+            answer_line: First line of the answer part
+            seeds: Random seeds, one per instance
+            timeout: Optional per-instance timeout in seconds
+            template_id: Label for metrics
+
+        Returns:
+            List of instance dictionaries (see sandbox.generate_batch)
+        """
+        timeout = timeout or settings.EXECUTION_TIMEOUT
+
+        try:
+            return await self.run(
+                generate_batch, code_blob, answer_line, list(seeds), timeout,
+                timeout=timeout * len(seeds) + settings.SANDBOX_KILL_GRACE,
+                cpu_limit=self.cpu_limit * len(seeds),
+                template_id=template_id
+            )
+        except WorkerError as e:
+            error = self._failed(e, timeout * len(seeds), template_id, len(seeds))
+            return [
+                {'seed': seed, 'question': None, 'answer': None, **error}
+                for seed in seeds
+            ]
+
+    async def generate_unique(
+        self,
+        code_blob: bytes,
+        answer_line: int,
+        count: int,
+        seed: int,
+        max_attempts: int,
+        stall_limit: int,
+        unique_by: str = 'question',
+        timeout: Optional[float] = None,
+        template_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Generate distinct instances in one worker job (see sandbox.generate_unique).
+
+        The job's wall-clock and CPU budgets scale with max_attempts. If the
+        worker itself fails, the result has no instances and reports the error.
+
+        Args:
+            code_blob: Marshalled template code (see generator.compile_template)
+            answer_line: First line of the answer part
+            count: Distinct instances wanted
+            seed: First seed to try
+            max_attempts: Executions allowed in total
+            stall_limit: Executions in a row without a new instance before giving up
+            unique_by: 'question' or 'question_answer'
+            timeout: Optional per-instance timeout in seconds
+            template_id: Label for metrics
+
+        Returns:
+            Dictionary with 'instances' and the attempt report (see sandbox.generate_unique)
+        """
+        timeout = timeout or settings.EXECUTION_TIMEOUT
+
+        try:
+            return await self.run(
+                generate_unique, code_blob, answer_line, count, seed, max_attempts, stall_limit, unique_by, timeout,
+                timeout=timeout * max_attempts + settings.SANDBOX_KILL_GRACE,
+                cpu_limit=self.cpu_limit * max_attempts,
+                template_id=template_id
+            )
+        except WorkerError as e:
+            error = self._failed(e, timeout * max_attempts, template_id)
+            return {
+                'instances': [],
+                'attempts': 0,
+                'duplicates': 0,
+                'errors': 1,
+                'last_error': error['error'],
+                'exhausted': True,
+                'estimated_distinct_outputs': None
+            }
+
+    async def trial(
+        self,
+        code_blob: bytes,
+        answer_line: int,
+        seeds: List[int],
+        timeout: Optional[float] = None,
+        template_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Trial-run a compiled template once per seed in one worker job.
+
+        Args:
+            code_blob: Marshalled template code (see generator.compile_template)
+            answer_line: First line of the answer part
+            seeds: Trial seeds
+            timeout: Optional per-run timeout in seconds
+            template_id: Label for metrics
+
+        Returns:
+            Dictionary with 'error', 'error_type' and 'estimated_cost_ms'
+            (see sandbox.run_trials)
+        """
+        timeout = timeout or settings.EXECUTION_TIMEOUT
+
+        try:
+            return await self.run(
+                run_trials_marshalled, code_blob, answer_line, list(seeds), timeout,
+                timeout=timeout * len(seeds) + settings.SANDBOX_KILL_GRACE,
+                cpu_limit=self.cpu_limit * len(seeds),
+                template_id=template_id
+            )
+        except WorkerError as e:
+            error = self._failed(e, timeout * len(seeds), template_id, len(seeds))
+            return {'estimated_cost_ms': None, **error}
+
+    async def check(
+        self,
+        templates: List[Tuple[str, str]],
+        seeds: List[int],
+        timeout: Optional[float] = None,
+        template_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Validate (question, answer) template pairs, split across the workers.
+
+        Args:
+            templates: List of (question_template, answer_template) pairs
+            seeds: Trial seeds for each pair
+            timeout: Optional per-run timeout in seconds
+            template_id: Label for metrics
+
+        Returns:
+            One result per pair, in order (see sandbox.check_templates)
+        """
+        if not templates:
+            return []
+
+        timeout = timeout or settings.EXECUTION_TIMEOUT
+        slice_size = -(-len(templates) // self.size)
+
+        async def check_slice(pairs: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+            runs = len(pairs) * max(len(seeds), 1)
+            try:
+                return await self.run(
+                    check_templates, pairs, list(seeds), timeout,
+                    timeout=timeout * runs + settings.SANDBOX_KILL_GRACE,
+                    cpu_limit=self.cpu_limit * runs,
+                    template_id=template_id
+                )
+            except WorkerError as e:
+                error = self._failed(e, timeout * runs, template_id, runs)
+                return [{'estimated_cost_ms': None, **error} for _ in pairs]
+
+        results = await asyncio.gather(*(
+            check_slice(templates[i:i + slice_size])
+            for i in range(0, len(templates), slice_size)
+        ))
+        return [result for chunk in results for result in chunk]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return pool size and job counters."""
+        with self._lock:
+            stats = dict(self._stats)
+        return {
+            'size': self.size,
+            'running': self._started,
+            'idle': self._idle.qsize(),
+            **stats
+        }
+
+
+# Global sandbox pool instance
+sandbox_pool = SandboxPool()
+
+
+def get_sandbox_pool() -> SandboxPool:
+    """Dependency function to get the sandbox worker pool."""
+    return sandbox_pool
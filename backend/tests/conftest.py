@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+import uuid
+
+# Settings are read when config is first imported: run against the local
+# SQLite database, with every database file in a scratch directory
+_scratch = tempfile.mkdtemp(prefix="question-gen-tests-")
+os.environ.update({
+    'SUPABASE_URL': 'http://localhost',
+    'SUPABASE_KEY': '',
+    'LOCAL_DB_BACKEND': 'sqlite',
+    'LOCAL_DB_PATH': os.path.join(_scratch, 'local_db.sqlite3'),
+    'JOBS_DB_PATH': os.path.join(_scratch, 'jobs.sqlite3'),
+    'SHARED_STATE_DB_PATH': os.path.join(_scratch, 'shared_state.sqlite3'),
+    'RESULT_CACHE_SPILL_DIR': '',
+    'SANDBOX_POOL_SIZE': '2',
+    'METADATA_CACHE_SYNC_SECONDS': '0',
+})
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_scratch, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def scratch_dir() -> str:
+    """Directory holding the test databases."""
+    return _scratch
+
+
+@pytest.fixture(scope="session")
+def client():
+    """Client for the app, with its sandbox pool and job scheduler running."""
+    from main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def create_template(client):
+    """Save templates through the API, each under a topic of its own by default."""
+    def create(
+        question_template: str = "import random\na = random.randint(1, 9)\nb = random.randint(1, 9)\nquestion = f'{a} + {b}'",
+        answer_template: str = "answer = a + b",
+        **fields
+    ) -> dict:
+        payload = {
+            'grade': 5,
+            'topic': f"Topic {uuid.uuid4().hex[:8]}",
+            'skill_name': 'Addition',
+            'type': 'Numerical Input',
+            'question_template': question_template,
+            'answer_template': answer_template,
+            'created_by': 'tester',
+            **fields
+        }
+        response = client.post("/api/templates", json=payload)
+        assert response.status_code == 200, response.text
+        return response.json()['data']
+
+    return create
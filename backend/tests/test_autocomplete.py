@@ -0,0 +1,60 @@
+import uuid
+
+from services.autocomplete import AutocompleteIndex
+
+
+def index_of(*pairs) -> AutocompleteIndex:
+    index = AutocompleteIndex()
+    for topic, skill_name in pairs:
+        index.add(topic, skill_name)
+    return index
+
+
+def test_ranks_exact_prefix_word_and_substring_matches():
+    index = index_of(
+        ("Algebra Basics", "x"),
+        ("Linear Algebra", "x"),
+        ("Prealgebra", "x"),
+        ("Algebra", "x"),
+        ("Geometry", "x")
+    )
+
+    assert index.suggest_topics("algebra") == ["Algebra", "Algebra Basics", "Linear Algebra", "Prealgebra"]
+
+
+def test_fuzzy_matches_come_last():
+    index = index_of(("Fractions", "x"), ("Factorization", "x"), ("Geometry", "x"))
+
+    assert index.suggest_topics("fractons") == ["Fractions"]
+    assert index.suggest_topics("zzzz") == []
+
+
+def test_short_queries_match_substrings():
+    index = index_of(("Area", "x"), ("Reading", "x"), ("Two Rectangles", "x"), ("Volume", "x"))
+
+    assert index.suggest_topics("re") == ["Reading", "Two Rectangles", "Area"]
+
+
+def test_limits_results():
+    index = index_of(*[(f"Topic {n:02d}", "x") for n in range(10)])
+
+    assert index.suggest_topics("topic", k=3) == ["Topic 00", "Topic 01", "Topic 02"]
+
+
+def test_skills_are_scoped_to_their_topic():
+    index = index_of(("Algebra", "Solving equations"), ("Algebra", "Factoring"), ("Geometry", "Solving triangles"))
+
+    assert index.suggest_skills("Algebra") == ["Factoring", "Solving equations"]
+    assert index.suggest_skills("Algebra", "solv") == ["Solving equations"]
+    assert index.suggest_skills("Unknown", "solv") == []
+
+
+def test_new_templates_are_suggested(client, create_template):
+    topic = f"Trigonometry {uuid.uuid4().hex[:6]}"
+    create_template(topic=topic, skill_name="Sine rule")
+
+    topics = client.get("/api/topics/suggest", params={'q': topic}).json()['suggestions']
+    skills = client.get("/api/skills/suggest", params={'topic': topic, 'q': 'sine'}).json()['suggestions']
+
+    assert topics[0] == topic
+    assert skills == ["Sine rule"]
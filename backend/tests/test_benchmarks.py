@@ -0,0 +1,61 @@
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.common import measure, summarize
+from benchmarks.run import compare
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def result(name: str, median_ms: float, **params) -> dict:
+    return {'suite': 'db', 'name': name, 'params': params, 'median_ms': median_ms}
+
+
+def test_summarize():
+    summary = summarize('op', [0.001, 0.003, 0.002], errors=1, rows=10)
+
+    assert summary['median_ms'] == 2.0
+    assert summary['min_ms'] == 1.0
+    assert summary['iterations'] == 3
+    assert summary['errors'] == 1
+    assert summary['params'] == {'rows': 10}
+
+
+def test_measure_counts_errors():
+    summary = measure('op', lambda i: i % 2, iterations=4, warmup=1, is_error=lambda value: value == 1)
+
+    assert summary['iterations'] == 4
+    assert summary['errors'] == 2
+
+
+def test_compare_flags_regressions_over_the_threshold():
+    baseline = [result('a', 10.0, rows=1), result('b', 10.0, rows=1), result('c', 10.0, rows=1)]
+    results = [result('a', 11.0, rows=1), result('b', 13.0, rows=1), result('c', 10.0, rows=2), result('d', 1.0)]
+
+    comparisons = compare(results, baseline, threshold=0.2)
+
+    assert [(c['name'], c['ratio'], c['regression']) for c in comparisons] == [('a', 1.1, False), ('b', 1.3, True)]
+
+
+def test_cli_writes_results_and_fails_on_regression(tmp_path):
+    def run(*args):
+        return subprocess.run(
+            [sys.executable, '-m', 'benchmarks.run', '--suite', 'db', '--iterations', '2', '--sizes', '10', *args],
+            cwd=BACKEND_DIR, capture_output=True, text=True, timeout=120
+        )
+
+    first = run('--output', str(tmp_path / 'first.json'))
+    assert first.returncode == 0, first.stderr
+    report = json.loads((tmp_path / 'first.json').read_text())
+    assert {r['name'] for r in report['results']} >= {'select_eq', 'insert', 'skill_counts'}
+
+    # A baseline ten times faster than anything this run can do
+    for item in report['results']:
+        item['median_ms'] = item['median_ms'] / 10 or 1e-9
+    (tmp_path / 'fast.json').write_text(json.dumps(report))
+
+    second = run('--output', str(tmp_path / 'second.json'), '--compare', str(tmp_path / 'fast.json'))
+    assert second.returncode == 1
+    assert 'REGRESSION' in second.stderr
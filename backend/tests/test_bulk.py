@@ -0,0 +1,84 @@
+import csv
+import io
+import json
+import uuid
+
+from services.template_io import read_rows
+
+QUESTION = "import random\na = random.randint(1, 9)\nquestion = str(a)"
+
+
+def row(topic: str, **fields) -> dict:
+    return {
+        'grade': 3,
+        'topic': topic,
+        'skill_name': 'Counting',
+        'type': 'MCQ',
+        'question_template': QUESTION,
+        'answer_template': "answer = a",
+        'created_by': 'importer',
+        **fields
+    }
+
+
+def import_file(client, name: str, content: str) -> list:
+    response = client.post("/api/templates/import", files={'file': (name, content.encode())})
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_ndjson_import_reports_every_row(client):
+    topic = f"Import {uuid.uuid4().hex[:8]}"
+    lines = [
+        json.dumps(row(topic)),
+        "{not json",
+        json.dumps(row(topic, grade=42)),
+        json.dumps(row(topic, answer_template="answer = (")),
+        "",
+        json.dumps(row(topic, format=1)),
+    ]
+
+    results = import_file(client, "templates.ndjson", "\n".join(lines))
+
+    by_line = {result['line']: result for result in results if 'line' in result}
+    assert by_line[1]['status'] == 'created'
+    assert by_line[2]['error'].startswith("Invalid JSON")
+    assert by_line[3]['status'] == 'failed'
+    assert by_line[4]['status'] == 'failed'
+    # Format 1 was taken by line 1 in the same batch, so the next free one is allocated
+    assert (by_line[6]['status'], by_line[6]['format']) == ('created', 2)
+    assert results[-1] == {'summary': {'created': 2, 'failed': 3}}
+
+
+def test_csv_import(client):
+    topic = f"Csv {uuid.uuid4().hex[:8]}"
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, list(row(topic)) + ['format'])
+    writer.writeheader()
+    writer.writerow(row(topic))
+    writer.writerow(row(topic, format=''))
+
+    results = import_file(client, "templates.csv", buffer.getvalue())
+
+    assert [result.get('format') for result in results[:2]] == [1, 2]
+    assert results[-1] == {'summary': {'created': 2, 'failed': 0}}
+
+
+def test_export_round_trips(client, create_template):
+    template = create_template()
+
+    ndjson = client.get("/api/templates/export").text
+    exported = [json.loads(line) for line in ndjson.splitlines()]
+    csv_rows = list(csv.DictReader(io.StringIO(client.get("/api/templates/export", params={'file_format': 'csv'}).text)))
+
+    match = next(item for item in exported if item['topic'] == template['topic'])
+    assert match['question_template'] == template['question_template']
+    assert len(csv_rows) == len(exported)
+    assert any(item['topic'] == template['topic'] for item in csv_rows)
+
+
+def test_read_rows_is_lazy_and_reports_bad_lines():
+    rows = read_rows(io.StringIO('{"a": 1}\n[1]\n\n{"b": 2}\n'), 'ndjson')
+
+    assert next(rows) == (1, {'a': 1}, None)
+    assert list(rows) == [(2, None, "Invalid JSON: expected an object"), (4, {'b': 2}, None)]
@@ -0,0 +1,69 @@
+import marshal
+
+import pytest
+
+from services.code_cache import CompiledCodeCache
+
+
+def test_compiles_once_per_source():
+    cache = CompiledCodeCache(max_entries=4)
+
+    first = cache.get("result = 1")
+    second = cache.get("result = 1")
+
+    assert first is second
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_marshalled_code_matches_compiled_code():
+    cache = CompiledCodeCache(max_entries=4)
+
+    code = marshal.loads(cache.get_marshalled("result = 2"))
+    namespace = {}
+    exec(code, namespace)
+
+    assert namespace['result'] == 2
+    assert cache.contains("result = 2")
+
+
+def test_edited_source_is_a_miss():
+    cache = CompiledCodeCache(max_entries=4)
+    cache.get("result = 1")
+
+    assert not cache.contains("result = 1 ")
+    cache.get("result = 1 ")
+    assert cache.stats()['misses'] == 2
+
+
+def test_evicts_least_recently_used():
+    cache = CompiledCodeCache(max_entries=2)
+    cache.get("a = 1")
+    cache.get("b = 1")
+    cache.get("a = 1")
+    cache.get("c = 1")
+
+    assert cache.contains("a = 1")
+    assert not cache.contains("b = 1")
+    assert cache.stats()['evictions'] == 1
+
+
+def test_invalidate_and_clear():
+    cache = CompiledCodeCache(max_entries=4)
+    cache.get("a = 1")
+    cache.get("b = 1")
+
+    cache.invalidate("a = 1", "")
+    assert not cache.contains("a = 1")
+    assert cache.contains("b = 1")
+
+    cache.clear()
+    assert cache.stats()['size'] == 0
+
+
+def test_syntax_errors_are_not_cached():
+    cache = CompiledCodeCache(max_entries=4)
+
+    with pytest.raises(SyntaxError):
+        cache.get("result = (")
+    assert not cache.contains("result = (")
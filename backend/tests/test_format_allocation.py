@@ -0,0 +1,70 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from database import SQLiteClient
+from tests.test_sqlite_client import template_row
+
+
+def test_concurrent_saves_get_distinct_formats(client, create_template):
+    topic = f"Concurrent {uuid.uuid4().hex[:8]}"
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        rows = list(pool.map(lambda _: create_template(topic=topic), range(16)))
+
+    assert sorted(row['format'] for row in rows) == list(range(1, 17))
+    next_format = client.get("/api/templates/next-format", params={'topic': topic, 'skill_name': 'Addition'})
+    assert next_format.json() == {'next_format': 17}
+
+
+def test_taken_format_falls_back_to_the_next_free_one(create_template):
+    topic = f"Taken {uuid.uuid4().hex[:8]}"
+
+    first = create_template(topic=topic, format=3)
+    second = create_template(topic=topic, format=3)
+    third = create_template(topic=topic)
+
+    assert (first['format'], second['format'], third['format']) == (3, 4, 5)
+
+
+def test_requested_free_format_is_kept(create_template):
+    topic = f"Free {uuid.uuid4().hex[:8]}"
+
+    assert create_template(topic=topic, format=7)['format'] == 7
+    assert create_template(topic=topic, format=2)['format'] == 2
+
+
+def test_next_format_starts_at_one(client):
+    response = client.get("/api/templates/next-format", params={'topic': 'Never used', 'skill_name': 'Nothing'})
+
+    assert response.json() == {'next_format': 1}
+
+
+@pytest.fixture
+def db_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return str(tmp_path / "formats.sqlite3")
+
+
+def test_rpc_is_atomic_across_connections(db_file):
+    # One client per thread stands in for API worker processes sharing the file
+    clients = [SQLiteClient(db_file) for _ in range(4)]
+
+    def allocate(n):
+        db = clients[n % len(clients)]
+        return db.rpc('insert_template_next_format', {'p_template': template_row(format=None)}).execute().data[0]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        rows = list(pool.map(allocate, range(40)))
+
+    assert sorted(row['format'] for row in rows) == list(range(1, 41))
+
+
+def test_rpc_continues_after_explicit_formats(db_file):
+    db = SQLiteClient(db_file)
+    db.table('question_templates').insert(template_row(format=5)).execute()
+
+    row = db.rpc('insert_template_next_format', {'p_template': template_row(format=None)}).execute().data[0]
+
+    assert row['format'] == 6
@@ -0,0 +1,66 @@
+import json
+
+from config import settings
+
+
+def test_generates_count_instances_in_order(client, create_template):
+    template = create_template()
+
+    # More than one sandbox job's worth, so chunks are reassembled in order
+    count = settings.GENERATION_CHUNK_SIZE * 2 + 5
+    response = client.post(f"/api/templates/{template['id']}/generate", params={'count': count, 'seed': 100})
+
+    assert response.status_code == 200
+    instances = response.json()
+    assert [instance['index'] for instance in instances] == list(range(count))
+    assert [instance['seed'] for instance in instances] == list(range(100, 100 + count))
+    for instance in instances:
+        a, b = map(int, instance['question'].split(' + '))
+        assert instance['answer'] == a + b
+        assert instance['error'] is None
+
+
+def test_ndjson_output(client, create_template):
+    template = create_template()
+
+    response = client.post(
+        f"/api/templates/{template['id']}/generate",
+        params={'count': 3, 'seed': 7, 'output': 'ndjson'}
+    )
+
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line['seed'] for line in lines] == [7, 8, 9]
+
+
+def test_errors_are_reported_per_instance(client, create_template):
+    # Divides by zero for seed 31 only (the save-time trial seeds pass)
+    template = create_template(
+        question_template="import random\nn = random.randint(0, 19)\nquestion = str(n)",
+        answer_template="answer = 12 // n"
+    )
+
+    instances = client.post(
+        f"/api/templates/{template['id']}/generate", params={'count': 10, 'seed': 26}
+    ).json()
+
+    failed = [instance for instance in instances if instance['error']]
+    assert [instance['seed'] for instance in failed] == [31]
+    assert failed[0]['error_type'] == 'ZeroDivisionError'
+    assert len(instances) == 10
+
+
+def test_count_is_limited(client, create_template):
+    template = create_template()
+
+    response = client.post(
+        f"/api/templates/{template['id']}/generate", params={'count': settings.GENERATION_MAX_COUNT + 1}
+    )
+
+    assert response.status_code == 422
+
+
+def test_unknown_template(client):
+    response = client.post("/api/templates/no-such-template/generate", params={'count': 1})
+
+    assert response.status_code == 404
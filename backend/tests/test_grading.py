@@ -0,0 +1,87 @@
+import pytest
+
+from services import grading
+from services.grading import AnswerFormatError, grade_response
+
+
+@pytest.mark.parametrize("question_type, answer, response, correct", [
+    ('MCQ', 'B', 'b', True),
+    ('MCQ', 12, '12', True),
+    ('MCQ', 'B', ['B'], True),
+    ('MCQ', 'B', 'C', False),
+    ('MAQ', ['A', 'C'], 'c, a', True),
+    ('MAQ', ['A', 'C'], ['C', 'A'], True),
+    ('MAQ', ['A', 'C'], ['A'], False),
+    ('MAQ', ['A', 'C'], ['A', 'B', 'C'], False),
+    ('Numerical Input', 0.75, '3/4', True),
+    ('Numerical Input', 1000, '1,000', True),
+    ('Numerical Input', 1.0, 1.0 + 1e-9, True),
+    ('Numerical Input', 2, '2.1', False),
+    ('Numerical Input', 2, 'two', False),
+    ('Numerical Input', 2, True, False),
+    ('Text Input', 'Paris', '  paris ', True),
+    ('Text Input', 'New  York', 'new york', True),
+    ('Text Input', ['colour', 'color'], 'COLOR', True),
+    ('Text Input', 'Paris', 'Rome', False),
+    ('True-or-False', True, 'yes', True),
+    ('True-or-False', False, 'F', True),
+    ('True-or-False', 'true', 1, True),
+    ('True-or-False', True, 'maybe', False),
+])
+def test_normalizes_responses_by_question_type(question_type, answer, response, correct):
+    assert grade_response(question_type, answer, response) is correct
+
+
+def test_tolerance():
+    assert grade_response('Numerical Input', 3.14159, 3.14, tolerance=0.01)
+    assert not grade_response('Numerical Input', 3.14159, 3.14)
+
+
+def test_answers_that_do_not_fit_the_type():
+    with pytest.raises(AnswerFormatError):
+        grade_response('Numerical Input', 'abc', '1')
+    with pytest.raises(AnswerFormatError):
+        grade_response('True-or-False', 'perhaps', 'yes')
+
+
+def test_grades_a_batch(client, create_template):
+    template = create_template()
+    questions = client.post(f"/api/templates/{template['id']}/generate", params={'count': 3, 'seed': 10}).json()
+    items = [
+        {'template_id': template['id'], 'seed': 10, 'response': questions[0]['answer']},
+        {'template_id': template['id'], 'seed': 11, 'response': str(questions[1]['answer'])},
+        {'template_id': template['id'], 'seed': 12, 'response': questions[2]['answer'] + 1},
+        {'template_id': template['id'], 'seed': 10, 'response': 'not a number'},
+    ]
+
+    graded = client.post("/api/grade", json={'items': items, 'include_answers': True}).json()
+
+    assert [result['correct'] for result in graded['results']] == [True, True, False, False]
+    assert graded['results'][2]['expected'] == questions[2]['answer']
+    assert graded['summary'] == {'total': 4, 'correct': 2, 'incorrect': 2, 'errors': 0}
+
+
+def test_items_that_cannot_be_graded_fail_alone(client, create_template, monkeypatch):
+    template = create_template()
+    get_template = grading.get_template
+
+    async def flaky_get_template(template_id):
+        if template_id == 'broken':
+            raise RuntimeError("invalid input syntax for type uuid")
+        return await get_template(template_id)
+
+    monkeypatch.setattr(grading, 'get_template', flaky_get_template)
+    items = [
+        {'template_id': template['id'], 'seed': 1, 'response': 0},
+        {'template_id': 'missing', 'seed': 1, 'response': 0},
+        {'template_id': 'broken', 'seed': 1, 'response': 0},
+    ]
+
+    response = client.post("/api/grade", json={'items': items})
+
+    assert response.status_code == 200
+    results = response.json()['results']
+    assert results[0]['correct'] is False and results[0]['error'] is None
+    assert results[1]['error'] == "Template missing not found"
+    assert results[2]['error'].startswith("Failed to fetch template broken")
+    assert response.json()['summary']['errors'] == 2
@@ -0,0 +1,113 @@
+import gzip
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from middleware import CompressionMiddleware, ConditionalGetMiddleware
+
+BIG = {'items': [f"item {n}" for n in range(500)]}
+
+
+@pytest.fixture(scope="module")
+def http():
+    app = FastAPI()
+
+    @app.get("/api/data")
+    async def data():
+        return BIG
+
+    @app.post("/api/data")
+    async def post_data():
+        return BIG
+
+    @app.get("/api/small")
+    async def small():
+        return {'ok': True}
+
+    @app.get("/api/users")
+    async def users():
+        return ["a"]
+
+    @app.get("/api/tagged")
+    async def tagged():
+        return JSONResponse(BIG, headers={'ETag': '"v1"'})
+
+    @app.get("/api/stream")
+    async def stream():
+        async def lines():
+            for n in range(200):
+                yield f"line {n}\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    @app.get("/api/image")
+    async def image():
+        return PlainTextResponse("x" * 5000, media_type="image/png")
+
+    app.add_middleware(ConditionalGetMiddleware)
+    app.add_middleware(CompressionMiddleware, min_bytes=100)
+    return TestClient(app)
+
+
+IDENTITY = {'Accept-Encoding': 'identity'}
+
+
+def test_get_responses_get_an_etag_and_304(http):
+    first = http.get("/api/data", headers=IDENTITY)
+    again = http.get("/api/data", headers={**IDENTITY, 'If-None-Match': first.headers['etag']})
+
+    assert first.headers['cache-control'] == 'no-cache'
+    assert again.status_code == 304
+    assert again.content == b''
+    assert 'content-length' not in again.headers
+    assert again.headers['etag'] == first.headers['etag']
+
+
+def test_other_requests_are_left_alone(http):
+    assert 'etag' not in http.post("/api/data", headers=IDENTITY).headers
+    assert 'etag' not in http.get("/api/stream", headers=IDENTITY).headers
+    assert http.get("/api/tagged", headers=IDENTITY).headers['etag'] == '"v1"'
+
+
+def test_cache_policies(http):
+    assert http.get("/api/users").headers['cache-control'] == 'public, max-age=300'
+
+
+def test_gzip_for_large_bodies(http):
+    response = http.get("/api/data", headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['content-encoding'] == 'gzip'
+    assert response.headers['vary'] == 'Accept-Encoding'
+    assert response.json() == BIG
+    assert int(response.headers['content-length']) < len(response.content)
+
+
+def test_small_and_precompressed_bodies_are_not_compressed(http):
+    assert 'content-encoding' not in http.get("/api/small", headers={'Accept-Encoding': 'gzip'}).headers
+    assert 'content-encoding' not in http.get("/api/image", headers={'Accept-Encoding': 'gzip'}).headers
+    assert 'content-encoding' not in http.get("/api/data", headers={'Accept-Encoding': 'gzip;q=0'}).headers
+
+
+def test_compressed_etags_are_weak_and_still_match(http):
+    first = http.get("/api/data", headers={'Accept-Encoding': 'gzip'})
+    again = http.get("/api/data", headers={'Accept-Encoding': 'gzip', 'If-None-Match': first.headers['etag']})
+
+    assert first.headers['etag'].startswith('W/"')
+    assert again.status_code == 304
+
+
+def test_streams_are_compressed_chunk_by_chunk(http):
+    with http.stream("GET", "/api/stream", headers={'Accept-Encoding': 'gzip'}) as response:
+        raw = b''.join(response.iter_raw())
+
+    assert response.headers['content-encoding'] == 'gzip'
+    assert 'content-length' not in response.headers
+    assert gzip.decompress(raw).decode() == "".join(f"line {n}\n" for n in range(200))
+
+
+def test_app_read_endpoints_revalidate(client):
+    first = client.get("/api/users")
+    again = client.get("/api/users", headers={'If-None-Match': first.headers['etag']})
+
+    assert again.status_code == 304
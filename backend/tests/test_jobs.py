@@ -0,0 +1,177 @@
+import asyncio
+import json
+import time
+import uuid
+
+import pytest
+
+from services.jobs import QUEUED, RUNNING, JobScheduler, JobStore
+
+USER = "Krishna"
+
+
+def submit(client, template, count, seed=0, created_by=USER, **fields):
+    return client.post("/api/jobs/generate", json={
+        'template_id': template['id'], 'count': count, 'seed': seed, 'created_by': created_by, **fields
+    })
+
+
+def wait_for(client, job_id, statuses, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/jobs/{job_id}").json()['job']
+        if job['status'] in statuses:
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"Job {job_id} did not reach {statuses}: {job}")
+
+
+def test_job_generates_the_same_instances_as_a_request(client, create_template):
+    template = create_template()
+
+    response = submit(client, template, 250, seed=70)
+    assert response.status_code == 202
+    job = wait_for(client, response.json()['job']['id'], ['completed'])
+
+    assert (job['completed'], job['errors'], job['progress']) == (250, 0, 1.0)
+    page = client.get(f"/api/jobs/{job['id']}/results", params={'offset': 200, 'limit': 100}).json()
+    assert page['next_offset'] == 250
+    direct = client.post(f"/api/templates/{template['id']}/generate", params={'count': 250, 'seed': 70}).json()
+    assert page['results'] == direct[200:]
+
+
+def test_stream_follows_the_job(client, create_template):
+    template = create_template()
+    job_id = submit(client, template, 150, seed=3).json()['job']['id']
+
+    lines = [json.loads(line) for line in client.get(f"/api/jobs/{job_id}/stream").text.splitlines()]
+
+    assert [line['index'] for line in lines[:-1]] == list(range(150))
+    assert lines[-1]['job']['status'] == 'completed'
+
+
+def test_cancel(client, create_template):
+    template = create_template()
+    job_id = submit(client, template, 50000, created_by="Naveen").json()['job']['id']
+
+    cancelled = client.post(f"/api/jobs/{job_id}/cancel")
+
+    assert cancelled.json()['job']['status'] == 'cancelled'
+    time.sleep(0.3)
+    assert client.get(f"/api/jobs/{job_id}").json()['job']['status'] == 'cancelled'
+    assert client.post(f"/api/jobs/{job_id}/cancel").status_code == 200
+
+
+def test_finished_jobs_cannot_be_cancelled(client, create_template):
+    template = create_template()
+    job_id = submit(client, template, 5).json()['job']['id']
+    wait_for(client, job_id, ['completed'])
+
+    assert client.post(f"/api/jobs/{job_id}/cancel").status_code == 409
+
+
+def test_rejects_unknown_users_templates_and_jobs(client, create_template):
+    template = create_template()
+
+    assert submit(client, template, 1, created_by="nobody").status_code == 400
+    assert submit(client, {'id': 'missing'}, 1).status_code == 404
+    assert client.get("/api/jobs/missing").status_code == 404
+    assert client.post("/api/jobs/missing/cancel").status_code == 404
+
+
+def new_job(created_by: str = USER, priority: int = 0) -> dict:
+    return {
+        'id': str(uuid.uuid4()),
+        'created_by': created_by,
+        'template_id': 't',
+        'count': 10,
+        'seed': 0,
+        'priority': priority,
+        'status': QUEUED,
+        'created_at': f"2024-01-01T00:00:{time.monotonic() % 60:09.6f}"
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.sqlite3"))
+
+
+def test_active_job_limit_per_user(store):
+    assert store.create(new_job(), max_active=2)
+    assert store.create(new_job(), max_active=2)
+
+    assert store.create(new_job(), max_active=2) is None
+    assert store.create(new_job(created_by="Naveen"), max_active=2)
+
+
+def test_claims_by_priority_within_running_limits(store):
+    low = store.create(new_job("a"))
+    high = store.create(new_job("a", priority=5))
+    other = store.create(new_job("b"))
+
+    assert store.claim("owner", max_running=2, max_running_per_user=1)['id'] == high['id']
+    # 'a' is at its per-user limit, so b's job is next
+    assert store.claim("owner", max_running=2, max_running_per_user=1)['id'] == other['id']
+    assert store.claim("owner", max_running=2, max_running_per_user=1) is None
+    assert store.get(low['id'])['status'] == QUEUED
+
+
+def test_requeue_drops_partial_results(store):
+    job = store.create(new_job())
+    store.claim("owner", max_running=1, max_running_per_user=1)
+    store.append_results(job['id'], [{'index': 0, 'error': None}, {'index': 1, 'error': 'x'}])
+    assert store.get(job['id'])['completed'] == 2
+
+    store.requeue(job['id'])
+
+    requeued = store.get(job['id'])
+    assert (requeued['status'], requeued['completed'], requeued['errors'], requeued['owner']) == (QUEUED, 0, 0, None)
+    assert store.results(job['id']) == []
+
+
+def test_results_of_a_cancelled_job_are_not_stored(store):
+    job = store.create(new_job())
+    store.claim("owner", max_running=1, max_running_per_user=1)
+    store.update(job['id'], (RUNNING,), status='cancelled')
+
+    assert store.append_results(job['id'], [{'index': 0}]) is False
+    assert store.results(job['id']) == []
+
+
+def test_shutdown_requeues_running_jobs(client, create_template, tmp_path):
+    template = create_template()
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+
+    async def run_then_shut_down():
+        scheduler = JobScheduler(store)
+        await scheduler.start()
+        job = await scheduler.submit(template['id'], 50000, 0, USER)
+        for _ in range(200):
+            partial = await scheduler.get(job['id'])
+            if partial['completed']:
+                break
+            await asyncio.sleep(0.05)
+        await scheduler.shutdown()
+        return job['id'], partial, scheduler
+
+    job_id, partial, scheduler = asyncio.run(run_then_shut_down())
+
+    assert partial['status'] == RUNNING and 0 < partial['completed'] < partial['count']
+
+    job = store.get(job_id)
+    assert (job['status'], job['completed']) == (QUEUED, 0)
+    assert store.results(job_id) == []
+    assert scheduler.stats()['running_here'] == 0
+
+
+def test_waiting_for_updates_leaves_nothing_behind(tmp_path):
+    scheduler = JobScheduler(JobStore(str(tmp_path / "jobs.sqlite3")))
+
+    async def wait():
+        await asyncio.gather(*(scheduler.wait_for_update("elsewhere", timeout=0.01) for _ in range(3)))
+
+    asyncio.run(wait())
+
+    assert scheduler._updates == {}
+    assert scheduler._waiters == {}
@@ -0,0 +1,122 @@
+import asyncio
+import uuid
+
+import pytest
+
+from services.metadata_cache import TemplateMetadataCache, etag_matches, make_etag
+
+
+class Loader:
+    """Counts calls and returns the call number, optionally after a pause."""
+
+    def __init__(self, delay: float = 0):
+        self.calls = 0
+        self.delay = delay
+
+    async def __call__(self):
+        self.calls += 1
+        calls = self.calls
+        await asyncio.sleep(self.delay)
+        return {'load': calls}
+
+
+def test_reads_through_once_per_key():
+    cache = TemplateMetadataCache(max_entries=10)
+    loader = Loader()
+
+    async def read():
+        return [await cache.get(key, loader) for key in ('a', 'a', 'b')]
+
+    (first, etag), (second, _), (other, _) = asyncio.run(read())
+
+    assert first == second == {'load': 1}
+    assert other == {'load': 2}
+    assert etag == make_etag({'load': 1})
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (1, 2)
+
+
+def test_concurrent_misses_share_one_load():
+    cache = TemplateMetadataCache(max_entries=10)
+    loader = Loader(delay=0.05)
+
+    async def read():
+        return await asyncio.gather(*(cache.get('a', loader) for _ in range(5)))
+
+    results = asyncio.run(read())
+
+    assert loader.calls == 1
+    assert all(payload == {'load': 1} for payload, _ in results)
+
+
+def test_invalidate_drops_entries_and_in_flight_loads():
+    cache = TemplateMetadataCache(max_entries=10)
+    loader = Loader(delay=0.05)
+
+    async def read():
+        slow = asyncio.ensure_future(cache.get('a', loader))
+        await asyncio.sleep(0.01)
+        await cache.invalidate()
+        stale, _ = await slow
+        fresh, _ = await cache.get('a', loader)
+        return stale, fresh
+
+    stale, fresh = asyncio.run(read())
+
+    # The load that raced the write is returned but not cached
+    assert (stale, fresh) == ({'load': 1}, {'load': 2})
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_failed_loads_are_not_cached():
+    cache = TemplateMetadataCache(max_entries=10)
+
+    async def failing():
+        raise RuntimeError("database down")
+
+    async def read():
+        with pytest.raises(RuntimeError):
+            await cache.get('a', failing)
+        return await cache.get('a', Loader())
+
+    assert asyncio.run(read())[0] == {'load': 1}
+
+
+def test_evicts_least_recently_used():
+    cache = TemplateMetadataCache(max_entries=2)
+    loader = Loader()
+
+    async def read():
+        for key in ('a', 'b', 'a', 'c'):
+            await cache.get(key, loader)
+        return await cache.get('b', loader)
+
+    assert asyncio.run(read())[0] == {'load': 4}
+    assert cache.stats()['evictions'] == 2
+
+
+@pytest.mark.parametrize("header, matches", [
+    (None, False),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"x", "abc"', True),
+    ('*', True),
+    ('"abcd"', False),
+])
+def test_etag_matches(header, matches):
+    assert etag_matches(header, '"abc"') is matches
+
+
+def test_endpoints_revalidate_with_etags(client, create_template):
+    topic = f"Etag {uuid.uuid4().hex[:8]}"
+    create_template(topic=topic)
+    params = {'topic': topic, 'skill_name': 'Addition'}
+
+    first = client.get("/api/templates/next-format", params=params)
+    unchanged = client.get("/api/templates/next-format", params=params, headers={'If-None-Match': first.headers['etag']})
+    create_template(topic=topic)
+    changed = client.get("/api/templates/next-format", params=params, headers={'If-None-Match': first.headers['etag']})
+
+    assert first.headers['cache-control'] == 'no-cache'
+    assert unchanged.status_code == 304
+    assert changed.status_code == 200
+    assert changed.json() == {'next_format': 3}
@@ -0,0 +1,60 @@
+from services.metrics import SandboxMetrics
+
+
+def observation(seed: int, exec_seconds: float, error_type: str = None) -> tuple:
+    return (seed, 0.001, exec_seconds, 0.001, error_type, None)
+
+
+def test_counts_executions_errors_and_timeouts():
+    metrics = SandboxMetrics()
+    metrics.observe_job('t1', [observation(1, 0.01), observation(2, 0.02, 'ZeroDivisionError')])
+    metrics.observe_failure('t1', 'TimeoutError', executions=3)
+
+    text = metrics.render()
+
+    assert 'sandbox_executions_total{template_id="t1"} 5' in text
+    assert 'sandbox_errors_total{error_type="ZeroDivisionError"} 1' in text
+    assert 'sandbox_timeouts_total{limit="wall_clock"} 3' in text
+    assert 'sandbox_phase_seconds_count{template_id="t1",phase="exec"} 2' in text
+    assert 'sandbox_phase_seconds_bucket{template_id="t1",phase="exec",le="0.025"} 2' in text
+
+
+def test_template_labels_are_bounded():
+    metrics = SandboxMetrics(max_templates=2)
+    for template_id in ('t1', 't2', 't3', 't4'):
+        metrics.observe_job(template_id, [observation(1, 0.01)])
+
+    text = metrics.render()
+
+    assert 'template_id="t3"' not in text
+    assert 'sandbox_executions_total{template_id="other"} 2' in text
+
+
+def test_keeps_the_slowest_executions():
+    metrics = SandboxMetrics(slowest_count=2)
+    metrics.observe_job('t1', [observation(1, 0.3), observation(2, 0.1), observation(3, 0.5)])
+
+    slowest = metrics.slowest()
+
+    assert [(entry['seed'], entry['exec_ms']) for entry in slowest] == [(3, 500.0), (1, 300.0)]
+    assert slowest[0]['phases_ms']['exec'] == 500.0
+
+
+def test_renders_numeric_stats_as_gauges():
+    text = SandboxMetrics().render({'code_cache': {'hits': 3, 'enabled': True, 'name': 'x'}})
+
+    assert 'code_cache_hits 3' in text
+    assert 'code_cache_enabled' not in text
+    assert 'code_cache_name' not in text
+
+
+def test_metrics_endpoints_report_sandbox_jobs(client, create_template):
+    template = create_template()
+    client.post(f"/api/templates/{template['id']}/generate", params={'count': 3, 'seed': 90000})
+
+    text = client.get("/metrics").text
+    slowest = client.get("/metrics/slowest").json()
+
+    assert f'sandbox_executions_total{{template_id="{template["id"]}"}}' in text
+    assert 'sandbox_pool_jobs_completed' in text
+    assert slowest['executions']
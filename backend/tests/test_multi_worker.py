@@ -0,0 +1,192 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+import serve
+from services.jobs import QUEUED, RUNNING, JobStore, owner_alive, process_owner
+from services.metadata_cache import SHARED_VERSION_KEY, TemplateMetadataCache
+from services.shared_state import SharedState
+from tests.test_jobs import new_job
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_in_other_process(code: str) -> str:
+    """Run code in a fresh interpreter sharing this process's environment (and so its SQLite files)."""
+    completed = subprocess.run(
+        [sys.executable, '-c', code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    return completed.stdout.strip()
+
+
+def test_shared_state_counters(tmp_path):
+    state = SharedState(str(tmp_path / "state.sqlite3"))
+
+    assert state.get('a') == 0
+    assert state.incr('a') == 1
+    assert state.incr('a', 5) == 6
+    assert (state.get('a'), state.get('b')) == (6, 0)
+
+
+def test_shared_state_increments_are_atomic_across_processes(tmp_path):
+    db_file = str(tmp_path / "state.sqlite3")
+    SharedState(db_file)
+    code = (
+        "from services.shared_state import SharedState\n"
+        f"state = SharedState({db_file!r})\n"
+        "for _ in range(50):\n"
+        "    state.incr('hits')\n"
+    )
+    processes = [subprocess.Popen([sys.executable, '-c', code], cwd=BACKEND_DIR) for _ in range(4)]
+    assert [process.wait() for process in processes] == [0] * 4
+
+    assert SharedState(db_file).get('hits') == 200
+
+
+def test_metadata_cache_drops_entries_written_by_another_process():
+    cache = TemplateMetadataCache(max_entries=10)
+    loads = []
+
+    async def loader():
+        loads.append(1)
+        return {'load': len(loads)}
+
+    async def read():
+        return (await cache.get('key', loader))[0]
+
+    assert asyncio.run(read()) == {'load': 1}
+    assert asyncio.run(read()) == {'load': 1}
+
+    run_in_other_process(
+        "from services.shared_state import get_shared_state\n"
+        f"get_shared_state().incr({SHARED_VERSION_KEY!r})\n"
+    )
+
+    assert asyncio.run(read()) == {'load': 2}
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_template_saved_by_another_worker_is_seen(client, create_template):
+    topic = f"Shared {uuid.uuid4().hex[:8]}"
+    other_topic = f"Elsewhere {uuid.uuid4().hex[:8]}"
+    create_template(topic=topic)
+    params = {'topic': topic, 'skill_name': 'Addition'}
+    first = client.get("/api/templates/next-format", params=params)
+    assert first.json() == {'next_format': 2}
+
+    other_worker = (
+        "import asyncio\n"
+        "from services.template_store import build_template_data, insert_template\n"
+        "for topic in {topics!r}:\n"
+        "    asyncio.run(insert_template(build_template_data({{\n"
+        "        'grade': 5, 'topic': topic, 'skill_name': 'Addition', 'type': 'Numerical Input',\n"
+        "        'question_template': \"question = '1 + 1'\", 'answer_template': 'answer = 2', 'created_by': 'other'\n"
+        "    }})))\n"
+    )
+    run_in_other_process(other_worker.format(topics=[topic, other_topic]))
+
+    changed = client.get("/api/templates/next-format", params=params, headers={'If-None-Match': first.headers['etag']})
+    assert changed.status_code == 200
+    assert changed.json() == {'next_format': 3}
+    # The autocomplete index is reloaded too
+    assert other_topic in client.get("/api/topics/suggest", params={'q': other_topic}).text
+
+
+def test_owner_alive():
+    finished = subprocess.Popen([sys.executable, '-c', 'pass'])
+    finished.wait()
+
+    assert owner_alive(process_owner())
+    assert not owner_alive(None)
+    assert not owner_alive(f"{socket.gethostname()}:{finished.pid}")
+    # Processes on other hosts cannot be checked
+    assert owner_alive(f"elsewhere.invalid:{finished.pid}")
+
+
+def test_requeues_jobs_of_dead_or_silent_owners(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    jobs = {name: store.create(new_job(name)) for name in ('dead', 'silent', 'healthy')}
+    for name in jobs:
+        store.claim(name, max_running=3, max_running_per_user=1)
+    store.heartbeat('healthy', [jobs['healthy']['id']])
+    store.heartbeat('dead', [jobs['dead']['id']])
+
+    # Heartbeats before this are stale; 'silent' has none since claiming
+    stale_before = (datetime.utcnow() - timedelta(milliseconds=1)).isoformat()
+    store._connection().execute(
+        "UPDATE jobs SET heartbeat_at = ? WHERE id = ?",
+        ((datetime.utcnow() - timedelta(minutes=5)).isoformat(), jobs['silent']['id'])
+    )
+
+    requeued = store.requeue_orphans(stale_before, lambda owner: owner != 'dead')
+
+    assert requeued == 2
+    assert {name: store.get(job['id'])['status'] for name, job in jobs.items()} == {
+        'dead': QUEUED, 'silent': QUEUED, 'healthy': RUNNING
+    }
+
+
+class FakeProcess:
+    pid = 1234
+    exitcode = 3
+
+    def is_alive(self) -> bool:
+        return False
+
+
+class FakeWorker:
+    """An API worker that has already exited."""
+
+    def __init__(self, served: bool = False):
+        self.process = FakeProcess()
+        self.served = served
+
+    def failed_start(self) -> bool:
+        return not self.served
+
+
+@pytest.fixture
+def supervisor():
+    supervisor = serve.Supervisor(1, "127.0.0.1", 0, graceful_timeout=1)
+    supervisor._spawn = FakeWorker
+    supervisor._workers = [FakeWorker()]
+    supervisor._failures = [0]
+    supervisor._restart_at = [None]
+    return supervisor
+
+
+def test_supervisor_backs_off_then_gives_up_on_failing_workers(supervisor):
+    delays = []
+    for _ in range(serve.WORKER_MAX_FAILURES - 1):
+        before = serve.time.monotonic()
+        supervisor._check_workers()
+        delays.append(round(supervisor._restart_at[0] - before, 1))
+        # Restart once the delay is over
+        supervisor._restart_at[0] = 0
+        supervisor._check_workers()
+        assert supervisor._restart_at[0] is None
+
+    assert delays == [0.5, 1.0, 2.0, 4.0, 8.0]
+    assert not supervisor._stop
+
+    supervisor._check_workers()
+
+    assert supervisor._stop
+    assert supervisor.exit_code == 1
+
+
+def test_supervisor_restarts_a_worker_that_served_at_once(supervisor):
+    supervisor._failures = [3]
+    supervisor._workers = [FakeWorker(served=True)]
+
+    supervisor._check_workers()
+
+    assert supervisor._failures == [0]
+    assert supervisor._restart_at == [None]
+    assert not supervisor._stop
@@ -0,0 +1,133 @@
+import json
+import uuid
+
+import pytest
+
+import services.papers
+from config import settings
+from services.papers import _chunks, plan_questions
+
+
+def create_paper(client, blueprint, seed=None):
+    body = {'blueprint': blueprint}
+    if seed is not None:
+        body['seed'] = seed
+    return client.post("/api/papers", json=body)
+
+
+def paper_lines(response):
+    assert response.status_code == 200, response.text
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def entry(template, count):
+    return {'grade': template['grade'], 'topic': template['topic'], 'skill_name': template['skill_name'], 'count': count}
+
+
+def test_paper_streams_header_questions_and_answer_key(client, create_template):
+    topic = f"Paper {uuid.uuid4().hex[:8]}"
+    first = create_template(topic=topic)
+    second = create_template(topic=topic, question_template="import random\na = random.randint(1, 9)\nb = 1\nquestion = f'{a} + 1'")
+    other = create_template()
+
+    lines = paper_lines(create_paper(client, [entry(first, 5), entry(other, 2)], seed=100))
+    header, questions, footer = lines[0]['paper'], [line['question'] for line in lines[1:-1]], lines[-1]
+
+    assert header['seed'] == 100
+    assert header['total'] == 7
+    assert [section['template_ids'] for section in header['sections']] == [[first['id'], second['id']], [other['id']]]
+
+    assert [q['number'] for q in questions] == list(range(1, 8))
+    assert [q['section'] for q in questions] == [0, 0, 0, 0, 0, 1, 1]
+    # Sections cycle through their skill's formats
+    assert [q['template_id'] for q in questions] == [first['id'], second['id']] * 2 + [first['id'], other['id'], other['id']]
+    # Question n uses seed + n - 1, and its instance id regenerates it
+    assert [int(q['instance_id'].rsplit(':', 1)[1]) for q in questions] == list(range(100, 107))
+    for question, key in zip(questions, footer['answer_key']):
+        instance = client.get(f"/api/instances/{question['instance_id']}").json()
+        assert (instance['question'], instance['answer']) == (question['question'], key['answer'])
+        assert key['number'] == question['number']
+        assert question['error'] is None
+
+    summary = footer['summary']
+    assert (summary['total'], summary['generated'], summary['errors'], summary['timed_out']) == (7, 7, 0, 0)
+
+
+def test_same_blueprint_and_seed_give_the_same_paper(client, create_template):
+    template = create_template()
+
+    first = paper_lines(create_paper(client, [entry(template, 30)], seed=5))
+    second = paper_lines(create_paper(client, [entry(template, 30)], seed=5))
+
+    assert first[1:-1] == second[1:-1]
+    assert first[-1]['answer_key'] == second[-1]['answer_key']
+
+
+def test_failed_chunk_only_fails_its_questions(client, create_template, monkeypatch):
+    broken = create_template()
+    working = create_template()
+    generate_seeds = services.papers.generate_seeds
+
+    async def failing_generate_seeds(template, *args, **kwargs):
+        if template['id'] == broken['id']:
+            raise RuntimeError("worker pool unavailable")
+        return await generate_seeds(template, *args, **kwargs)
+
+    monkeypatch.setattr(services.papers, 'generate_seeds', failing_generate_seeds)
+
+    lines = paper_lines(create_paper(client, [entry(broken, 3), entry(working, 2)], seed=1))
+    questions = [line['question'] for line in lines[1:-1]]
+
+    assert [q['error'] for q in questions[:3]] == ["Generation failed: worker pool unavailable"] * 3
+    assert {q['error_type'] for q in questions[:3]} == {'RuntimeError'}
+    assert all(q['error'] is None and q['question'] for q in questions[3:])
+    assert lines[-1]['summary']['errors'] == 3
+    assert lines[-1]['summary']['generated'] == 2
+
+
+def test_rejects_unknown_entries_and_oversized_papers(client, create_template):
+    template = create_template()
+
+    unknown = create_paper(client, [entry(template, 1), {**entry(template, 1), 'topic': 'No such topic'}])
+    assert unknown.status_code == 400
+    assert 'No such topic' in unknown.json()['detail']
+
+    half = settings.PAPER_MAX_QUESTIONS // 2 + 1
+    oversized = create_paper(client, [entry(template, half), entry(template, half)])
+    assert oversized.status_code == 400
+
+    assert create_paper(client, [entry(template, settings.PAPER_MAX_QUESTIONS + 1)]).status_code == 422
+    assert create_paper(client, []).status_code == 422
+
+
+def section(count, *template_ids, cost=None):
+    return {
+        'count': count,
+        'templates': [({'id': template_id, 'estimated_cost_ms': cost}, b'code', 'answer') for template_id in template_ids]
+    }
+
+
+def test_plan_questions_numbers_sections_and_seeds():
+    questions = plan_questions([section(3, 'a', 'b'), section(2, 'c')], seed=10)
+
+    assert [(q['number'], q['section'], q['template']['id'], q['seed']) for q in questions] == [
+        (1, 0, 'a', 10), (2, 0, 'b', 11), (3, 0, 'a', 12), (4, 1, 'c', 13), (5, 1, 'c', 14)
+    ]
+
+
+@pytest.mark.parametrize("cost, sizes", [
+    (None, [3, 2, 2]),
+    # A slow template is split into smaller jobs
+    (settings.GENERATION_CHUNK_TARGET_MS, [1, 1, 1, 1, 1, 1, 1]),
+])
+def test_chunks_group_questions_by_template(cost, sizes):
+    questions = plan_questions([section(5, 'a', 'b', cost=cost), section(2, 'c', cost=cost)], seed=0)
+
+    chunks = _chunks(questions, limit=3)
+
+    assert [len(chunk) for chunk in chunks] == sizes
+    assert all(len({q['template']['id'] for q in chunk}) == 1 for chunk in chunks)
+    # Ordered by their first question
+    assert [chunk[0]['number'] for chunk in chunks] == sorted(chunk[0]['number'] for chunk in chunks)
+    assert sorted(q['number'] for chunk in chunks for q in chunk) == list(range(1, 8))
@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+from services.result_cache import RenderedQuestionCache
+
+
+def result(n: int) -> dict:
+    return {'question': f"q{n}", 'answer': n, 'error': None, 'error_type': None}
+
+
+def test_hit_and_miss():
+    cache = RenderedQuestionCache(max_entries=10, ttl=0, spill_dir="")
+    cache.put(('t', 'v', 1), result(1))
+
+    assert cache.get(('t', 'v', 1)) == result(1)
+    assert cache.get(('t', 'v', 2)) is None
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (1, 1)
+
+
+def test_entries_expire():
+    cache = RenderedQuestionCache(max_entries=10, ttl=0.05, spill_dir="")
+    cache.put('key', result(1))
+    time.sleep(0.1)
+
+    assert cache.get('key') is None
+    assert cache.stats()['expirations'] == 1
+    assert cache.stats()['entries'] == 0
+
+
+def test_evicts_least_recently_used_entry():
+    cache = RenderedQuestionCache(max_entries=2, ttl=0, spill_dir="")
+    cache.put('a', result(1))
+    cache.put('b', result(2))
+    cache.get('a')
+    cache.put('c', result(3))
+
+    assert cache.get('b') is None
+    assert cache.get('a') == result(1)
+    assert cache.stats()['evictions'] == 1
+
+
+def test_evicts_down_to_max_bytes():
+    cache = RenderedQuestionCache(max_entries=100, max_bytes=1000, ttl=0, spill_dir="")
+    for n in range(20):
+        cache.put(n, {'question': 'x' * 200, 'answer': n})
+
+    stats = cache.stats()
+    assert stats['bytes'] <= 1000
+    assert stats['entries'] < 20
+    assert cache.get(19) is not None
+
+
+def test_skips_values_larger_than_the_cache():
+    cache = RenderedQuestionCache(max_entries=100, max_bytes=100, ttl=0, spill_dir="")
+    cache.put('big', {'question': 'x' * 1000})
+
+    assert cache.stats()['entries'] == 0
+
+
+def test_evicted_entries_spill_to_disk(tmp_path):
+    cache = RenderedQuestionCache(max_entries=2, ttl=0, spill_dir=str(tmp_path))
+    for n in range(5):
+        cache.put(n, result(n))
+    cache.flush()
+
+    assert cache.get(0) == result(0)
+    found = asyncio.run(cache.get_many([1, 2, 4, 99]))
+
+    assert found == {1: result(1), 2: result(2), 4: result(4)}
+    stats = cache.stats()
+    assert stats['disk_hits'] == 3
+    assert stats['misses'] == 1
+
+
+def test_clear_empties_both_tiers(tmp_path):
+    cache = RenderedQuestionCache(max_entries=1, ttl=0, spill_dir=str(tmp_path))
+    cache.put('a', result(1))
+    cache.put('b', result(2))
+
+    cache.clear()
+
+    assert cache.get('a') is None
+    assert cache.get('b') is None
+
+
+def test_repeated_generation_is_served_from_cache(client, create_template):
+    template = create_template()
+    url = f"/api/templates/{template['id']}/generate"
+
+    first = client.post(url, params={'count': 10, 'seed': 500}).json()
+    hits = client.get("/health").json()['result_cache']['hits']
+    second = client.post(url, params={'count': 10, 'seed': 500}).json()
+
+    assert second == first
+    assert client.get("/health").json()['result_cache']['hits'] == hits + 10
@@ -0,0 +1,53 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from database import run_query
+
+
+class SlowQuery:
+    """Stand-in query builder whose execute() blocks."""
+
+    def __init__(self, seconds: float = 0.2, error: Exception = None):
+        self.seconds = seconds
+        self.error = error
+
+    def execute(self):
+        time.sleep(self.seconds)
+        if self.error is not None:
+            raise self.error
+        return threading.current_thread().name
+
+
+def test_runs_on_database_threads():
+    assert asyncio.run(run_query(SlowQuery(0))).startswith("db")
+
+
+def test_queries_overlap_without_blocking_the_loop():
+    async def main():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.ensure_future(tick())
+        started = time.monotonic()
+        await asyncio.gather(*(run_query(SlowQuery(0.2)) for _ in range(4)))
+        elapsed = time.monotonic() - started
+        ticker.cancel()
+        return elapsed, ticks
+
+    elapsed, ticks = asyncio.run(main())
+
+    assert elapsed < 0.6
+    assert ticks >= 5
+
+
+def test_errors_propagate():
+    with pytest.raises(RuntimeError, match="boom"):
+        asyncio.run(run_query(SlowQuery(0, RuntimeError("boom"))))
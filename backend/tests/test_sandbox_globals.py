@@ -0,0 +1,56 @@
+import math
+
+import pytest
+
+from services.sandbox import SAFE_BUILTINS, PythonSandbox
+
+
+def run(code: str, seed: int = 1) -> dict:
+    return PythonSandbox().execute(code, seed)
+
+
+def test_shadowed_builtins_do_not_leak_into_later_executions():
+    assert run("len = lambda x: 0\nresult = len([1, 2])")['result'] == 0
+
+    assert run("result = len([1, 2])")['result'] == 2
+
+
+def test_shared_modules_cannot_be_modified():
+    result = run("math.pi = 3\nresult = math.pi")
+
+    assert result['error'] is not None
+    assert math.pi != 3
+    assert run("result = math.pi")['result'] == math.pi
+
+
+def test_each_execution_has_its_own_seeded_generator():
+    code = "import random\nresult = [random.randint(1, 10 ** 9) for _ in range(3)]"
+
+    first = run(code, seed=5)['result']
+
+    assert run(code, seed=5)['result'] == first
+    assert run(code, seed=6)['result'] != first
+    # The bare name and the imported module are the same generator
+    assert run("import random as r\nresult = r is random", seed=5)['result'] is True
+
+
+def test_builtins_layer_is_read_only():
+    with pytest.raises(TypeError):
+        SAFE_BUILTINS['len'] = None
+
+    assert SAFE_BUILTINS['eval'] is None
+    assert run("result = open('x')")['error_type'] == 'TypeError'
+
+
+def test_guards_allow_common_template_code():
+    code = (
+        "total = 0\n"
+        "for a, b in [(1, 2), (3, 4)]:\n"
+        "    total += a * b\n"
+        "values = {'total': total}\n"
+        "values['twice'] = total * 2\n"
+        "print(values)\n"
+        "result = max(*[total, values['twice']])"
+    )
+
+    assert run(code) == {'result': 28, 'error': None, 'error_type': None}
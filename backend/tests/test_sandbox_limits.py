@@ -0,0 +1,80 @@
+import time
+
+from config import settings
+from services.code_cache import code_cache
+from services.sandbox import PythonSandbox, join_template
+
+
+def run_in_process(question_template: str, answer_template: str = "answer = 1", **limits) -> dict:
+    """Execute a template in this process (on the main thread, so interval timers apply)."""
+    sandbox = PythonSandbox(timeout=limits.pop('timeout', None))
+    for name, value in limits.items():
+        setattr(sandbox, name, value)
+    source, answer_line = join_template(question_template, answer_template)
+    return sandbox.execute_template(code_cache.get(source), answer_line, seed=1)
+
+
+def preview(client, question_template: str, answer_template: str = "answer = 1") -> dict:
+    response = client.post("/api/preview", json={
+        'question_template': question_template,
+        'answer_template': answer_template,
+        'type': 'MCQ',
+        'seed': 1
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_wall_clock_timeout():
+    started = time.monotonic()
+    result = run_in_process("question = 1", "x = 0\nwhile True:\n    x += 1", timeout=0.2, cpu_limit=0)
+
+    assert result['error_type'] == 'TimeoutError'
+    assert time.monotonic() - started < 2
+
+
+def test_cpu_limit():
+    result = run_in_process("x = 0\nwhile True:\n    x += 1", timeout=10, cpu_limit=0.2)
+
+    assert result['error_type'] == 'CpuLimitExceeded'
+
+
+def test_recursion_limit():
+    result = run_in_process("def f(n):\n    return f(n + 1)\nquestion = f(0)")
+
+    assert result['error_type'] == 'RecursionLimitExceeded'
+    assert str(settings.EXECUTION_MAX_RECURSION_DEPTH) in result['error']
+
+
+def test_output_size_limit():
+    result = run_in_process("question = 'x' * 1000", "answer = 'y' * 5000", max_output_bytes=2000)
+
+    assert result['error'].startswith("Answer Template Error: 'answer' is")
+    assert result['error_type'] == 'OutputTooLarge'
+
+
+def test_unpicklable_output():
+    result = run_in_process("question = (lambda: 1)")
+
+    assert result['error_type'] == 'OutputTooLarge'
+    assert "cannot be returned" in result['error']
+
+
+def test_timeout_in_worker(client):
+    result = preview(client, "question = 1\nwhile True:\n    pass")
+
+    assert result['error_type'] in ('TimeoutError', 'CpuLimitExceeded')
+
+
+def test_memory_limit_in_worker(client):
+    result = preview(client, "question = 'x' * (4 * 1024 ** 3)")
+
+    assert result['error_type'] == 'MemoryLimitExceeded'
+    # The worker survives and keeps serving
+    assert preview(client, "question = 2")['question'] == 2
+
+
+def test_output_size_limit_in_worker(client):
+    result = preview(client, f"question = 'x' * {settings.EXECUTION_MAX_OUTPUT_BYTES * 2}")
+
+    assert result['error_type'] == 'OutputTooLarge'
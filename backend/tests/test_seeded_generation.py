@@ -0,0 +1,60 @@
+import pytest
+
+from services.generator import make_instance_id, parse_instance_id
+
+RANDOM_QUESTION = (
+    "import random\n"
+    "values = [random.randint(1, 10 ** 6) for _ in range(5)]\n"
+    "random.shuffle(values)\n"
+    "question = str(values)"
+)
+
+
+def generate(client, template, **params):
+    response = client.post(f"/api/templates/{template['id']}/generate", params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_same_seed_same_instances(client, create_template):
+    template = create_template(RANDOM_QUESTION, "answer = max(values)")
+
+    first = generate(client, template, count=5, seed=42)
+    second = generate(client, template, count=5, seed=42)
+    other = generate(client, template, count=5, seed=43)
+
+    assert first == second
+    assert [i['question'] for i in other[:4]] == [i['question'] for i in first[1:]]
+    assert len({i['question'] for i in first}) == 5
+
+
+def test_instance_id_regenerates_the_instance(client, create_template):
+    template = create_template(RANDOM_QUESTION, "answer = max(values)")
+    generated = generate(client, template, count=3, seed=1000)[2]
+
+    response = client.get(f"/api/instances/{generated['instance_id']}")
+
+    assert response.status_code == 200
+    instance = response.json()
+    assert generated['instance_id'] == make_instance_id(template['id'], template['format'], 1002)
+    assert (instance['question'], instance['answer'], instance['seed']) == (
+        generated['question'], generated['answer'], 1002
+    )
+
+
+def test_instance_of_a_different_format_is_gone(client, create_template):
+    template = create_template()
+
+    response = client.get(f"/api/instances/{make_instance_id(template['id'], template['format'] + 1, 5)}")
+
+    assert response.status_code == 404
+
+
+def test_invalid_instance_id(client):
+    assert client.get("/api/instances/not-an-instance").status_code == 400
+
+
+def test_parse_instance_id_round_trip():
+    assert parse_instance_id(make_instance_id("a:b", 3, 17)) == ("a:b", 3, 17)
+    with pytest.raises(ValueError):
+        parse_instance_id(":1:2")
@@ -0,0 +1,87 @@
+import json
+import os
+import re
+
+import pytest
+
+from services.code_cache import code_cache
+from services.sandbox import PythonSandbox, join_template
+
+
+def preview(client, question_template, answer_template, seed=1):
+    response = client.post("/api/preview", json={
+        'question_template': question_template,
+        'answer_template': answer_template,
+        'type': 'Numerical Input',
+        'seed': seed
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_answer_sees_question_variables(client):
+    result = preview(
+        client,
+        "import random\nx = random.randint(2, 9)\nfactors = [x, x + 1]\nquestion = f'{x} * {x + 1}'",
+        "answer = factors[0] * factors[1]"
+    )
+
+    x = int(result['question'].split(' * ')[0])
+    assert result['answer'] == x * (x + 1)
+    assert result['error'] is None
+
+
+def test_errors_name_the_failing_part(client):
+    question_error = preview(client, "question = 1 / 0", "answer = 1")
+    answer_error = preview(client, "question = 'q'", "answer = undefined_name")
+
+    assert question_error['error'].startswith("Question Template Error:")
+    assert question_error['error_type'] == 'ZeroDivisionError'
+    assert answer_error['error'].startswith("Answer Template Error:")
+    assert answer_error['error_type'] == 'NameError'
+
+
+def test_unassigned_question_or_answer(client):
+    result = preview(client, "q = 'text'", "answer = 1")
+
+    assert result['error'] == "Question Template Error: 'question' was not assigned"
+    assert result['error_type'] == 'MissingVariable'
+
+
+def test_syntax_error_is_reported_without_running(client):
+    result = preview(client, "question = (", "answer = 1")
+
+    assert result['question'] is None
+    assert result['error_type'] == 'SyntaxError'
+
+
+@pytest.mark.parametrize("question_template, answer_line", [
+    ("question = 1", 2),
+    ("a = 1\nquestion = a", 3),
+])
+def test_join_template_answer_line(question_template, answer_line):
+    source, line = join_template(question_template, "answer = question")
+
+    assert line == answer_line
+    assert source.splitlines()[line - 1] == "answer = question"
+
+
+def test_single_pass_execution():
+    source, answer_line = join_template("calls = [1]\nquestion = len(calls)", "calls.append(2)\nanswer = len(calls)")
+
+    result = PythonSandbox().execute_template(code_cache.get(source), answer_line)
+
+    assert (result['question'], result['answer']) == (1, 2)
+
+
+def test_seed_templates_follow_the_shared_namespace(client):
+    with open(os.path.join(os.path.dirname(os.path.dirname(__file__)), "local_db.json")) as f:
+        templates = json.load(f)['question_templates']
+
+    for template in templates:
+        result = preview(client, template['question_template'], template['answer_template'])
+        assert result['error'] is None, (template['topic'], result)
+        shown = re.fullmatch(r"What is (\d+) \+ (\d+)\?", result['question'])
+        if shown:
+            # The answer uses the numbers shown in the question
+            assert result['answer'] == int(shown[1]) + int(shown[2])
@@ -0,0 +1,48 @@
+import uuid
+
+from database import SQLiteClient
+from tests.test_sqlite_client import template_row
+
+
+def test_counts_templates_per_skill(client, create_template):
+    topic = f"Skills {uuid.uuid4().hex[:8]}"
+    create_template(topic=topic, skill_name="Adding")
+    create_template(topic=topic, skill_name="Adding")
+    create_template(topic=topic, skill_name="Subtracting")
+
+    skills = [skill for skill in client.get("/api/skills").json()['skills'] if skill['topic'] == topic]
+
+    assert skills == [
+        {'topic': topic, 'skill_name': 'Adding', 'count': 2},
+        {'topic': topic, 'skill_name': 'Subtracting', 'count': 1}
+    ]
+
+
+def test_pages(client, create_template):
+    for _ in range(3):
+        create_template()
+    everything = client.get("/api/skills").json()
+
+    page = client.get("/api/skills", params={'limit': 2, 'offset': 1}).json()
+    last = client.get("/api/skills", params={'limit': 2, 'offset': len(everything['skills']) - 2}).json()
+
+    assert page['skills'] == everything['skills'][1:3]
+    assert page['has_more'] is True
+    assert last['has_more'] is False
+    assert everything['has_more'] is False
+
+
+def test_counts_follow_updates_and_deletes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db = SQLiteClient(str(tmp_path / "skills.sqlite3"))
+    rows = db.table('question_templates').insert([template_row(format=1), template_row(format=2)]).execute().data
+    counts = lambda: [
+        (row['topic'], row['skill_name'], row['template_count'])
+        for row in db.table('skill_counts').select('*').order('skill_name').execute().data
+    ]
+
+    db._write(lambda conn: conn.execute("UPDATE question_templates SET skill_name = 'Other' WHERE id = ?", (rows[0]['id'],)))
+    assert counts() == [('Fractions', 'Adding', 1), ('Fractions', 'Other', 1)]
+
+    db._write(lambda conn: conn.execute("DELETE FROM question_templates WHERE id = ?", (rows[1]['id'],)))
+    assert counts() == [('Fractions', 'Other', 1)]
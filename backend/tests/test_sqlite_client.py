@@ -0,0 +1,108 @@
+import json
+
+import pytest
+
+from database import SQLiteClient, is_unique_violation
+
+
+def template_row(topic: str = "Fractions", skill_name: str = "Adding", format: int = 1, **fields) -> dict:
+    return {
+        'module': 'Basic-skills',
+        'category': 'Math',
+        'grade': 4,
+        'topic': topic,
+        'skill_name': skill_name,
+        'format': format,
+        'type': 'MCQ',
+        'question_template': "question = 1",
+        'answer_template': "answer = 1",
+        'created_by': 'tester',
+        'updated_by': 'tester',
+        **fields
+    }
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    # No local_db.json in the working directory, so the database starts empty
+    monkeypatch.chdir(tmp_path)
+    return SQLiteClient(str(tmp_path / "templates.sqlite3"))
+
+
+def test_insert_assigns_ids_and_returns_rows(db):
+    formats = [5, 2, 8, 1, 7, 3, 6, 4]
+    rows = db.table('question_templates').insert([template_row(format=n) for n in formats]).execute().data
+
+    # In the order passed in, whatever ids they were given
+    assert [row['format'] for row in rows] == formats
+    assert all(row['id'] for row in rows)
+    assert rows[0]['created_at']
+
+
+def test_filters_order_and_paging(db):
+    db.table('question_templates').insert([template_row(format=n) for n in (3, 1, 2)]).execute()
+    db.table('question_templates').insert(template_row(topic="Decimals")).execute()
+
+    query = db.table('question_templates').select('format').eq('topic', 'Fractions').order('format', desc=True)
+    assert [row['format'] for row in query.execute().data] == [3, 2, 1]
+
+    page = db.table('question_templates').select('format').eq('topic', 'Fractions').order('format').limit(1).offset(1)
+    assert page.execute().data == [{'format': 2}]
+
+    assert len(db.table('question_templates').select('*').ilike('topic', 'fraction%').execute().data) == 3
+
+
+def test_writes_invalidate_cached_queries(db):
+    query = lambda: db.table('question_templates').select('id').execute().data
+    assert query() == []
+
+    db.table('question_templates').insert(template_row()).execute()
+
+    assert len(query()) == 1
+
+
+def test_sees_writes_from_another_connection(db):
+    other = SQLiteClient(db.db_file)
+    query = lambda: db.table('question_templates').select('id').execute().data
+    assert query() == []
+
+    other.table('question_templates').insert(template_row()).execute()
+
+    assert len(query()) == 1
+
+
+def test_unique_template_constraint(db):
+    db.table('question_templates').insert(template_row()).execute()
+
+    with pytest.raises(Exception) as raised:
+        db.table('question_templates').insert(template_row()).execute()
+
+    assert is_unique_violation(raised.value)
+
+
+def test_failed_multi_row_insert_is_rolled_back(db):
+    with pytest.raises(Exception):
+        db.table('question_templates').insert([template_row(format=1), template_row(format=1)]).execute()
+
+    assert db.table('question_templates').select('id').execute().data == []
+
+
+def test_rejects_unknown_columns_and_tables(db):
+    with pytest.raises(ValueError):
+        db.table('question_templates').select('id').eq('nope', 1).execute()
+    with pytest.raises(ValueError):
+        db.table('no_such_table')
+
+
+def test_imports_local_db_json_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "local_db.json").write_text(json.dumps({
+        'question_templates': [template_row(id='t1')],
+        'users': []
+    }))
+
+    db = SQLiteClient(str(tmp_path / "imported.sqlite3"))
+    again = SQLiteClient(str(tmp_path / "imported.sqlite3"))
+
+    assert [row['id'] for row in db.table('question_templates').select('id').execute().data] == ['t1']
+    assert len(again.table('question_templates').select('id').execute().data) == 1
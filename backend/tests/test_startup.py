@@ -0,0 +1,41 @@
+import sys
+
+from benchmarks.import_budget import FORBIDDEN_MODULES, _WORKER_PROBE, _forbidden, _run_probe, measure_import
+from services.worker_pool import _main_hidden
+
+
+def test_main_hidden_restores_main_module():
+    main = sys.modules['__main__']
+    before = {name: main.__dict__.get(name, 'missing') for name in ('__file__', '__spec__')}
+
+    with _main_hidden():
+        assert '__file__' not in main.__dict__
+        assert main.__spec__ is None
+
+    assert {name: main.__dict__.get(name, 'missing') for name in ('__file__', '__spec__')} == before
+
+
+def test_importing_main_leaves_supabase_unloaded():
+    measured = measure_import('main', 1)
+
+    assert 'main' in measured['modules']
+    assert _forbidden(measured['modules'], FORBIDDEN_MODULES['main']) == []
+
+
+def test_sandbox_worker_entry_point_does_not_load_the_api():
+    measured = measure_import('services.sandbox_worker', 1)
+
+    assert _forbidden(measured['modules'], FORBIDDEN_MODULES['sandbox_worker']) == []
+
+
+def test_worker_started_under_main_py_does_not_load_the_api():
+    measured = _run_probe(_WORKER_PROBE, 1)
+
+    assert 'services.sandbox_worker' in measured['modules']
+    assert _forbidden(measured['modules'], FORBIDDEN_MODULES['worker_from_main']) == []
+
+
+def test_forbidden_matches_packages_and_submodules():
+    loaded = ['supabase', 'supabase.client', 'supabase_extra', 'httpx._client']
+
+    assert _forbidden(loaded, ['supabase', 'httpx']) == ['httpx._client', 'supabase', 'supabase.client']
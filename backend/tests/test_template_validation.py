@@ -0,0 +1,79 @@
+import pytest
+
+from config import settings
+from services.generator import chunk_size_for
+from services.template_lint import lint_source, lint_template
+
+
+@pytest.mark.parametrize("source", [
+    "while True:\n    x = 1",
+    "n = 1\nwhile n > 0:\n    y = n + 1",
+    "for i in range(10 ** 9):\n    pass",
+    "import os",
+    "from subprocess import run",
+    "data = open('x')",
+])
+def test_flags_code_that_can_only_hang_or_fail(source):
+    assert lint_source(source)
+
+
+@pytest.mark.parametrize("source", [
+    "n = 10\nwhile n > 0:\n    n -= 1",
+    "while True:\n    if random.random() < 0.5:\n        break",
+    "items = [1, 2]\nwhile items:\n    items.pop()",
+    "while random.random() < 0.9:\n    pass",
+    "for i in range(1000):\n    pass",
+    "import math\nfrom random import randint",
+    "question = (",
+])
+def test_accepts_valid_code(source):
+    assert lint_source(source) == []
+
+
+def test_reports_lines_and_parts():
+    problems = lint_template("import random\nimport os", "answer = eval('1')")
+
+    assert problems == [
+        "Question Template Error: Line 2: import of 'os' is not allowed",
+        "Answer Template Error: Line 1: 'eval' is not available in templates"
+    ]
+
+
+def test_rejects_templates_that_fail_at_save_time(client):
+    def save(question_template, answer_template="answer = 1"):
+        return client.post("/api/templates", json={
+            'grade': 2,
+            'topic': 'Validation',
+            'skill_name': 'Rejected',
+            'type': 'MCQ',
+            'question_template': question_template,
+            'answer_template': answer_template,
+            'created_by': 'tester'
+        })
+
+    lint_failure = save("while True:\n    pass\nquestion = 1")
+    compile_failure = save("question = (")
+    trial_failure = save("question = 1 / 0")
+
+    assert lint_failure.status_code == 400
+    assert "loop can never end" in lint_failure.json()['detail']
+    assert compile_failure.status_code == 400
+    assert trial_failure.status_code == 400
+    assert "trial seed 0" in trial_failure.json()['detail']
+
+
+def test_saved_templates_carry_an_estimated_cost(create_template):
+    template = create_template()
+
+    assert template['estimated_cost_ms'] > 0
+
+
+@pytest.mark.parametrize("cost, expected", [
+    (None, 100),
+    (0, 100),
+    (0.01, 100),
+    (settings.GENERATION_CHUNK_TARGET_MS / 10, 10),
+    (settings.GENERATION_CHUNK_TARGET_MS * 5, 1),
+])
+def test_chunk_size_follows_estimated_cost(cost, expected):
+    assert chunk_size_for({'estimated_cost_ms': cost}, 100) == expected
@@ -0,0 +1,54 @@
+from services.sandbox import estimate_distinct_outputs
+
+
+def generate_unique(client, template, **params):
+    response = client.post(f"/api/templates/{template['id']}/generate/unique", params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_instances_are_distinct(client, create_template):
+    template = create_template()
+
+    report = generate_unique(client, template, count=30, seed=0)
+
+    questions = [instance['question'] for instance in report['instances']]
+    assert len(questions) == len(set(questions)) == 30
+    assert report['exhausted'] is False
+    assert report['attempts'] == 30 + report['duplicates'] + report['errors']
+    # Kept instances regenerate from their ids
+    instance = report['instances'][-1]
+    assert client.get(f"/api/instances/{instance['instance_id']}").json()['question'] == instance['question']
+
+
+def test_small_output_space_is_exhausted_early(client, create_template):
+    template = create_template(
+        "import random\nn = random.randint(1, 5)\nquestion = f'Double {n}'",
+        "answer = 2 * n"
+    )
+
+    report = generate_unique(client, template, count=50, seed=0)
+
+    assert report['generated'] == 5
+    assert report['exhausted'] is True
+    assert report['attempts'] < report['max_attempts']
+    assert report['estimated_distinct_outputs'] == 5
+
+
+def test_unique_by_question_and_answer(client, create_template):
+    template = create_template(
+        "import random\nn = random.randint(1, 3)\nquestion = 'Pick a number'",
+        "answer = n"
+    )
+
+    by_question = generate_unique(client, template, count=3, seed=0)
+    by_answer = generate_unique(client, template, count=3, seed=0, unique_by='question_answer')
+
+    assert by_question['generated'] == 1
+    assert sorted(instance['answer'] for instance in by_answer['instances']) == [1, 2, 3]
+
+
+def test_estimate_distinct_outputs():
+    assert estimate_distinct_outputs([3, 3, 2]) == 3
+    # Many outputs seen once: more are likely unseen
+    assert estimate_distinct_outputs([1, 1, 1, 1, 2]) == 5 + round(4 * 3 / 4)
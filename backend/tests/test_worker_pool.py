@@ -0,0 +1,121 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from services.worker_pool import SandboxPool, WorkerCrashedError, WorkerTimeoutError
+
+
+@pytest.fixture
+def make_pool():
+    """Start single-worker pools, shutting them down after the test."""
+    pools = []
+
+    def make(**kwargs) -> SandboxPool:
+        pool = SandboxPool(size=1, **kwargs)
+        pool.start()
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.shutdown()
+
+
+def test_runs_jobs_in_worker_process(make_pool):
+    pool = make_pool()
+
+    pid = asyncio.run(pool.run(os.getpid))
+
+    assert pid != os.getpid()
+    assert pool.stats()['jobs_completed'] == 1
+
+
+def test_recycles_worker_after_max_jobs(make_pool):
+    pool = make_pool(max_jobs_per_worker=2)
+
+    async def pids():
+        return [await pool.run(os.getpid) for _ in range(3)]
+
+    first, second, third = asyncio.run(pids())
+
+    assert first == second
+    assert third != first
+    assert pool.stats()['workers_recycled'] == 1
+
+
+def test_kills_worker_that_exceeds_timeout(make_pool):
+    pool = make_pool()
+    pid = asyncio.run(pool.run(os.getpid))
+
+    started = time.monotonic()
+    with pytest.raises(WorkerTimeoutError):
+        asyncio.run(pool.run(time.sleep, 10, timeout=0.3))
+
+    assert time.monotonic() - started < 5
+    assert pool.stats()['workers_killed'] == 1
+    assert asyncio.run(pool.run(os.getpid)) != pid
+
+
+def test_replaces_crashed_worker(make_pool):
+    pool = make_pool()
+
+    with pytest.raises(WorkerCrashedError):
+        asyncio.run(pool.run(os._exit, 1))
+
+    assert asyncio.run(pool.run(os.getpid)) != os.getpid()
+    assert pool.stats()['workers_killed'] == 1
+
+
+def test_cancelling_a_running_job_kills_its_worker(make_pool):
+    pool = make_pool()
+    pid = asyncio.run(pool.run(os.getpid))
+
+    async def cancel_running_job():
+        task = asyncio.ensure_future(pool.run(time.sleep, 10, timeout=30))
+        await asyncio.sleep(0.3)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    started = time.monotonic()
+    asyncio.run(cancel_running_job())
+    # The replacement takes over the job's place; the sleep is not waited out
+    assert asyncio.run(pool.run(os.getpid)) != pid
+    assert time.monotonic() - started < 5
+    assert pool.stats()['jobs_cancelled'] == 1
+    assert pool.stats()['workers_killed'] == 1
+
+
+def test_cancelling_a_queued_job_drops_it(make_pool):
+    pool = make_pool()
+
+    async def cancel_queued_job():
+        running = asyncio.ensure_future(pool.run(time.sleep, 0.5))
+        queued = asyncio.ensure_future(pool.run(os.getpid))
+        await asyncio.sleep(0.1)
+        queued.cancel()
+        await running
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+
+    asyncio.run(cancel_queued_job())
+    stats = pool.stats()
+    assert stats['jobs_cancelled'] == 1
+    assert stats['jobs_completed'] == 1
+    assert stats['workers_killed'] == 0
+
+
+def test_replaces_worker_after_unexpected_error(make_pool):
+    pool = make_pool()
+
+    async def run_unpicklable_then_next():
+        with pytest.raises(TypeError):
+            await pool.run(os.getpid, threading.Lock())
+        return await pool.run(os.getpid)
+
+    assert asyncio.run(run_unpicklable_then_next()) != os.getpid()
+    stats = pool.stats()
+    assert (stats['jobs_failed'], stats['workers_killed'], stats['jobs_completed']) == (1, 1, 1)
@@ -10,6 +10,7 @@ CREATE TABLE question_templates (
     type TEXT NOT NULL CHECK (type IN ('MCQ', 'MAQ', 'Numerical Input', 'Text Input', 'True-or-False')),
     question_template TEXT NOT NULL,
     answer_template TEXT NOT NULL,
+    estimated_cost_ms DOUBLE PRECISION,  -- Median trial runtime measured at save time
     created_by TEXT NOT NULL,
     updated_by TEXT NOT NULL,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
@@ -28,3 +29,100 @@ CREATE UNIQUE INDEX unique_template ON question_templates(topic, skill_name, for
 
 -- Add comment to table
 COMMENT ON TABLE question_templates IS 'Stores dynamic question templates with Python code for generation';
+
+-- For a database created before estimated_cost_ms existed:
+-- ALTER TABLE question_templates ADD COLUMN IF NOT EXISTS estimated_cost_ms DOUBLE PRECISION;
+
+-- Per-skill template counts, maintained by trigger so that /api/skills
+-- reads one row per skill instead of scanning question_templates.
+-- For an existing database, run this section once; the final INSERT backfills it.
+CREATE TABLE skill_counts (
+    topic TEXT NOT NULL,
+    skill_name TEXT NOT NULL,
+    template_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (topic, skill_name)
+);
+
+CREATE OR REPLACE FUNCTION update_skill_counts() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE skill_counts SET template_count = template_count - 1
+        WHERE topic = OLD.topic AND skill_name = OLD.skill_name;
+        DELETE FROM skill_counts
+        WHERE topic = OLD.topic AND skill_name = OLD.skill_name AND template_count <= 0;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO skill_counts (topic, skill_name, template_count)
+        VALUES (NEW.topic, NEW.skill_name, 1)
+        ON CONFLICT (topic, skill_name)
+        DO UPDATE SET template_count = skill_counts.template_count + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_skill_counts
+AFTER INSERT OR DELETE OR UPDATE OF topic, skill_name ON question_templates
+FOR EACH ROW EXECUTE FUNCTION update_skill_counts();
+
+INSERT INTO skill_counts (topic, skill_name, template_count)
+SELECT topic, skill_name, COUNT(*) FROM question_templates
+GROUP BY topic, skill_name
+ON CONFLICT (topic, skill_name) DO NOTHING;
+
+-- Last allocated format per (topic, skill_name). The trigger keeps it at
+-- least MAX(format) for rows inserted with an explicit format, and
+-- insert_template_next_format() allocates from it under a row lock, so
+-- concurrent authors never collide on unique_template.
+-- For an existing database, run this section once; the final INSERT backfills it.
+CREATE TABLE template_format_counters (
+    topic TEXT NOT NULL,
+    skill_name TEXT NOT NULL,
+    last_format INTEGER NOT NULL,
+    PRIMARY KEY (topic, skill_name)
+);
+
+CREATE OR REPLACE FUNCTION update_format_counters() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO template_format_counters (topic, skill_name, last_format)
+    VALUES (NEW.topic, NEW.skill_name, NEW.format)
+    ON CONFLICT (topic, skill_name)
+    DO UPDATE SET last_format = GREATEST(template_format_counters.last_format, EXCLUDED.last_format);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_format_counters
+AFTER INSERT OR UPDATE OF topic, skill_name, format ON question_templates
+FOR EACH ROW EXECUTE FUNCTION update_format_counters();
+
+-- Allocate the next format for the template's (topic, skill_name) and insert
+-- it in one transaction. Called as db.rpc('insert_template_next_format', ...).
+CREATE OR REPLACE FUNCTION insert_template_next_format(p_template JSONB)
+RETURNS SETOF question_templates AS $$
+DECLARE
+    v_format INTEGER;
+BEGIN
+    INSERT INTO template_format_counters (topic, skill_name, last_format)
+    VALUES (p_template->>'topic', p_template->>'skill_name', 1)
+    ON CONFLICT (topic, skill_name)
+    DO UPDATE SET last_format = template_format_counters.last_format + 1
+    RETURNING last_format INTO v_format;
+
+    RETURN QUERY
+    INSERT INTO question_templates (
+        module, category, grade, topic, skill_name, format, type,
+        question_template, answer_template, estimated_cost_ms, created_by, updated_by
+    )
+    SELECT
+        t.module, t.category, t.grade, t.topic, t.skill_name, v_format, t.type,
+        t.question_template, t.answer_template, t.estimated_cost_ms, t.created_by, t.updated_by
+    FROM jsonb_populate_record(NULL::question_templates, p_template) AS t
+    RETURNING *;
+END;
+$$ LANGUAGE plpgsql;
+
+INSERT INTO template_format_counters (topic, skill_name, last_format)
+SELECT topic, skill_name, MAX(format) FROM question_templates
+GROUP BY topic, skill_name
+ON CONFLICT (topic, skill_name) DO NOTHING;